@@ -0,0 +1,138 @@
+"""
+In-memory search index over the machine list (db.assets), used to resolve
+typed vehicle names from the workplan Excel and for the checklist start
+screen's autocomplete.
+
+  exact   -> "make name" and name (lowercased) to the first asset with it
+  tokens  -> sorted vocabulary of words in "make name", for prefix search
+  grams   -> character trigrams of "make name", for substring matches
+
+The index is rebuilt on the first lookup after invalidate_asset_index()
+(called wherever the asset list is replaced) and at most
+ASSET_INDEX_TTL_SECONDS after it was built, so other workers pick up
+changes too.
+"""
+import re
+import bisect
+from datetime import datetime, timezone, timedelta
+
+ASSET_INDEX_TTL_SECONDS = 300
+
+# In-memory cache with expiry
+_index_cache = {
+    "index": None,
+    "expires_at": None
+}
+
+NO_MATCH = {"", "n/a", "na", "own", "qwn", "own transport", "-"}
+
+
+def _words(text):
+    return [w for w in re.split(r"[^0-9a-z]+", text.lower()) if w]
+
+
+def _grams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _check_type(asset):
+    check_type = asset.get("check_type")
+    # Handle nested check_type objects (from old data format)
+    if isinstance(check_type, dict) and "check_type" in check_type:
+        check_type = check_type["check_type"]
+    return check_type
+
+
+class AssetIndex:
+    def __init__(self, assets):
+        self.assets = []
+        self.exact = {}
+        self.grams = {}
+        postings = {}
+        for i, a in enumerate(assets):
+            name = (a.get("name") or "").strip()
+            make = (a.get("make") or "").strip()
+            label = f"{make} {name}".strip()
+            self.assets.append({
+                "id": a.get("id"), "make": make, "name": name,
+                "check_type": _check_type(a), "label": label, "label_lower": label.lower(),
+            })
+            # First asset in list order wins, as in the original linear scan
+            self.exact.setdefault(label.lower(), i)
+            self.exact.setdefault(name.lower(), i)
+            for w in _words(label):
+                postings.setdefault(w, set()).add(i)
+            for g in _grams(label.lower()):
+                self.grams.setdefault(g, set()).add(i)
+        self.vocab = sorted(postings)
+        self.postings = postings
+
+    def resolve_vehicle(self, vehicle):
+        """The checklist's "Make Name" for a typed vehicle, or None: an exact
+        match on "Make Name" or Name, else a distinctive (not just a number,
+        4+ characters) substring of exactly one asset's "Make Name"."""
+        v = (vehicle or "").strip()
+        vl = v.lower()
+        if not v or vl in NO_MATCH:
+            return None
+        if vl in self.exact:
+            return self.assets[self.exact[vl]]["label"]
+        if v.replace(" ", "").isdigit() or len(v) < 4:
+            return None
+        candidates = None
+        for g in _grams(vl):
+            candidates = self.grams.get(g, set()) if candidates is None else candidates & self.grams.get(g, set())
+            if not candidates:
+                return None
+        subs = [i for i in candidates if vl in self.assets[i]["label_lower"]]
+        return self.assets[subs[0]]["label"] if len(subs) == 1 else None
+
+    def _prefix_matches(self, word):
+        found = set()
+        i = bisect.bisect_left(self.vocab, word)
+        while i < len(self.vocab) and self.vocab[i].startswith(word):
+            found |= self.postings[self.vocab[i]]
+            i += 1
+        return found
+
+    def search(self, q, limit=20):
+        """Assets whose "make name" has a word starting with each word of q.
+        Exact and leading matches first, then alphabetical."""
+        words = _words(q or "")
+        if not words:
+            return []
+        hits = None
+        for w in sorted(words, key=len, reverse=True):
+            matches = self._prefix_matches(w)
+            hits = matches if hits is None else hits & matches
+            if not hits:
+                return []
+        ql = " ".join(words)
+        ranked = sorted(
+            (self.assets[i] for i in hits),
+            key=lambda a: (a["label_lower"] != ql, not a["label_lower"].startswith(ql), a["label_lower"]),
+        )
+        return [
+            {"id": a["id"], "make": a["make"], "name": a["name"], "check_type": a["check_type"]}
+            for a in ranked[:limit]
+        ]
+
+
+async def get_asset_index(db):
+    """The asset index, rebuilt if invalidated or expired."""
+    now = datetime.now(timezone.utc)
+    if _index_cache["index"] is not None and _index_cache["expires_at"] and now < _index_cache["expires_at"]:
+        return _index_cache["index"]
+    assets = await db.assets.find(
+        {}, {"_id": 0, "id": 1, "make": 1, "name": 1, "check_type": 1}
+    ).to_list(length=None)
+    index = AssetIndex(assets)
+    _index_cache["index"] = index
+    _index_cache["expires_at"] = now + timedelta(seconds=ASSET_INDEX_TTL_SECONDS)
+    return index
+
+
+def invalidate_asset_index():
+    """Call after changing the asset list"""
+    _index_cache["index"] = None
+    _index_cache["expires_at"] = None
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the pure data-processing functions (no database):
+the workplan Excel import and vehicle matching, the costing rollups, the
+FieldPlan crop-area parsing, the assets workbook parser and the export row
+builders. Each runs on generated input at several sizes (default 100, 1k
+and 10k rows); the best and median time over --repeat runs and the peak
+memory allocated by one run (tracemalloc) are reported. Results are
+compared with a baseline; a case whose time or memory grew by more than
+the tolerance fails the run.
+
+    cd backend && python benchmarks/bench_data_processing.py
+    cd backend && python benchmarks/bench_data_processing.py --cases parse_workplan_excel --sizes 10000
+    cd backend && python benchmarks/bench_data_processing.py --save-baseline   # after an intended change
+
+Times are only comparable on the same machine; record the baseline where
+the comparisons will run.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+import tracemalloc
+from io import BytesIO
+from datetime import date, datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import openpyxl
+from server import _parse_workplan_excel, _match_vehicles_to_assets
+from job_matcher import JobMatcher
+from asset_index import AssetIndex
+from workplan_costing import week_rollup, costing_from_rollups
+from fieldplan_model import build_fieldplan_model, crop_areas_for_year
+from sheet_schema import parse_assets_workbook
+from cpu_tasks import checklist_export_rows, export_near_misses_xlsx
+from bench_workplan_costing import make_weeks, COLORS, JOBS
+from synthetic_data import MACHINES, DAILY_ITEMS, make_staff, make_assets, make_checklists, make_reports
+
+BASELINE = os.path.join(os.path.dirname(__file__), "data_processing_baseline.json")
+WEEK_START = date(2026, 1, 5)
+NOISE_MS = 0.5  # time changes smaller than this are never a regression
+NOISE_KB = 64
+
+
+# ---------- inputs ----------
+
+def make_workplan_workbook(rows, seed=1):
+    """A DailyWorkPlanApp 'Main Sheet': dates on row 2 (AM and PM column per
+    day from column 11), one person per row from row 3."""
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Main Sheet")
+    ws.append(["Daily Work Plan"])
+    header = ["", "", "", "", "Vehicle", "Name", "Manager", "Start", "", "Notes"]
+    for d in range(7):
+        day = datetime.combine(WEEK_START + timedelta(days=d), datetime.min.time())
+        header += [day, None]
+    ws.append(header)
+    vehicles = [f"{make} {model}" for make, models in MACHINES.items() for model in models]
+    typed_jobs = [j.lower() for j in JOBS] + ["Spray", "harvest ", "Grading line 2", ""]
+    for r in range(rows):
+        cells = ["", "", "", "", rng.choice(vehicles + ["Own", "123", "Fastrac"]), f"Person {r}",
+                 rng.choice(["Tom", "Sue", "Ion"]), "07:00", "", "Field 12" if r % 5 == 0 else ""]
+        for _ in range(7):
+            cells += [rng.choice(typed_jobs), rng.choice(typed_jobs)]
+        ws.append(cells)
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def make_vehicle_rows(rows, seed=2):
+    """Typed vehicles as they come out of the workplan import: exact
+    names, bare models, fragments, fleet numbers and blanks."""
+    rng = random.Random(seed)
+    typed = []
+    for make, models in MACHINES.items():
+        for model in models:
+            typed += [f"{make} {model}", model, model.lower(), make.split()[0]]
+    typed += ["Own", "n/a", "", "4417", "Fastrac", "Loadall"]
+    return [{"vehicle": rng.choice(typed)} for _ in range(rows)]
+
+
+def make_rollups(weeks):
+    """weeks rollups of 40-row weeks (a year of real weeks, repeated)."""
+    year = [week_rollup(d["week_start"], d["rows"], "archive") for d in make_weeks(52, 40)]
+    first = date.fromisoformat(year[0]["week_start"])
+    rollups = []
+    for w in range(weeks):
+        src = year[w % 52]
+        shift = timedelta(weeks=w - w % 52)
+        rollups.append({
+            "week_start": (first + timedelta(weeks=w)).isoformat(),
+            "source": "archive",
+            "days": {(date.fromisoformat(k) + shift).isoformat(): v for k, v in src["days"].items()},
+        })
+    return rollups
+
+
+def make_fieldplan_html(fields, seed=3):
+    """A FieldPlan page: published 'Our crop areas' sections for three
+    years and the embedded field array, fields long."""
+    rng = random.Random(seed)
+    estates = ["Wretham", "Euston", "Pickenham", "Rackham Farms", "Chandler", "Warren", "Blakeney"]
+    crops = ["Potatoes", "Carrots", "Parsnips", "Onions", "Wheat", "Barley", "Maize", "Grass", "Rye A", "Sugarbeet"]
+    data = []
+    for i in range(fields):
+        data.append({
+            "estate": rng.choice(estates), "zone": f"Zone {i % 40}", "farm": "Farm", "field": f"Field {i}",
+            "ha": round(rng.uniform(2, 40), 2),
+            "history": {str(y): rng.choice(crops) for y in range(2021, 2027)},
+            "plan": {str(y): rng.choice(crops) for y in range(2027, 2033)},
+        })
+    sections = []
+    for year in (2026, 2027, 2028):
+        spans = "".join(
+            f'<div style="background: #{rng.randrange(0x1000000):06x}"></div>'
+            f'<span class="n">{crop}</span><span class="v">{rng.uniform(10, 900):,.1f} ha</span>'
+            for crop in crops
+        )
+        sections.append(f'<h2>Our crop areas — {year}</h2><div class="crops">{spans}</div><div class="sh"></div>')
+    return f"<html><body>{''.join(sections)}<script>const F={json.dumps(data)};</script></body></html>"
+
+
+def make_assets_workbook(rows, seed=4):
+    """Assets sheet (Check Type | Name | Make) plus one template sheet per
+    check type."""
+    rng = random.Random(seed)
+    check_types = ["Daily Check", "Grader Startup", "Workshop Service"]
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Assets")
+    ws.append(["Check Type", "Name of Implement", "Make"])
+    makes = list(MACHINES)
+    for i in range(rows):
+        ws.append([rng.choice(check_types), f"Machine {i}", rng.choice(makes)])
+    for check_type in check_types:
+        sheet = wb.create_sheet(check_type)
+        sheet.append(["Item", "Critical", "Photo", "Compulsory"])
+        for item in DAILY_ITEMS:
+            sheet.append([item, "Yes" if rng.random() < 0.2 else "", "", "Yes" if rng.random() < 0.1 else ""])
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def _checklists(count):
+    end = datetime.now(timezone.utc)
+    staff = make_staff(50)
+    return [c for c, _ in make_checklists(count, staff, end - timedelta(days=365), end, photo_kb=0)]
+
+
+def _near_misses(count):
+    end = datetime.now(timezone.utc)
+    return make_reports(make_staff(50), end - timedelta(days=365), end, count)["near_misses"][:count]
+
+
+def _fieldplan_file(fields):
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_fieldplan_"), "fieldplan.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(make_fieldplan_html(fields))
+    return path
+
+
+# name -> (setup(size) -> args, fn(*args)). Anything an endpoint builds per
+# request (the job matcher) is inside fn; row lists that fn changes are copied.
+CASES = {
+    "parse_workplan_excel": (
+        lambda n: (make_workplan_workbook(n), [j for j in JOBS]),
+        lambda content, jobs: _parse_workplan_excel(content, WEEK_START, JobMatcher(jobs)),
+    ),
+    "match_vehicles_to_assets": (
+        lambda n: (make_vehicle_rows(n), AssetIndex(make_assets())),
+        lambda rows, index: _match_vehicles_to_assets([dict(r) for r in rows], index),
+    ),
+    "week_rollup": (
+        lambda n: (make_weeks(1, n)[0],),
+        lambda week: week_rollup(week["week_start"], week["rows"], "current"),
+    ),
+    "costing_from_rollups": (
+        lambda n: (make_rollups(n),),
+        lambda rollups: costing_from_rollups(rollups, COLORS),
+    ),
+    "fieldplan_crop_areas": (
+        lambda n: (_fieldplan_file(n),),
+        lambda path: crop_areas_for_year(build_fieldplan_model(path), 2027),
+    ),
+    "parse_assets_workbook": (
+        lambda n: (make_assets_workbook(n),),
+        lambda content: parse_assets_workbook(content),
+    ),
+    "checklist_export_rows": (
+        lambda n: (_checklists(n),),
+        checklist_export_rows,
+    ),
+    "near_miss_export_xlsx": (
+        lambda n: (_near_misses(n),),
+        export_near_misses_xlsx,
+    ),
+}
+
+
+# ---------- measuring ----------
+
+def measure(fn, args, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    # Memory on its own run: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "min_ms": round(min(times) * 1000, 3),
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """Lines for each case against the baseline, and whether any regressed."""
+    lines, regressed = [], False
+    base = baseline.get("results", {})
+    for key, now in results.items():
+        then = base.get(key)
+        if not then:
+            lines.append(f"{key:<36} (no baseline)")
+            continue
+        slower = now["min_ms"] > then["min_ms"] * (1 + tolerance) and now["min_ms"] - then["min_ms"] > NOISE_MS
+        bigger = (now["peak_kb"] > then["peak_kb"] * (1 + memory_tolerance)
+                  and now["peak_kb"] - then["peak_kb"] > NOISE_KB)
+        regressed = regressed or slower or bigger
+        flags = " ".join(f for f, bad in (("SLOWER", slower), ("MORE MEMORY", bigger)) if bad)
+        lines.append(f"{key:<36} {then['min_ms']:10.2f} -> {now['min_ms']:10.2f} ms  "
+                     f"{then['peak_kb']:10.0f} -> {now['peak_kb']:10.0f} KB  {flags}")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", default=None, help=f"comma list; from: {', '.join(CASES)}")
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed time increase (0.25 = 25%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1, help="allowed peak memory increase")
+    parser.add_argument("--save", default=None, help="write the results to this JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    names = [c.strip() for c in args.cases.split(",") if c.strip()] if args.cases else list(CASES)
+    unknown = [c for c in names if c not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    results = {}
+    print(f"{'case':<36} {'min ms':>10} {'median ms':>10} {'peak KB':>10} {'us/row':>8}")
+    for name in names:
+        setup, fn = CASES[name]
+        for size in sizes:
+            key = f"{name}@{size}"
+            results[key] = r = measure(fn, setup(size), args.repeat)
+            print(f"{key:<36} {r['min_ms']:10.2f} {r['median_ms']:10.2f} {r['peak_kb']:10.0f} "
+                  f"{r['min_ms'] * 1000 / size:8.1f}")
+
+    output = {
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": f"{platform.node()} {platform.machine()} {os.cpu_count()} cpus",
+        "python": platform.python_version(),
+        "results": results,
+    }
+    for path in filter(None, (args.save, args.baseline if args.save_baseline else None)):
+        if path == args.baseline and os.path.exists(path):
+            # Keep baseline entries for the cases and sizes not run this time
+            with open(path) as f:
+                output["results"] = {**json.load(f).get("results", {}), **results}
+        with open(path, "w") as f:
+            json.dump(output, f, indent=2)
+            f.write("\n")
+        print(f"wrote {path}")
+    if args.save_baseline:
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print(f"\nagainst the baseline from {baseline.get('recorded_at')} on {baseline.get('machine')}:")
+    lines, regressed = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    print("\n".join(lines))
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
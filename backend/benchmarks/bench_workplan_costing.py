@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Workplan costing benchmark: builds five years of archived weeks (default
+260 weeks x 40 rows) and compares the old walk over every week's cells
+with summing the stored per-week rollups, for all time and for one month.
+With --mongo-url the weeks and rollups are also written to a scratch
+database and both request paths are timed end to end.
+
+    cd backend && python benchmarks/bench_workplan_costing.py --weeks 260
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bson
+from workplan_costing import week_rollup, costing_from_rollups, get_costing, rebuild_costing_rollups
+
+JOBS = ["Drilling", "Spraying", "Harvesting", "Grading", "Ploughing", "Irrigation", "Workshop", "Holiday"]
+COLORS = [{"id": f"c{i}", "name": f"Area {i}", "color": f"#{i:06x}"} for i in range(12)]
+
+
+def make_weeks(weeks, rows, seed=1):
+    rng = random.Random(seed)
+    first = date(2026, 1, 5) - timedelta(weeks=weeks)
+    docs = []
+    for w in range(weeks):
+        week_rows = []
+        for r in range(rows):
+            # Most people do their usual job in their usual area most of the time
+            usual = {"job": JOBS[r % len(JOBS)], "color_id": COLORS[r % len(COLORS)]["id"]}
+            days = {}
+            for d in range(7):
+                days[str(d)] = {}
+                for p in ("am", "pm"):
+                    roll = rng.random()
+                    if roll < 0.7:
+                        days[str(d)][p] = dict(usual)
+                    elif roll < 0.9:
+                        days[str(d)][p] = {"job": rng.choice(JOBS), "color_id": rng.choice(COLORS)["id"]}
+            week_rows.append({"id": f"r{r}", "name": f"Person {r}", "left": r % 15 == 0, "days": days})
+        docs.append({"week_start": (first + timedelta(weeks=w)).isoformat(), "rows": week_rows})
+    return docs
+
+
+def legacy_costing(week_docs, colors, from_date=None, until_date=None):
+    """The full row x day x cell walk the rollups replaced, kept here only as
+    the baseline."""
+    color_lookup = {c["id"]: c for c in colors}
+    color_by_hex = {c["color"]: c for c in colors}
+
+    combined = {}
+    left_combined = {}
+    total_cells = 0
+    left_total = 0
+
+    fd = None
+    ud = None
+    if from_date:
+        try: fd = datetime.strptime(from_date, "%Y-%m-%d").date()
+        except ValueError: pass
+    if until_date:
+        try: ud = datetime.strptime(until_date, "%Y-%m-%d").date()
+        except ValueError: pass
+
+    for week_doc in week_docs:
+        ws = week_doc.get("week_start")
+        if not ws:
+            continue
+        try:
+            week_monday = datetime.strptime(ws, "%Y-%m-%d").date()
+        except (ValueError, TypeError):
+            continue
+
+        for row in week_doc.get("rows", []):
+            is_left = row.get('left', False)
+            days = row.get('days', {})
+            if isinstance(days, list):
+                day_items = list(enumerate(days))
+            else:
+                day_items = [(int(k), v) for k, v in days.items()]
+
+            for day_idx, day_data in day_items:
+                day_date = week_monday + timedelta(days=int(day_idx))
+                if fd and day_date < fd:
+                    continue
+                if ud and day_date > ud:
+                    continue
+
+                for period in ['am', 'pm']:
+                    cell = (day_data or {}).get(period) or {}
+                    job = (cell.get('job') or '').strip()
+                    if not job:
+                        continue
+                    color = cell.get('color', '')
+                    color_id = cell.get('color_id', '')
+                    area = 'Unassigned'
+                    if color_id and color_id in color_lookup:
+                        area = color_lookup[color_id]['name']
+                    elif color and color in color_by_hex:
+                        area = color_by_hex[color]['name']
+                    key = f"{area}, {job}"
+                    if is_left:
+                        left_total += 1
+                        left_combined[key] = left_combined.get(key, 0) + 1
+                    else:
+                        total_cells += 1
+                        combined[key] = combined.get(key, 0) + 1
+
+    def to_breakdown(counts, total):
+        return sorted([
+            {"name": k, "area": k.split(", ", 1)[0], "job": k.split(", ", 1)[1] if ", " in k else k,
+             "count": v, "percent": round(v / total * 100, 1) if total > 0 else 0}
+            for k, v in counts.items()
+        ], key=lambda x: -x["count"])
+
+    return {
+        "combined_breakdown": to_breakdown(combined, total_cells),
+        "total_cells": total_cells,
+        "left_combined_breakdown": to_breakdown(left_combined, left_total),
+        "left_total_cells": left_total,
+        "weeks_included": len(week_docs)
+    }
+
+
+def timed(fn, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+async def timed_async(fn, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+async def bench_mongo(url, docs, month, repeat):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(url)
+    db = client["bench_workplan_costing"]
+    await client.drop_database("bench_workplan_costing")
+    await db.workplan_archive.insert_many([dict(d) for d in docs])
+    await db.workplan_colors.insert_many([dict(c) for c in COLORS])
+    await db.workplan_costing_rollups.create_index([("week_start", 1)])
+    await rebuild_costing_rollups(db)
+
+    async def legacy_request(from_date, until_date):
+        colors = await db.workplan_colors.find({}, {"_id": 0}).to_list(length=None)
+        archives = await db.workplan_archive.find({}, {"_id": 0}).to_list(length=None)
+        return legacy_costing(archives, colors, from_date, until_date)
+
+    for label, rng in (("all time", (None, None)), ("one month", month)):
+        legacy_s, _ = await timed_async(legacy_request, *rng, repeat=repeat)
+        rollup_s, _ = await timed_async(get_costing, db, *rng, repeat=repeat)
+        print(f"mongo {label:<10} legacy {legacy_s * 1000:8.0f} ms   rollups {rollup_s * 1000:8.1f} ms")
+    await client.drop_database("bench_workplan_costing")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weeks", type=int, default=260)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mongo-url", default=None, help="also time the request paths against this server")
+    args = parser.parse_args()
+
+    docs = make_weeks(args.weeks, args.rows)
+    rollups = [week_rollup(d["week_start"], d["rows"], "archive") for d in docs]
+    week_kb = sum(len(bson.encode(d)) for d in docs) / 1024
+    rollup_kb = sum(len(bson.encode(r)) for r in rollups) / 1024
+    print(f"{args.weeks} weeks x {args.rows} rows: week docs {week_kb:.0f} KB, rollups {rollup_kb:.0f} KB")
+
+    save_s, _ = timed(week_rollup, docs[-1]["week_start"], docs[-1]["rows"], "current", repeat=args.repeat)
+    print(f"rollup one week on save {save_s * 1000:8.2f} ms")
+
+    last = datetime.strptime(docs[-1]["week_start"], "%Y-%m-%d").date()
+    month = ((last - timedelta(days=30)).isoformat(), last.isoformat())
+    month_rollups = [r for r in rollups if month[0] <= (datetime.strptime(r["week_start"], "%Y-%m-%d").date() + timedelta(days=6)).isoformat() and r["week_start"] <= month[1]]
+    for label, rng, subset in (("all time", (None, None), rollups), ("one month", month, month_rollups)):
+        legacy_s, expected = timed(legacy_costing, docs, COLORS, *rng, repeat=args.repeat)
+        rollup_s, got = timed(costing_from_rollups, subset, COLORS, *rng, repeat=args.repeat)
+        # Same counts (ties may be listed in a different order)
+        for key in ("combined_breakdown", "left_combined_breakdown"):
+            assert sorted(got[key], key=lambda x: x["name"]) == sorted(expected[key], key=lambda x: x["name"]), label
+        print(f"{label:<16} legacy {legacy_s * 1000:8.0f} ms   rollups {rollup_s * 1000:8.1f} ms")
+
+    if args.mongo_url:
+        asyncio.run(bench_mongo(args.mongo_url, docs, month, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
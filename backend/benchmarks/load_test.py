@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Load test for the hot read endpoints: a pool of concurrent clients (closed
+loop, each sends its next request when the last one finishes) picks
+weighted scenarios for --duration seconds and the latency percentiles and
+throughput are reported per scenario. Results are compared with a
+committed baseline; any scenario whose p95 (or throughput) got worse by
+more than --tolerance fails the run.
+
+Seed a database first (benchmarks/synthetic_data.py), then either point at
+a running server with --base-url or let this start one (uvicorn, one
+worker) on the seeded database:
+
+    cd backend && python benchmarks/synthetic_data.py --db bench_load
+    cd backend && python benchmarks/load_test.py --db bench_load --concurrency 20 --duration 60
+    cd backend && python benchmarks/load_test.py --db bench_load --save-baseline   # after an intended change
+
+Numbers are only comparable on the same machine and dataset, so record
+the baseline where the comparisons will run.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone, timedelta
+
+import httpx
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..")
+BASELINE = os.path.join(os.path.dirname(__file__), "load_baseline.json")
+
+
+def _month(ctx):
+    until = ctx["today"] - timedelta(days=ctx["rng"].randrange(0, 365))
+    return f"from_date={(until - timedelta(days=30)).isoformat()}&until_date={until.isoformat()}"
+
+
+def _make(ctx):
+    return ctx["rng"].choice(ctx["makes"])
+
+
+# name -> (weight, path). Roughly what the dashboard, the history and
+# repairs pages and the workshop screens ask for in a working day.
+SCENARIOS = {
+    "dashboard_stats": (10, lambda ctx: "/api/dashboard/stats"),
+    "checklists_recent": (10, lambda ctx: "/api/checklists?limit=50"),
+    "checklists_by_make": (6, lambda ctx: f"/api/checklists?limit=50&make={_make(ctx)}"),
+    "checklists_by_employee_month": (4, lambda ctx: (
+        f"/api/checklists?limit=50&employee_number={ctx['rng'].choice(ctx['employees'])}&{_month(ctx)}")),
+    "checklists_unsatisfactory": (4, lambda ctx: "/api/checklists?limit=50&has_unsatisfactory=true"),
+    "checklists_with_repairs": (8, lambda ctx: "/api/checklists-with-repairs?limit=50"),
+    "repair_status_bulk": (8, lambda ctx: "/api/repair-status/bulk"),
+    "near_misses": (4, lambda ctx: "/api/near-misses?limit=100"),
+    "jobs": (5, lambda ctx: "/api/jobs"),
+    "workplan_history": (2, lambda ctx: "/api/workplan/history?limit=20"),
+    "workplan_costing_month": (2, lambda ctx: f"/api/workplan/costing?{_month(ctx)}"),
+    "workplan_costing_all": (1, lambda ctx: "/api/workplan/costing"),
+    "assets_search": (6, lambda ctx: f"/api/assets/search?q={_make(ctx)[:3]}"),
+    "admin_search": (2, lambda ctx: f"/api/admin/search?q={ctx['rng'].choice(['hydraulic', 'tyre', 'forklift', 'leak'])}"),
+    # Whole-history exports take seconds on a full dataset; opt in with --scenarios
+    "export_csv": (0, lambda ctx: "/api/checklists/export/csv"),
+    "export_excel": (0, lambda ctx: "/api/checklists/export/excel"),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, elapsed):
+    """samples: name -> list of (seconds, ok, bytes)."""
+    report = {}
+    for name, rows in sorted(samples.items()):
+        ms = sorted(s * 1000 for s, ok, _ in rows if ok)
+        report[name] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, ok, _ in rows if not ok),
+            "rps": round(len(rows) / elapsed, 2),
+            "p50_ms": round(percentile(ms, 50), 1) if ms else None,
+            "p95_ms": round(percentile(ms, 95), 1) if ms else None,
+            "p99_ms": round(percentile(ms, 99), 1) if ms else None,
+            "max_ms": round(ms[-1], 1) if ms else None,
+            "mean_kb": round(sum(b for _, _, b in rows) / len(rows) / 1024, 1),
+        }
+    return report
+
+
+def compare(result, baseline, tolerance):
+    """Lines describing each scenario against the baseline, and whether any
+    regressed: p95 more than tolerance slower, throughput more than
+    tolerance lower, or errors where there were none."""
+    lines, regressed = [], False
+    base = baseline.get("scenarios", {})
+    for name, now in result["scenarios"].items():
+        then = base.get(name)
+        if not then or not then.get("p95_ms") or not now.get("p95_ms"):
+            lines.append(f"{name:<30} (no baseline)")
+            continue
+        p95 = now["p95_ms"] / then["p95_ms"] - 1
+        rps = now["rps"] / then["rps"] - 1 if then["rps"] else 0
+        bad = p95 > tolerance or rps < -tolerance or (now["errors"] and not then["errors"])
+        regressed = regressed or bad
+        lines.append(f"{name:<30} p95 {then['p95_ms']:8.1f} -> {now['p95_ms']:8.1f} ms ({p95:+6.0%})   "
+                     f"rps {then['rps']:7.1f} -> {now['rps']:7.1f} ({rps:+6.0%}){'   REGRESSED' if bad else ''}")
+    total = result["total_rps"] / baseline["total_rps"] - 1 if baseline.get("total_rps") else 0
+    lines.append(f"{'total':<30} rps {baseline.get('total_rps', 0):7.1f} -> {result['total_rps']:7.1f} ({total:+6.0%})")
+    return lines, regressed
+
+
+async def _context(client, seed):
+    """Real makes and employee numbers from the server for the filters."""
+    makes = (await client.get("/api/assets/makes")).json() or ["John Deere"]
+    staff = (await client.get("/api/staff")).json()
+    employees = [s["employee_number"] for s in staff if s.get("employee_number")] or ["4444"]
+    return {"rng": random.Random(seed), "makes": makes, "employees": employees,
+            "today": datetime.now(timezone.utc).date()}
+
+
+async def run_load(base_url, scenarios, concurrency, duration, warmup, seed=1):
+    names = list(scenarios)
+    weights = [scenarios[n][0] for n in names]
+    samples = {n: [] for n in names}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        ctx = await _context(client, seed)
+        recording = False
+        deadline = time.perf_counter() + warmup + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                name = ctx["rng"].choices(names, weights)[0]
+                path = scenarios[name][1](ctx)
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    ok, size = response.status_code < 400, len(response.content)
+                except httpx.HTTPError:
+                    ok, size = False, 0
+                if recording:
+                    samples[name].append((time.perf_counter() - started, ok, size))
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        await asyncio.sleep(warmup)
+        recording = True
+        started = time.perf_counter()
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+    report = summarize({n: rows for n, rows in samples.items() if rows}, elapsed)
+    return {
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": f"{platform.node()} {platform.machine()} {os.cpu_count()} cpus",
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 1),
+        "total_rps": round(sum(len(rows) for rows in samples.values()) / elapsed, 2),
+        "scenarios": report,
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mongo_url, db_name):
+    """uvicorn server:app on a free port against the seeded database; waits
+    for /api/health."""
+    port = _free_port()
+    env = dict(os.environ, MONGO_URL=mongo_url, DB_NAME=db_name, LOG_LEVEL="WARNING")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--no-access-log"],
+        cwd=BACKEND, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(120):
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("server didn't come up in 60s")
+
+
+def print_report(result):
+    print(f"{'scenario':<30} {'reqs':>7} {'errs':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'KB':>8}")
+    for name, r in result["scenarios"].items():
+        cells = [f"{r[k]:8.1f}" if r[k] is not None else f"{'-':>8}" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{name:<30} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} {' '.join(cells)} {r['mean_kb']:>8.1f}")
+    print(f"total {result['total_rps']:.1f} req/s with {result['concurrency']} clients over {result['duration_s']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default=None, help="a running server (default: start one on --db)")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="bench_load", help="the seeded database")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=10, help="seconds run first and not measured")
+    parser.add_argument("--scenarios", default=None,
+                        help=f"comma list to run (weight 1 if it has none); from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput change (0.2 = 20%%)")
+    parser.add_argument("--save", default=None, help="write the results to this JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    if args.scenarios:
+        wanted = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+        unknown = [s for s in wanted if s not in SCENARIOS]
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(unknown)}")
+        scenarios = {n: (SCENARIOS[n][0] or 1, SCENARIOS[n][1]) for n in wanted}
+    else:
+        scenarios = {n: s for n, s in SCENARIOS.items() if s[0]}
+
+    process = None
+    base_url = args.base_url
+    if not base_url:
+        process, base_url = start_server(args.mongo_url, args.db)
+    try:
+        result = asyncio.run(run_load(base_url, scenarios, args.concurrency, args.duration, args.warmup))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+    print_report(result)
+
+    for path in filter(None, (args.save, args.baseline if args.save_baseline else None)):
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"wrote {path}")
+    if args.save_baseline:
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("concurrency") != result["concurrency"]:
+        print(f"note: baseline was recorded with {baseline.get('concurrency')} clients")
+    print(f"\nagainst the baseline from {baseline.get('recorded_at')} on {baseline.get('machine')}:")
+    lines, regressed = compare(result, baseline, args.tolerance)
+    print("\n".join(lines))
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
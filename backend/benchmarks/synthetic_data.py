@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Synthetic dataset for the load test: staff, machines, years of checklists
+(unsatisfactory items carry base64 photos, some get repair status and
+progress notes), GENERAL REPAIR records, safety reports, jobs with work
+entries and archived workplan weeks. Documents are built with the server's
+own models and stored the way the endpoints store them; the derived
+collections (activity days, job progress, costing rollups) and the indexes
+are then built by the same code the migrations use.
+
+    cd backend && python benchmarks/synthetic_data.py --mongo-url mongodb://localhost:27017 --db bench_load --checklists 200000 --years 5
+"""
+import os
+import sys
+import time
+import uuid
+import base64
+import random
+import asyncio
+import argparse
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from server import (
+    Staff, Asset, Checklist, ChecklistItem, Job, WorkEntry, NearMiss, Suggestion, Accident, Whistleblow,
+)
+from migrations import ensure_indexes
+from job_progress import rebuild_job_progress
+from employee_activity import rebuild_employee_activity
+from workplan_costing import rebuild_costing_rollups
+from workplan_store import pack_rows
+from bench_workplan_costing import make_weeks, COLORS
+
+BATCH_SIZE = 2000
+
+MACHINES = {
+    "John Deere": ["6155R", "6250R", "7R 330", "8R 410", "S780"],
+    "Fendt": ["724 Vario", "828 Vario", "942 Vario"],
+    "New Holland": ["T7.270", "T6.180", "CR8.90"],
+    "Claas": ["Axion 870", "Lexion 760"],
+    "Grimme": ["Varitron 470", "SE 260"],
+    "JCB": ["Fastrac 4220", "541-70 Loadall"],
+    "Manitou": ["MLT 741"],
+    "Kubota": ["M7-173"],
+}
+DAILY_ITEMS = [
+    "Engine oil level", "Coolant level", "Hydraulic oil level", "Tyre condition and pressure",
+    "Lights and indicators", "Horn", "Mirrors clean and adjusted", "Seat belt", "Fire extinguisher",
+    "Windscreen and wipers", "Brakes", "Steering", "PTO guard", "Hitch and linkage pins",
+    "Fuel level", "AdBlue level", "Grease points", "Fluid leaks", "Cab clean and tidy", "Beacon",
+]
+SERVICE_ITEMS = [
+    "Change engine oil", "Replace oil filter", "Replace fuel filters", "Replace air filter",
+    "Check belts", "Check hydraulic hoses", "Grease all points", "Check battery", "Check brakes",
+    "Check steering joints", "Check tyre wear", "Road test",
+]
+FAULTS = [
+    "Hydraulic hose weeping at the rear spool valve", "Left indicator not working",
+    "Tyre worn through to the canvas on the front right", "Coolant leak under the radiator",
+    "Brake pedal soft, needs bleeding", "Beacon cracked", "PTO guard missing a bolt",
+    "Engine warning light on at start up", "Wiper blade split", "Oil on the linkage from the top link ram",
+    "Seat belt buckle sticking", "Cab door hinge loose", "Air filter blocked, low power",
+]
+LOCATIONS = ["Farm yard", "Grading shed", "Cold store", "Workshop", "Field 12", "Packhouse", "Top road"]
+REPORT_TEXT = [
+    "Forklift reversed out of the cold store without checking behind",
+    "Spilled oil left on the workshop floor by the ramp",
+    "Pallet stacked too high next to the grading line",
+    "Trailer tailgate left unlatched on the top road",
+    "Loose guard on the conveyor drive at the packhouse",
+    "Visitor walked through the yard without a hi-vis vest",
+]
+FIRST = ["James", "Maria", "Ion", "Sarah", "Tomas", "Gary", "Elena", "Paul", "Anna", "Mark", "Lina", "Dimitar"]
+LAST = ["Smith", "Iovu", "Barnes", "Koleva", "Stoyanov", "Marsh", "Dascal", "Button", "Pearson", "Hatch"]
+
+
+def _photo(rng, kb):
+    # Random bytes don't compress, like real JPEGs
+    return {
+        "id": str(uuid.uuid4()),
+        "data": "data:image/jpeg;base64," + base64.b64encode(rng.randbytes(kb * 1024)).decode("ascii"),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def make_staff(count, seed=1):
+    rng = random.Random(seed)
+    staff = [Staff(employee_number=str(1000 + i), name=f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}",
+                   workshop_control="yes" if i % 10 == 0 else "no").dict()
+             for i in range(count)]
+    staff.append(Staff(employee_number="4444", name="Admin User", admin_control="yes", manager_control="yes").dict())
+    return staff
+
+
+def make_assets():
+    assets = []
+    for make, models in MACHINES.items():
+        for model in models:
+            check_type = "grader_startup" if make == "Grimme" else "daily_check"
+            assets.append(Asset(check_type=check_type, name=model, make=make).dict())
+    return assets
+
+
+def _timestamps(rng, count, start, end):
+    # Checks happen in the working day, spread evenly over the period
+    span_days = max(1, (end - start).days)
+    for _ in range(count):
+        day = start + timedelta(days=rng.randrange(span_days))
+        yield day.replace(hour=6, minute=0) + timedelta(minutes=rng.randrange(11 * 60))
+
+
+def make_checklists(count, staff, start, end, photo_kb=40, seed=2):
+    """Yield (checklist, repair statuses) in stored form. About 1 in 12
+    daily checks has a fault (with one or two photos), 1 in 40 records is
+    a workshop service and 1 in 50 a GENERAL REPAIR."""
+    rng = random.Random(seed)
+    machines = [(make, model) for make, models in MACHINES.items() for model in models]
+    for completed_at in _timestamps(rng, count, start, end):
+        person = rng.choice(staff)
+        make, model = rng.choice(machines)
+        roll = rng.random()
+        fields = {}
+        if roll < 0.02:
+            check_type = "GENERAL REPAIR"
+            items = []
+            fields = {"workshop_notes": rng.choice(FAULTS),
+                      "workshop_photos": [_photo(rng, photo_kb)] if rng.random() < 0.5 else []}
+        elif roll < 0.045:
+            check_type = "workshop_service"
+            items = [ChecklistItem(item=name, status="satisfactory") for name in SERVICE_ITEMS]
+            fields = {"workshop_notes": f"{rng.randrange(250, 9000)} hour service"}
+        else:
+            check_type = "grader_startup" if make == "Grimme" else "daily_check"
+            items = [ChecklistItem(item=name, status="satisfactory", compulsory=i < 3)
+                     for i, name in enumerate(DAILY_ITEMS)]
+            if rng.random() < 0.08:
+                for item in rng.sample(items[3:], rng.choice((1, 1, 1, 2))):
+                    item.status = "unsatisfactory"
+                    item.notes = rng.choice(FAULTS)
+                    item.photos = [_photo(rng, photo_kb) for _ in range(rng.choice((1, 1, 2)))]
+            for item in items:
+                if item.status == "satisfactory" and rng.random() < 0.02:
+                    item.status = "n/a"
+            if rng.random() < 0.3:
+                fields = {"fuel_mileage": str(rng.randrange(100, 12000)), "fuel_added": str(rng.randrange(0, 400))}
+        checklist = Checklist(
+            employee_number=person["employee_number"], staff_name=person["name"],
+            machine_make=make, machine_model=model, check_type=check_type,
+            checklist_items=items, completed_at=completed_at, **fields,
+        ).dict()
+        checklist["completed_at"] = checklist["completed_at"].isoformat()
+
+        # Faults logged more than a week ago have mostly been dealt with
+        repairs = []
+        faults = [i for i, item in enumerate(checklist["checklist_items"]) if item["status"] == "unsatisfactory"]
+        repair_ids = [f"{checklist['id']}-{i}" for i in faults]
+        if check_type == "GENERAL REPAIR":
+            repair_ids.append(f"{checklist['id']}-general")
+        old = completed_at < end - timedelta(days=7)
+        for repair_id in repair_ids:
+            if not old and rng.random() < 0.5:
+                continue
+            done = old and rng.random() < 0.9
+            notes = [{"note": "Parts ordered", "added_by": "Workshop", "timestamp": completed_at.isoformat()}] \
+                if rng.random() < 0.4 else []
+            repairs.append({"repair_id": repair_id, "acknowledged": True, "completed": done,
+                            "progress_notes": notes})
+        yield checklist, repairs
+
+
+def _reporter(rng, staff):
+    if rng.random() < 0.3:
+        return {"is_anonymous": True, "submitted_by": None, "employee_number": None}
+    person = rng.choice(staff)
+    return {"is_anonymous": False, "submitted_by": person["name"], "employee_number": person["employee_number"]}
+
+
+def make_reports(staff, start, end, near_misses, seed=3):
+    """Safety reports in the rough ratio the farm sees them: per 100 near
+    misses, 15 suggestions, 5 accidents and 1 whistleblowing report."""
+    rng = random.Random(seed)
+    reports = {"near_misses": [], "suggestions": [], "accidents": [], "whistleblowing": []}
+    for at in _timestamps(rng, near_misses, start, end):
+        old = at < end - timedelta(days=30)
+        reports["near_misses"].append(NearMiss(
+            description=rng.choice(REPORT_TEXT), location=rng.choice(LOCATIONS), created_at=at.isoformat(),
+            acknowledged=old or rng.random() < 0.5, severity=rng.choice(("red", "orange", "green")),
+            progress="completed" if old else rng.choice(("not_started", "in_progress")),
+            **_reporter(rng, staff),
+        ).dict())
+    for at in _timestamps(rng, max(1, near_misses * 15 // 100), start, end):
+        reports["suggestions"].append(Suggestion(
+            title=f"Improve the {rng.choice(LOCATIONS).lower()}", description=rng.choice(REPORT_TEXT),
+            category=rng.choice(("Financial", "Well Being", "Health and Safety")), location=rng.choice(LOCATIONS),
+            created_at=at.isoformat(), status=rng.choice(("new", "reviewed", "implemented", "declined")),
+            **_reporter(rng, staff),
+        ).dict())
+    for at in _timestamps(rng, max(1, near_misses * 5 // 100), start, end):
+        injured, reporter = rng.choice(staff), rng.choice(staff)
+        reports["accidents"].append(Accident(
+            injured_name=injured["name"], reporter_name=reporter["name"],
+            accident_date=at.date().isoformat(), accident_time=at.strftime("%H:%M"),
+            accident_location=rng.choice(LOCATIONS), accident_description=rng.choice(REPORT_TEXT),
+            injury_details="Bruised hand", created_at=at.isoformat(),
+            status=rng.choice(("new", "investigating", "closed")),
+        ).dict())
+    for at in _timestamps(rng, max(1, near_misses // 100), start, end):
+        reports["whistleblowing"].append(Whistleblow(
+            title="Concern", description=rng.choice(REPORT_TEXT), category="Health and Safety",
+            created_at=at.isoformat(), status=rng.choice(("new", "investigating", "resolved")),
+        ).dict())
+    return reports
+
+
+def make_jobs(staff, start, end, per_year=30, seed=4):
+    """Field jobs (drilling, spraying, harvesting...) each with daily work
+    entries until the area is done; the last few are still active."""
+    rng = random.Random(seed)
+    jobs, entries = [], []
+    years = max(1, round((end - start).days / 365))
+    crops = ["Carrot", "Parsnip", "Potato", "Onion", "Wheat", "Barley"]
+    tasks = ["Drilling", "Spraying", "Harvesting", "Ploughing", "Bed Forming"]
+    for n in range(per_year * years):
+        started = start + timedelta(days=(end - start).days * n // (per_year * years))
+        area = round(rng.uniform(10, 120), 1)
+        job = Job(name=f"{rng.choice(crops)} {rng.choice(tasks)} {n}", total_area=area,
+                  target_date=(started + timedelta(days=30)).date().isoformat(),
+                  created_at=started.isoformat()).dict()
+        done, day = 0.0, started
+        while done < area and day < end:
+            ha = min(area - done, round(rng.uniform(2, 12), 1))
+            done += ha
+            entries.append(WorkEntry(job_id=job["id"], hectares_completed=ha,
+                                     date_completed=day.date().isoformat(),
+                                     entered_by=rng.choice(staff)["name"], entered_at=day.isoformat()).dict())
+            day += timedelta(days=rng.choice((1, 1, 2, 3)))
+        jobs.append(job)
+    return jobs, entries
+
+
+def make_archive(weeks, rows):
+    """Archived workplan weeks as archive_week stores them."""
+    archived_at = datetime.now(timezone.utc).isoformat()
+    return [{"week_start": doc["week_start"], "rows_z": pack_rows(doc["rows"]), "row_count": len(doc["rows"]),
+             "archived_at": archived_at} for doc in make_weeks(weeks, rows)]
+
+
+async def _insert(collection, docs):
+    for i in range(0, len(docs), BATCH_SIZE):
+        await collection.insert_many(docs[i:i + BATCH_SIZE], ordered=False)
+
+
+async def seed(db, checklists=200_000, years=5, staff_count=80, photo_kb=40, near_misses=None, workplan_rows=40):
+    """Fill db (which should be empty) and build the derived collections and
+    indexes. Returns the number of documents per collection."""
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    start = end - timedelta(days=365 * years)
+    staff = make_staff(staff_count)
+    await _insert(db.staff, [dict(s) for s in staff])
+    await _insert(db.assets, make_assets())
+
+    batch, repairs = [], []
+    for checklist, statuses in make_checklists(checklists, staff, start, end, photo_kb):
+        batch.append(checklist)
+        repairs += statuses
+        if len(batch) == BATCH_SIZE:
+            await db.checklists.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.checklists.insert_many(batch, ordered=False)
+    await _insert(db.repair_status, repairs)
+
+    reports = make_reports(staff, start, end, near_misses if near_misses is not None else checklists // 60)
+    for name, docs in reports.items():
+        await _insert(db[name], docs)
+    jobs, entries = make_jobs(staff, start, end)
+    await _insert(db.jobs, jobs)
+    await _insert(db.work_entries, entries)
+    await _insert(db.workplan_archive, make_archive(52 * years, workplan_rows))
+    await _insert(db.workplan_colors, [dict(c) for c in COLORS])
+
+    await ensure_indexes(db, force=True)
+    await rebuild_employee_activity(db)
+    await rebuild_job_progress(db)
+    await rebuild_costing_rollups(db)
+    return {name: await db[name].estimated_document_count() for name in sorted(await db.list_collection_names())}
+
+
+async def seed_database(url, name, args):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(url)
+    await client.drop_database(name)
+    started = time.perf_counter()
+    counts = await seed(client[name], checklists=args.checklists, years=args.years,
+                        staff_count=args.staff, photo_kb=args.photo_kb)
+    stats = await client[name].command("dbStats")
+    print(f"seeded {name} in {time.perf_counter() - started:.0f}s, {stats.get('dataSize', 0) / 2**20:.0f} MB")
+    for collection, count in counts.items():
+        print(f"  {collection:<28} {count:>9}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="bench_load", help="dropped and re-created")
+    parser.add_argument("--checklists", type=int, default=200_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--staff", type=int, default=80)
+    parser.add_argument("--photo-kb", type=int, default=40, help="size of each synthetic photo")
+    args = parser.parse_args()
+    asyncio.run(seed_database(args.mongo_url, args.db, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Server-side filters for the checklist history (GET /api/checklists).
+
+Every filtered page is sorted newest first, so each planned index puts the
+equality field(s) first and completed_at last: MongoDB walks the index in
+completed_at order, skips/limits without an in-memory sort, and a date
+range narrows the same completed_at key.
+
+  filter present (first wins)      index
+  employee_number                  employee_number, completed_at
+  make (+ model)                   machine_make, machine_model, completed_at
+  model only                       machine_model, completed_at
+  has_unsatisfactory=true          checklist_items.status, completed_at
+  check_type                       check_type, completed_at
+  status                           status, completed_at
+  nothing / dates only             completed_at
+
+Whatever else is filtered on is checked against the documents that index
+range returns. The chosen index is passed as a hint so the plan doesn't
+flip between pages of the same view.
+"""
+from datetime import date, timedelta
+
+# ensure_indexes() creates these (unnamed, so they match indexes that
+# already exist with the same keys)
+CHECKLIST_INDEXES = {
+    "by_date": [("completed_at", -1)],
+    "by_employee_date": [("employee_number", 1), ("completed_at", -1)],
+    "by_make_model_date": [("machine_make", 1), ("machine_model", 1), ("completed_at", -1)],
+    "by_model_date": [("machine_model", 1), ("completed_at", -1)],
+    "by_item_status_date": [("checklist_items.status", 1), ("completed_at", -1)],
+    "by_type_date": [("check_type", 1), ("completed_at", -1)],
+    "by_status_date": [("status", 1), ("completed_at", -1)],
+}
+
+
+def _split(value):
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def _day(value, name):
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+
+
+def build_checklist_query(from_date=None, until_date=None, employee_number=None, make=None,
+                          model=None, check_type=None, exclude_check_type=None,
+                          has_unsatisfactory=None, status=None):
+    """The Mongo filter for the history filters. check_type and
+    exclude_check_type are comma lists; until_date is inclusive. Raises
+    ValueError for a bad date."""
+    query = {}
+    if from_date or until_date:
+        # completed_at is stored as an ISO string, so date prefixes compare
+        query["completed_at"] = {}
+        if from_date:
+            query["completed_at"]["$gte"] = _day(from_date, "from_date").isoformat()
+        if until_date:
+            query["completed_at"]["$lt"] = (_day(until_date, "until_date") + timedelta(days=1)).isoformat()
+    if employee_number:
+        query["employee_number"] = employee_number
+    if make:
+        query["machine_make"] = make
+    if model:
+        query["machine_model"] = model
+    types = _split(check_type)
+    excluded = _split(exclude_check_type)
+    if types:
+        types = [t for t in types if t not in excluded]
+        query["check_type"] = types[0] if len(types) == 1 else {"$in": types}
+    elif excluded:
+        query["check_type"] = {"$nin": excluded}
+    if has_unsatisfactory is True:
+        query["checklist_items.status"] = "unsatisfactory"
+    elif has_unsatisfactory is False:
+        query["checklist_items.status"] = {"$ne": "unsatisfactory"}
+    if status:
+        query["status"] = status
+    return query
+
+
+def plan_index(query):
+    """Keys of the planned index for a query from build_checklist_query()."""
+    return CHECKLIST_INDEXES[_plan(query)]
+
+
+def _plan(query):
+    check_type = query.get("check_type")
+    if "employee_number" in query:
+        return "by_employee_date"
+    if "machine_make" in query:
+        return "by_make_model_date"
+    if "machine_model" in query:
+        return "by_model_date"
+    if query.get("checklist_items.status") == "unsatisfactory":
+        return "by_item_status_date"
+    # $nin can't use the check_type index usefully
+    if check_type is not None and not (isinstance(check_type, dict) and "$nin" in check_type):
+        return "by_type_date"
+    if "status" in query:
+        return "by_status_date"
+    return "by_date"
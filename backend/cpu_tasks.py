@@ -0,0 +1,220 @@
+"""
+Pure CPU-bound helpers that the API runs through executors.run_cpu().
+Everything here is a top-level function with plain-data arguments and
+results, and the module has no import-time side effects, so the process
+pool can import and pickle it with any start method.
+"""
+import io
+
+
+# ---- QR codes ----
+
+def render_qr_png(qr_data: str) -> bytes:
+    """Render a QR code for qr_data as PNG bytes."""
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format='PNG')
+    return img_bytes.getvalue()
+
+
+# ---- Checklist exports ----
+
+CHECKLIST_EXPORT_HEADERS = ["ID", "Staff Name", "Machine Make", "Machine Model", "Check Type", "Completed At", "Status", "Satisfactory", "Unsatisfactory", "Total", "Notes", "Workshop Details"]
+CHECKLIST_EXPORT_WIDTHS = [38, 20, 20, 25, 15, 22, 12, 12, 14, 8, 50, 50]
+
+
+def checklist_export_rows(checklists):
+    """One row per checklist for the CSV and Excel exports: item counts and
+    fault notes for daily/grader checks, the workshop notes for the rest."""
+    rows = []
+    for checklist in checklists:
+        check_type = checklist.get('check_type', '')
+        if check_type in ['daily_check', 'grader_startup']:
+            items = checklist.get('checklist_items', [])
+            items_satisfactory = sum(1 for item in items if item.get('status') == 'satisfactory')
+            items_unsatisfactory = sum(1 for item in items if item.get('status') == 'unsatisfactory')
+            items_total = len(items)
+            # Limit notes length to prevent huge cells
+            notes_list = [item.get('notes', '')[:100] for item in items if item.get('notes')]
+            notes = "; ".join(notes_list)[:500] if notes_list else ""
+            workshop_details = ""
+        else:
+            items_satisfactory = 0
+            items_unsatisfactory = 0
+            items_total = 0
+            notes = ""
+            workshop_details = (checklist.get('workshop_notes') or '')[:500]
+
+        rows.append([
+            checklist.get('id', ''),
+            checklist.get('staff_name', ''),
+            checklist.get('machine_make', ''),
+            checklist.get('machine_model', ''),
+            check_type,
+            str(checklist.get('completed_at', '')),
+            checklist.get('status', ''),
+            items_satisfactory,
+            items_unsatisfactory,
+            items_total,
+            notes,
+            workshop_details
+        ])
+    return rows
+
+
+# ---- Safety report Excel exports ----
+
+def build_export_workbook(title, headers, header_color, rows, widths) -> bytes:
+    """Single-sheet workbook with a coloured, centred header row and fixed
+    column widths. Returns the .xlsx bytes."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = title
+
+    header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal="center")
+
+    for row in rows:
+        ws.append(row)
+
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def _date_part(value):
+    return value[:10] if value else ""
+
+
+NEAR_MISS_HEADERS = ["ID", "Date", "Location", "Description", "Submitted By", "Anonymous", "Acknowledged", "Acknowledged By", "Acknowledged Date"]
+NEAR_MISS_WIDTHS = [40, 12, 20, 50, 20, 12, 14, 20, 18]
+
+
+def near_miss_export_rows(near_misses):
+    return [[
+        nm.get("id", ""),
+        _date_part(nm.get("created_at")),
+        nm.get("location", ""),
+        nm.get("description", ""),
+        nm.get("submitted_by", "") if not nm.get("is_anonymous") else "Anonymous",
+        "Yes" if nm.get("is_anonymous") else "No",
+        "Yes" if nm.get("acknowledged") else "No",
+        nm.get("acknowledged_by", ""),
+        _date_part(nm.get("acknowledged_at")),
+    ] for nm in near_misses]
+
+
+def export_near_misses_xlsx(near_misses) -> bytes:
+    return build_export_workbook("Near Misses", NEAR_MISS_HEADERS, "FF6B6B",
+                                 near_miss_export_rows(near_misses), NEAR_MISS_WIDTHS)
+
+
+SUGGESTION_HEADERS = ["ID", "Date", "Title", "Category", "Location", "Description", "Submitted By", "Anonymous", "Status", "Reviewed By", "Review Notes"]
+SUGGESTION_WIDTHS = [40, 12, 25, 18, 15, 50, 20, 12, 14, 20, 40]
+
+
+def suggestion_export_rows(suggestions):
+    return [[
+        sg.get("id", ""),
+        _date_part(sg.get("created_at")),
+        sg.get("title", ""),
+        sg.get("category", ""),
+        sg.get("location", ""),
+        sg.get("description", ""),
+        sg.get("submitted_by", "") if not sg.get("is_anonymous") else "Anonymous",
+        "Yes" if sg.get("is_anonymous") else "No",
+        sg.get("status", "new").capitalize(),
+        sg.get("reviewed_by", ""),
+        sg.get("review_notes", ""),
+    ] for sg in suggestions]
+
+
+def export_suggestions_xlsx(suggestions) -> bytes:
+    return build_export_workbook("Suggestions", SUGGESTION_HEADERS, "4ECDC4",
+                                 suggestion_export_rows(suggestions), SUGGESTION_WIDTHS)
+
+
+ACCIDENT_HEADERS = [
+    "Report No", "Date", "Time", "Location",
+    "Injured Name", "Injured Occupation", "Injured Address",
+    "Reporter Name", "Reporter Occupation",
+    "Accident Description", "Injury Details",
+    "Employee Consent", "RIDDOR Reportable", "RIDDOR How Reported", "RIDDOR Date Reported",
+    "Status", "Investigation Notes", "Investigated By"
+]
+ACCIDENT_WIDTHS = [12, 12, 10, 25, 20, 18, 35, 20, 18, 50, 35, 16, 16, 20, 18, 14, 40, 20]
+
+
+def accident_export_rows(accidents):
+    return [[
+        acc.get("report_number", ""),
+        acc.get("accident_date", ""),
+        acc.get("accident_time", ""),
+        acc.get("accident_location", ""),
+        acc.get("injured_name", ""),
+        acc.get("injured_occupation", ""),
+        f"{acc.get('injured_address', '')} {acc.get('injured_postcode', '')}".strip(),
+        acc.get("reporter_name", ""),
+        acc.get("reporter_occupation", ""),
+        acc.get("accident_description", ""),
+        acc.get("injury_details", ""),
+        "Yes" if acc.get("employee_consent") else "No",
+        "Yes" if acc.get("riddor_reportable") else "No",
+        acc.get("riddor_how_reported", ""),
+        acc.get("riddor_date_reported", ""),
+        acc.get("status", "new").capitalize(),
+        acc.get("investigation_notes", ""),
+        acc.get("investigated_by", ""),
+    ] for acc in accidents]
+
+
+def export_accidents_xlsx(accidents) -> bytes:
+    return build_export_workbook("Accidents", ACCIDENT_HEADERS, "9B59B6",
+                                 accident_export_rows(accidents), ACCIDENT_WIDTHS)
+
+
+WHISTLEBLOWING_HEADERS = ["ID", "Date", "Title", "Category", "Location", "Description", "Submitted By", "Anonymous", "Status", "Investigation Notes", "Investigated By"]
+WHISTLEBLOWING_WIDTHS = [40, 12, 30, 18, 15, 50, 20, 12, 14, 40, 20]
+
+
+def whistleblowing_export_rows(reports):
+    return [[
+        rp.get("id", ""),
+        _date_part(rp.get("created_at")),
+        rp.get("title", ""),
+        rp.get("category", ""),
+        rp.get("location", ""),
+        rp.get("description", ""),
+        rp.get("submitted_by", "") if not rp.get("is_anonymous") else "Anonymous",
+        "Yes" if rp.get("is_anonymous") else "No",
+        rp.get("status", "new").capitalize(),
+        rp.get("investigation_notes", ""),
+        rp.get("investigated_by", ""),
+    ] for rp in reports]
+
+
+def export_whistleblowing_xlsx(reports) -> bytes:
+    return build_export_workbook("Whistleblowing", WHISTLEBLOWING_HEADERS, "F39C12",
+                                 whistleblowing_export_rows(reports), WHISTLEBLOWING_WIDTHS)
@@ -0,0 +1,230 @@
+"""
+Per-employee activity buckets: one document per employee per day in
+db.employee_activity_days, {employee_number, day, staff_name, total,
+by_type: {check_type: count}, last_activity}, bumped with a single upsert
+whenever a checklist is saved.
+
+Activity for any window (7 days, 90 days, year to date) is a sum over at
+most one bucket per employee per day, instead of pulling the window's
+checklists into Python. rebuild_employee_activity() recomputes the buckets
+from db.checklists.
+
+A rebuild runs alongside saves: it counts the checklists once, then
+brings each bucket to the count with $inc/$unset updates keyed on the
+bucket's _id and its total as read, so a save that bumps a bucket in
+between makes that update miss and the bucket is reconciled again on the
+next pass instead of the bump being overwritten. Checklists saved in the
+last minute are recounted on every pass, as the full count may have
+missed them.
+"""
+import logging
+from datetime import datetime, timezone, timedelta
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Checklists saved within this window of a rebuild starting are counted
+# per pass rather than by the full aggregation
+RECENT_WINDOW = timedelta(minutes=1)
+RECONCILE_PASSES = 5
+
+
+def _type_key(check_type):
+    # Field names can't contain dots or start with $
+    return (check_type or "unknown").replace(".", "_").lstrip("$") or "unknown"
+
+
+async def record_checklist(db, checklist):
+    """Count a newly saved checklist (completed_at as an ISO string)."""
+    completed_at = checklist.get("completed_at") or ""
+    await db.employee_activity_days.update_one(
+        {"employee_number": checklist.get("employee_number") or "Unknown", "day": completed_at[:10]},
+        {
+            "$inc": {"total": 1, f"by_type.{_type_key(checklist.get('check_type'))}": 1},
+            "$max": {"last_activity": completed_at},
+            "$set": {"staff_name": checklist.get("staff_name") or "Unknown"},
+        },
+        upsert=True,
+    )
+
+
+def _day_range(days=None, from_date=None, until_date=None):
+    query = {}
+    if days and not from_date:
+        from_date = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat()
+    if from_date:
+        query.setdefault("day", {})["$gte"] = from_date[:10]
+    if until_date:
+        query.setdefault("day", {})["$lte"] = until_date[:10]
+    return query
+
+
+async def activity_summary(db, days=None, from_date=None, until_date=None):
+    """Checks per employee in the window, with a breakdown by check type and
+    their latest activity in it. Most active first."""
+    pipeline = [
+        {"$match": _day_range(days, from_date, until_date)},
+        {"$sort": {"day": 1}},
+        {"$project": {
+            "employee_number": 1, "staff_name": 1, "last_activity": 1,
+            "types": {"$objectToArray": {"$ifNull": ["$by_type", {}]}},
+        }},
+        {"$unwind": "$types"},
+        # One row per employee and check type...
+        {"$group": {
+            "_id": {"employee": "$employee_number", "type": "$types.k"},
+            "count": {"$sum": "$types.v"},
+            "staff_name": {"$last": "$staff_name"},
+            "last_activity": {"$max": "$last_activity"},
+        }},
+        # ...then one per employee
+        {"$group": {
+            "_id": "$_id.employee",
+            "total_checks": {"$sum": "$count"},
+            "by_type": {"$push": {"k": "$_id.type", "v": "$count"}},
+            "staff_name": {"$last": "$staff_name"},
+            "last_activity": {"$max": "$last_activity"},
+        }},
+        {"$sort": {"total_checks": -1, "_id": 1}},
+    ]
+    return [
+        {
+            "employee_number": row["_id"],
+            "staff_name": row.get("staff_name") or "Unknown",
+            "total_checks": row["total_checks"],
+            "by_type": {t["k"]: t["v"] for t in row["by_type"]},
+            "last_activity": row.get("last_activity"),
+        }
+        async for row in db.employee_activity_days.aggregate(pipeline)
+    ]
+
+
+async def inactive_staff(db, days=30):
+    """Active staff with no checklists in the last `days` days, with the
+    date of their last one ever (None if they've never done one)."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat()
+    recent = set(await db.employee_activity_days.distinct("employee_number", {"day": {"$gte": cutoff}}))
+    staff = await db.staff.find(
+        {"active": {"$ne": False}, "employee_number": {"$nin": [None, ""]}},
+        {"_id": 0, "employee_number": 1, "name": 1},
+    ).to_list(length=None)
+    idle = [s for s in staff if s["employee_number"] not in recent]
+    last_seen = {
+        row["_id"]: row["last_activity"]
+        async for row in db.employee_activity_days.aggregate([
+            {"$match": {"employee_number": {"$in": [s["employee_number"] for s in idle]}}},
+            {"$group": {"_id": "$employee_number", "last_activity": {"$max": "$last_activity"}}},
+        ])
+    }
+    result = [
+        {"employee_number": s["employee_number"], "staff_name": s.get("name"),
+         "last_activity": last_seen.get(s["employee_number"])}
+        for s in idle
+    ]
+    # Longest idle first; never active at the top
+    result.sort(key=lambda r: r["last_activity"] or "")
+    return result
+
+
+async def rebuild_employee_activity(db):
+    """Recompute every bucket from db.checklists. Returns the number of
+    buckets changed."""
+    cutoff = ObjectId.from_datetime(datetime.now(timezone.utc) - RECENT_WINDOW)
+    settled = await _count(db, {"_id": {"$not": {"$gte": cutoff}}})
+    changed = 0
+    for _ in range(RECONCILE_PASSES):
+        written, done = await _reconcile(db, settled, cutoff)
+        changed += written
+        if done:
+            break
+    else:
+        logger.warning("Employee activity buckets still changing after the rebuild; run it again to settle them")
+    logger.info(f"Rebuilt employee activity: {changed} buckets changed")
+    return changed
+
+
+async def _count(db, match, buckets=None):
+    """{(employee_number, day): bucket fields} for the matching checklists,
+    added into buckets if given."""
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "employee_number": {"$ifNull": ["$employee_number", "Unknown"]},
+            "staff_name": {"$ifNull": ["$staff_name", "Unknown"]},
+            "check_type": {"$ifNull": ["$check_type", "unknown"]},
+            "completed_at": {"$toString": "$completed_at"},
+        }},
+        {"$sort": {"completed_at": 1}},
+        {"$group": {
+            "_id": {
+                "employee": "$employee_number",
+                "day": {"$substrCP": ["$completed_at", 0, 10]},
+                "type": "$check_type",
+            },
+            "count": {"$sum": 1},
+            "staff_name": {"$last": "$staff_name"},
+            "last_activity": {"$max": "$completed_at"},
+        }},
+    ]
+    buckets = buckets if buckets is not None else {}
+    async for row in db.checklists.aggregate(pipeline, allowDiskUse=True):
+        key = (row["_id"]["employee"], row["_id"]["day"])
+        b = buckets.setdefault(key, {"total": 0, "by_type": {}, "staff_name": row["staff_name"], "last_activity": ""})
+        b["total"] += row["count"]
+        type_key = _type_key(row["_id"]["type"])
+        b["by_type"][type_key] = b["by_type"].get(type_key, 0) + row["count"]
+        if row["last_activity"] > b["last_activity"]:
+            b["last_activity"] = row["last_activity"]
+            b["staff_name"] = row["staff_name"]
+    return buckets
+
+
+def _update(bucket, want):
+    """The update taking a stored bucket to the wanted counts, or None."""
+    inc, unset = {}, {}
+    if want["total"] != bucket.get("total"):
+        inc["total"] = want["total"] - (bucket.get("total") or 0)
+    have = bucket.get("by_type") or {}
+    for type_key in have.keys() | want["by_type"].keys():
+        count = want["by_type"].get(type_key)
+        if not count:
+            unset[f"by_type.{type_key}"] = ""
+        elif count != have.get(type_key):
+            inc[f"by_type.{type_key}"] = count - (have.get(type_key) or 0)
+    fields = {k: want[k] for k in ("staff_name", "last_activity") if bucket.get(k) != want[k]}
+    update = {op: v for op, v in (("$inc", inc), ("$unset", unset), ("$set", fields)) if v}
+    return update or None
+
+
+async def _reconcile(db, settled, cutoff):
+    """One pass over the stored buckets. Returns (updates sent, whether
+    they all applied)."""
+    # Buckets before the recent checklists: a save in between then shows up
+    # as a changed total, never as a count the bucket doesn't have yet
+    stored = {(b["employee_number"], b["day"]): b async for b in db.employee_activity_days.find({})}
+    wanted = {key: {**b, "by_type": dict(b["by_type"])} for key, b in settled.items()}
+    await _count(db, {"_id": {"$gte": cutoff}}, wanted)
+
+    ops = []
+    for key in stored.keys() | wanted.keys():
+        bucket, want = stored.get(key), wanted.get(key)
+        if bucket is None:
+            ops.append(InsertOne({"employee_number": key[0], "day": key[1], **want}))
+        elif want is None:
+            ops.append(DeleteOne({"_id": bucket["_id"], "total": bucket.get("total")}))
+        else:
+            update = _update(bucket, want)
+            if update:
+                ops.append(UpdateOne({"_id": bucket["_id"], "total": bucket.get("total")}, update))
+    if not ops:
+        return 0, True
+    try:
+        result = await db.employee_activity_days.bulk_write(ops, ordered=False)
+        applied = result.inserted_count + result.matched_count + result.deleted_count
+    except BulkWriteError as e:
+        # A save created the bucket first; the next pass updates it
+        applied = e.details.get("nInserted", 0) + e.details.get("nMatched", 0) + e.details.get("nRemoved", 0)
+    return applied, applied == len(ops)
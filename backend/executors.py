@@ -0,0 +1,148 @@
+"""
+Shared executors for CPU-bound work (Excel builds, QR rendering, FieldPlan
+parsing) so it runs off the event loop.
+
+run_cpu() sends work to a process pool (falls back to the thread pool if
+CPU_PROCESS_WORKERS=0); run_in_thread() is for work that isn't picklable or
+that mostly waits on I/O. Both keep simple queue-depth and latency stats.
+"""
+import os
+import time
+import asyncio
+import logging
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CPU_THREAD_WORKERS = int(os.environ.get("CPU_THREAD_WORKERS", "4"))
+CPU_PROCESS_WORKERS = int(os.environ.get("CPU_PROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+LATENCY_SAMPLES = 500  # recent calls kept per pool for p50/p95
+
+
+def _timed_call(fn, args, kwargs):
+    """Runs inside the worker: returns (started, finished, result) so the
+    caller can split queue wait from run time. Wall-clock time is used
+    because it is comparable across processes."""
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+
+class _PoolStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.wait_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.run_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.total_ms = deque(maxlen=LATENCY_SAMPLES)
+
+    def snapshot(self):
+        def pct(samples, p):
+            if not samples:
+                return None
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "max_in_flight": self.max_in_flight,
+            "wait_ms_p50": pct(self.wait_ms, 0.5),
+            "wait_ms_p95": pct(self.wait_ms, 0.95),
+            "run_ms_p50": pct(self.run_ms, 0.5),
+            "run_ms_p95": pct(self.run_ms, 0.95),
+            "total_ms_p50": pct(self.total_ms, 0.5),
+            "total_ms_p95": pct(self.total_ms, 0.95),
+        }
+
+
+class ExecutorPools:
+    def __init__(self, thread_workers=CPU_THREAD_WORKERS, process_workers=CPU_PROCESS_WORKERS):
+        self.thread_workers = max(1, thread_workers)
+        self.process_workers = max(0, process_workers)
+        self._threads = None
+        self._processes = None
+        self._stats = {
+            "thread": _PoolStats("thread", self.thread_workers),
+            "process": _PoolStats("process", self.process_workers),
+        }
+
+    def _thread_pool(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="cpu")
+        return self._threads
+
+    def _process_pool(self):
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+            logger.info(f"Started process pool with {self.process_workers} workers")
+        return self._processes
+
+    async def _submit(self, kind, pool, fn, args, kwargs):
+        stats = self._stats[kind]
+        stats.submitted += 1
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        submitted_at = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            started, finished, result = await loop.run_in_executor(
+                pool, functools.partial(_timed_call, fn, args, kwargs)
+            )
+        except Exception:
+            stats.failed += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+        stats.completed += 1
+        stats.wait_ms.append(max(0.0, started - submitted_at) * 1000)
+        stats.run_ms.append((finished - started) * 1000)
+        stats.total_ms.append((time.time() - submitted_at) * 1000)
+        return result
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        """Run a pure, picklable top-level function in the process pool."""
+        if self.process_workers == 0:
+            return await self.run_in_thread(fn, *args, **kwargs)
+        return await self._submit("process", self._process_pool(), fn, args, kwargs)
+
+    async def run_in_thread(self, fn, *args, **kwargs):
+        """Run a function in the shared thread pool."""
+        return await self._submit("thread", self._thread_pool(), fn, args, kwargs)
+
+    def stats(self):
+        return {name: s.snapshot() for name, s in self._stats.items()}
+
+    def shutdown(self, wait=True):
+        """Stop both pools; in-flight work finishes first when wait=True."""
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait, cancel_futures=not wait)
+            self._processes = None
+        if self._threads is not None:
+            self._threads.shutdown(wait=wait, cancel_futures=not wait)
+            self._threads = None
+        logger.info("Executor pools shut down")
+
+
+# Global instance
+executor_pools = ExecutorPools()
+
+
+async def run_cpu(fn, *args, **kwargs):
+    return await executor_pools.run_cpu(fn, *args, **kwargs)
+
+
+async def run_in_thread(fn, *args, **kwargs):
+    return await executor_pools.run_in_thread(fn, *args, **kwargs)
@@ -0,0 +1,191 @@
+"""
+Parsed FieldPlan model: the local fieldplan.html is parsed once per file
+version into fields, estates, published crop areas per year and our
+computed crop areas per year. The model is kept in memory (checked
+against the file's mtime/size) and in db.fieldplan_model (keyed by content
+hash) so restarts and other workers don't need to re-parse the page.
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+
+from executors import run_cpu, run_in_thread
+
+logger = logging.getLogger(__name__)
+
+# In-memory copy of the current model
+_model_cache = {
+    "model": None,
+    "mtime": None,
+    "size": None,
+}
+
+VEG = ["Potatoes", "Salad Potatoes", "Seed Potatoes", "Carrots", "Parsnips", "Onions"]
+NEVER = ["Uncropped", "Carbon Trees", "Solar", "Chickens", "Pheasants"]
+SOL = ["Potatoes", "Salad Potatoes", "Seed Potatoes"]
+
+
+def _field_crop(fld, y):
+    return (fld.get("history", {}).get(y, "") if y <= "2026"
+            else fld.get("plan", {}).get(y, ""))
+
+
+def _field_is_ours(fld, y):
+    """The FieldPlan's own "is it ours?" rules (verified to reproduce its
+    published figures exactly)."""
+    c = _field_crop(fld, y)
+    if not c or c in NEVER or c == "Pigs":
+        return False
+    e = fld.get("estate", "")
+    if c in ("Grass", "Woodland", "CS MT"):
+        return e in ("Wretham", "Edwardstone/Borehouse")
+    if c == "ELS/HLS":
+        return e == "Wretham" and y < "2027"
+    if e == "Rackham Farms":
+        return c in SOL
+    if e == "Euston":
+        if c in ("Maize", "Euston Rye", "Sugarbeet", "Veg (RLLONG)"):
+            return False
+        return True if y >= "2027" else (c in VEG)
+    if e == "Pickenham":
+        return c in VEG or c == "Rye A"
+    if e == "Blakeney" or e == "Gooderham":
+        return c in VEG
+    if e == "Beard":
+        return c == "Seed Potatoes"
+    if e in ("Warren", "David Hill"):
+        return c in VEG or c == "Seed Potatoes"
+    if e in ("Chandler", "Wretham", "Edwardstone/Borehouse"):
+        return True
+    if c == "Maize":
+        return e in ("Wretham", "Chandler")
+    return True
+
+
+def _published_crop_areas(html):
+    """{year: [{name, ha, color}]} from every 'Our crop areas — <year>' section."""
+    by_year = {}
+    for m in re.finditer(r"Our crop areas\s*[—-]\s*(\d{4})\s*</h2>", html):
+        seg = html[m.end():]
+        # Stop at the next section heading, and before the partner-farmed list
+        for marker in ('<div class="sh"', 'Partner-farmed'):
+            end = seg.find(marker)
+            if end != -1:
+                seg = seg[:end]
+        crops = []
+        for cm in re.finditer(
+            r'background:\s*(#[0-9A-Fa-f]{3,6})"></div>'
+            r'<span[^>]*>([^<]+)</span>'
+            r'<span[^>]*>([\d,\.]+)\s*ha</span>',
+            seg,
+        ):
+            color, name, ha = cm.group(1), cm.group(2).strip(), cm.group(3).replace(",", "")
+            # Belt-and-braces: never count partner-farmed crops as ours
+            if "rllong" in name.lower():
+                continue
+            try:
+                ha_val = float(ha)
+            except ValueError:
+                continue
+            crops.append({"name": name, "ha": round(ha_val, 1), "color": color})
+        crops.sort(key=lambda c: -c["ha"])
+        by_year[m.group(1)] = crops
+    return by_year
+
+
+def _embedded_fields(html):
+    """The page's embedded `const F=[...]` field array ([] if missing)."""
+    fi = html.find("const F=[")
+    if fi == -1:
+        return []
+    try:
+        return json.loads(html[fi + len("const F="):html.find("];", fi) + 1])
+    except ValueError:
+        return []
+
+
+def _computed_crop_areas(fields):
+    """{year: {crop: ha}} for every year in the field history/plan, using
+    the same "is it ours?" rules as the FieldPlan."""
+    years = set()
+    for fld in fields:
+        years.update(fld.get("history", {}) or {})
+        years.update(fld.get("plan", {}) or {})
+    by_year = {}
+    for y in sorted(years):
+        crops = {}
+        for fld in fields:
+            if _field_is_ours(fld, y):
+                c = _field_crop(fld, y)
+                if "rllong" in c.lower():
+                    continue
+                crops[c] = crops.get(c, 0) + (fld.get("ha") or 0)
+        by_year[y] = {c: round(h, 1) for c, h in crops.items()}
+    return by_year
+
+
+def file_version(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_fieldplan_model(path):
+    """Parse the local FieldPlan copy into a plain-data model (runs in the
+    process pool)."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    html = raw.decode("utf-8", errors="replace")
+    fields = _embedded_fields(html)
+    return {
+        "version": hashlib.sha256(raw).hexdigest(),
+        "parsed_at": datetime.now(timezone.utc).isoformat(),
+        "estates": sorted({fld.get("estate") for fld in fields if fld.get("estate")}),
+        "fields": fields,
+        "crop_areas": _published_crop_areas(html),
+        "computed_crop_areas": _computed_crop_areas(fields),
+    }
+
+
+async def get_fieldplan_model(db, path, force=False):
+    """The model for the current file version: from memory if the file is
+    unchanged, else from Mongo by content hash, else parsed and stored."""
+    st = os.stat(path)
+    if (not force and _model_cache["model"] is not None
+            and _model_cache["mtime"] == st.st_mtime and _model_cache["size"] == st.st_size):
+        return _model_cache["model"]
+
+    model = None
+    if not force:
+        version = await run_in_thread(file_version, path)
+        model = await db.fieldplan_model.find_one({"version": version}, {"_id": 0})
+    if model is None:
+        model = await run_cpu(build_fieldplan_model, path)
+        await db.fieldplan_model.replace_one({"key": "current"}, {"key": "current", **model}, upsert=True)
+        logger.info(f"FieldPlan model rebuilt ({len(model['fields'])} fields, version {model['version'][:12]})")
+    model.pop("key", None)
+
+    _model_cache["model"] = model
+    _model_cache["mtime"] = st.st_mtime
+    _model_cache["size"] = st.st_size
+    return model
+
+
+def crop_areas_for_year(model, year):
+    """Endpoint payload for one year, or None if the FieldPlan has no
+    published section for it."""
+    crops = model["crop_areas"].get(str(year))
+    if crops is None:
+        return None
+    prev_year = year - 1
+    prev_crops = model["computed_crop_areas"].get(str(prev_year), {})
+    return {
+        "year": year,
+        "crops": crops,
+        "total_ha": round(sum(c["ha"] for c in crops), 1),
+        "prev_year": prev_year,
+        "prev_crops": prev_crops,
+        "prev_total_ha": round(sum(prev_crops.values()), 1),
+    }
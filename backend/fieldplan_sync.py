@@ -1,7 +1,17 @@
 import os
+import gzip
+import json
+import hashlib
 import logging
 import httpx
 
+from executors import run_in_thread
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
 logger = logging.getLogger(__name__)
 
 FIELDPLAN_URL = "https://matthewabrey.github.io/Abrey-Cropping/FieldPlan.html"
@@ -68,12 +78,112 @@ MAP_INJECTION = """
 """
 
 
+# Metadata of the local copies, by path (checked against the file's mtime/size)
+_meta_cache = {}
+
+
+def _meta_path(path):
+    return path + ".meta.json"
+
+
+def _read_meta(path):
+    try:
+        with open(_meta_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(path, meta):
+    with open(_meta_path(path), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    _meta_cache[path] = meta
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_variants(path, data, meta):
+    """Store the served page, its pre-compressed copies and the metadata
+    (ETag and upstream validators). The .html is written last so a reader
+    that sees the new mtime also finds the matching copies."""
+    meta["etag"] = hashlib.sha256(data).hexdigest()
+    _write_atomic(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(path + ".br", brotli.compress(data, quality=11))
+    elif os.path.exists(path + ".br"):
+        os.remove(path + ".br")
+    _write_atomic(path, data)
+    st = os.stat(path)
+    meta["mtime"] = st.st_mtime
+    meta["size"] = st.st_size
+    _save_meta(path, meta)
+    return meta
+
+
+def _is_current(path, meta):
+    st = os.stat(path)
+    return (meta.get("mtime") == st.st_mtime and meta.get("size") == st.st_size
+            and os.path.exists(path + ".gz"))
+
+
+def ensure_variants(path, meta=None):
+    """Metadata for the local copy ({"etag", ...}), rebuilding the
+    compressed copies if the .html was written by something else (e.g. the
+    copy shipped in the repo). Compressing is slow: call via run_in_thread
+    unless current_variants() returned None."""
+    if meta is None:
+        meta = _meta_cache.get(path) or _read_meta(path)
+    if _is_current(path, meta):
+        _meta_cache[path] = meta
+        return meta
+    with open(path, "rb") as f:
+        data = f.read()
+    return _write_variants(path, data, meta)
+
+
+def current_variants(path):
+    """Cached metadata if it still matches the local copy, else None."""
+    meta = _meta_cache.get(path)
+    if meta is not None and _is_current(path, meta):
+        return meta
+    return None
+
+
 async def _download(url, path, injection, label):
-    """Download an external page, inject our tweaks and save locally."""
+    """Download an external page, inject our tweaks and save locally.
+
+    Sends If-None-Match/If-Modified-Since from the previous download and
+    leaves the local copy alone on a 304 or if the upstream body hashes the
+    same as last time."""
+    meta = _read_meta(path) if os.path.exists(path) else {}
+    headers = {}
+    if meta.get("upstream_etag"):
+        headers["If-None-Match"] = meta["upstream_etag"]
+    if meta.get("upstream_last_modified"):
+        headers["If-Modified-Since"] = meta["upstream_last_modified"]
     async with httpx.AsyncClient(timeout=60, follow_redirects=True) as http_client:
-        resp = await http_client.get(url)
+        resp = await http_client.get(url, headers=headers)
+        if resp.status_code == 304:
+            logger.info(f"{label} not modified upstream, keeping local copy")
+            return os.path.getsize(path)
         resp.raise_for_status()
+        body = resp.content
         html = resp.text
+    upstream_hash = hashlib.sha256(body).hexdigest()
+    meta["upstream_etag"] = resp.headers.get("etag")
+    meta["upstream_last_modified"] = resp.headers.get("last-modified")
+    injection_hash = hashlib.sha256(injection.encode("utf-8")).hexdigest()
+    if (os.path.exists(path) and meta.get("upstream_sha256") == upstream_hash
+            and meta.get("injection_sha256") == injection_hash):
+        meta = await run_in_thread(ensure_variants, path, meta)
+        _save_meta(path, meta)
+        logger.info(f"{label} unchanged upstream, keeping local copy")
+        return os.path.getsize(path)
     # Inject before the LAST </body> — the page's own JS contains "</body>" inside strings
     i = html.rfind("</body>")
     if i != -1:
@@ -81,10 +191,9 @@ async def _download(url, path, injection, label):
     else:
         html += injection
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    tmp_path = path + ".tmp"
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        f.write(html)
-    os.replace(tmp_path, path)
+    meta["upstream_sha256"] = upstream_hash
+    meta["injection_sha256"] = injection_hash
+    await run_in_thread(_write_variants, path, html.encode("utf-8"), meta)
     logger.info(f"{label} downloaded and saved ({len(html)} chars)")
     return len(html)
 
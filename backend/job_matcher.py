@@ -0,0 +1,97 @@
+"""
+Fuzzy matching of typed job names (from the workplan spreadsheets) onto the
+workplan job list.
+
+JobMatcher is built once per import from the job names: a normalized exact
+map plus a character-trigram index, so a lookup first compares against the
+few names that share trigrams with it instead of every job. Results are
+memoized, and the same cell text comes up many times in a week's plan.
+
+Matching order is the same as the original inline matcher:
+  1. exact, ignoring case and surrounding/double spaces
+  2. closest by difflib ratio (>= cutoff)
+  3. one name contained in the other
+  4. the text as typed
+"""
+import re
+from difflib import get_close_matches
+
+
+def normalize_job(name):
+    return re.sub(r"\s+", " ", (name or "").strip().lower())
+
+
+def _grams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class JobMatcher:
+    def __init__(self, names, cutoff=0.6):
+        self.cutoff = cutoff
+        self.names = {}  # normalized -> job name, in job list order
+        for name in names:
+            self.names[normalize_job(name)] = name
+        self._keys = list(self.names)
+        self._order = {k: i for i, k in enumerate(self._keys)}
+        # Padded trigrams (so short names have some) for the fuzzy step,
+        # plain ones for the containment step
+        self._fuzzy_index = {}
+        self._plain_index = {}
+        self._plain_counts = {}
+        for key in self._keys:
+            for g in _grams(f"  {key} "):
+                self._fuzzy_index.setdefault(g, []).append(key)
+            plain = _grams(key)
+            self._plain_counts[key] = len(plain)
+            for g in plain:
+                self._plain_index.setdefault(g, []).append(key)
+        self._memo = {}
+
+    def match(self, raw):
+        """The job list's name for the typed text, or the text as typed
+        (stripped) if nothing matches. '' for blank cells."""
+        if raw is None:
+            return ''
+        raw_clean = str(raw).strip()
+        if not raw_clean:
+            return ''
+        if raw_clean not in self._memo:
+            self._memo[raw_clean] = self._lookup(raw_clean)
+        return self._memo[raw_clean]
+
+    def _lookup(self, raw_clean):
+        key = normalize_job(raw_clean)
+        if key in self.names:
+            return self.names[key]
+
+        candidates = {k for g in _grams(f"  {key} ") for k in self._fuzzy_index.get(g, ())}
+        matches = get_close_matches(key, candidates, n=1, cutoff=self.cutoff)
+        if not matches:
+            # Names can be close without sharing a trigram (very short or
+            # heavily misspelt text); only then compare against every job
+            matches = get_close_matches(key, self._keys, n=1, cutoff=self.cutoff)
+        if matches:
+            return self.names[matches[0]]
+
+        # Containment either way; first in job list order wins
+        for k in self._contained_candidates(key):
+            if key in k or k in key:
+                return self.names[k]
+        return raw_clean
+
+    def _contained_candidates(self, key):
+        plain = _grams(key)
+        if not plain:
+            return self._keys  # too short to index; just check them all
+        shared = {}
+        for g in plain:
+            for k in self._plain_index.get(g, ()):
+                shared[k] = shared.get(k, 0) + 1
+        found = [
+            k for k, n in shared.items()
+            # key inside k: k has all of key's trigrams; k inside key: key has all of k's
+            if n == len(plain) or n == self._plain_counts[k]
+        ]
+        # Names under three characters have no trigrams but may still be inside key
+        found += [k for k in self._keys if self._plain_counts[k] == 0]
+        return sorted(found, key=self._order.get)
@@ -0,0 +1,204 @@
+"""
+Job progress kept on the job documents, so the jobs dashboard is a single
+read instead of one work_entries query per job.
+
+Each job carries total_completed, entries_count, per-day counters
+(daily_totals / daily_entries, keyed by YYYY-MM-DD) and last_entry.
+apply_entry/remove_entry adjust them with one $inc per entry and flip the
+job complete/active with a conditional update, so concurrent entries never
+need to re-read the job's work entries. rebuild_job_progress() recomputes
+them from work_entries in one $lookup/$group aggregation for
+reconciliation (and for jobs created before these fields existed).
+"""
+import logging
+
+from pymongo import UpdateOne, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# None until checked: whether the server is a replica set (transactions)
+_transactions = {"supported": None}
+
+
+def _day(date_completed):
+    return (date_completed or "")[:10]
+
+
+def progress_view(job):
+    """Dashboard fields for a job document with materialized progress."""
+    total_completed = job.get("total_completed") or 0
+    work_days = sum(1 for n in (job.get("daily_entries") or {}).values() if n > 0)
+    return {
+        "total_completed": round(total_completed, 2),
+        "area_left": round(max(0, (job.get("total_area") or 0) - total_completed), 2),
+        "ha_per_day": round(total_completed / work_days, 2) if work_days else 0,
+        "work_days": work_days,
+        "entries_count": job.get("entries_count") or 0,
+        "last_entry": job.get("last_entry"),
+    }
+
+
+async def supports_transactions(db):
+    if _transactions["supported"] is None:
+        try:
+            hello = await db.client.admin.command("hello")
+            _transactions["supported"] = bool(hello.get("setName"))
+        except Exception:
+            _transactions["supported"] = False
+    return _transactions["supported"]
+
+
+async def with_transaction(db, fn):
+    """Await fn(session) inside a transaction when the server is a replica
+    set, else fn(None). Each step is atomic on its own either way."""
+    if not await supports_transactions(db):
+        return await fn(None)
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(fn)
+
+
+async def _set_status(db, job, session=None):
+    """Flip complete/active to match the totals. The filter re-checks the
+    condition on the stored document, so racing writers can't flip it wrongly."""
+    if not job:
+        return job
+    if job.get("status") == "active" and (job.get("total_completed") or 0) >= (job.get("total_area") or 0):
+        filter_, status = {"status": "active", "$expr": {"$gte": ["$total_completed", "$total_area"]}}, "complete"
+    elif job.get("status") == "complete" and (job.get("total_completed") or 0) < (job.get("total_area") or 0):
+        filter_, status = {"status": "complete", "$expr": {"$lt": ["$total_completed", "$total_area"]}}, "active"
+    else:
+        return job
+    result = await db.jobs.update_one({"id": job["id"], **filter_}, {"$set": {"status": status}}, session=session)
+    if result.modified_count:
+        job["status"] = status
+    return job
+
+
+async def sync_job_status(db, job, session=None):
+    """Re-check complete/active for a job document after its total_area
+    changed (an admin edit); entries do this themselves."""
+    return await _set_status(db, job, session)
+
+
+async def apply_entry(db, entry, session=None):
+    """Count a newly inserted work entry against its job and mark the job
+    complete if no area is left. Returns the job document after the update."""
+    day = _day(entry["date_completed"])
+    job = await db.jobs.find_one_and_update(
+        {"id": entry["job_id"]},
+        {"$inc": {
+            "total_completed": entry["hectares_completed"],
+            "entries_count": 1,
+            f"daily_totals.{day}": entry["hectares_completed"],
+            f"daily_entries.{day}": 1,
+        }},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if not job:
+        return None
+    # Latest by work date; an entry for the same day replaces the previous one
+    last = job.get("last_entry")
+    if not last or last.get("date_completed", "") <= entry["date_completed"]:
+        await db.jobs.update_one(
+            {"id": entry["job_id"], "$or": [
+                {"last_entry": None},
+                {"last_entry.date_completed": {"$lte": entry["date_completed"]}},
+            ]},
+            {"$set": {"last_entry": entry}},
+            session=session,
+        )
+        job["last_entry"] = entry
+    return await _set_status(db, job, session)
+
+
+async def remove_entry(db, entry, session=None):
+    """Take a deleted work entry off its job and reopen the job if area is
+    left again. Returns the job document after the update (None if the job
+    is gone)."""
+    job_id = entry["job_id"]
+    day = _day(entry["date_completed"])
+    job = await db.jobs.find_one_and_update(
+        {"id": job_id},
+        {"$inc": {
+            "total_completed": -entry["hectares_completed"],
+            "entries_count": -1,
+            f"daily_totals.{day}": -entry["hectares_completed"],
+            f"daily_entries.{day}": -1,
+        }},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if not job:
+        return None
+    # Drop the day once its last entry is gone
+    await db.jobs.update_one(
+        {"id": job_id, f"daily_entries.{day}": {"$lte": 0}},
+        {"$unset": {f"daily_entries.{day}": "", f"daily_totals.{day}": ""}},
+        session=session,
+    )
+    if (job.get("last_entry") or {}).get("id") == entry["id"]:
+        last = await db.work_entries.find_one(
+            {"job_id": job_id}, {"_id": 0}, sort=[("date_completed", -1), ("entered_at", -1)], session=session
+        )
+        await db.jobs.update_one({"id": job_id}, {"$set": {"last_entry": last}}, session=session)
+        job["last_entry"] = last
+    return await _set_status(db, job, session)
+
+
+async def rebuild_job_progress(db, job_id=None):
+    """Recompute the progress fields of every job (or one) from
+    work_entries. Also marks active jobs with no area left as complete.
+    Returns the number of jobs updated."""
+    pipeline = [
+        {"$lookup": {"from": "work_entries", "localField": "id", "foreignField": "job_id", "as": "entry"}},
+        {"$unwind": {"path": "$entry", "preserveNullAndEmptyArrays": True}},
+        {"$sort": {"entry.date_completed": 1, "entry.entered_at": 1}},
+        # One row per job and work day...
+        {"$group": {
+            "_id": {"job": "$id", "day": {"$substrCP": [{"$ifNull": ["$entry.date_completed", ""]}, 0, 10]}},
+            "total_area": {"$first": "$total_area"},
+            "status": {"$first": "$status"},
+            "hectares": {"$sum": {"$ifNull": ["$entry.hectares_completed", 0]}},
+            "entries": {"$sum": {"$cond": [{"$ifNull": ["$entry.id", False]}, 1, 0]}},
+            "last_entry": {"$last": "$entry"},
+        }},
+        {"$sort": {"_id.day": 1}},
+        # ...then one per job
+        {"$group": {
+            "_id": "$_id.job",
+            "total_area": {"$first": "$total_area"},
+            "status": {"$first": "$status"},
+            "total_completed": {"$sum": "$hectares"},
+            "entries_count": {"$sum": "$entries"},
+            "days": {"$push": {"day": "$_id.day", "hectares": "$hectares", "entries": "$entries"}},
+            "last_entry": {"$last": "$last_entry"},
+        }},
+    ]
+    if job_id:
+        pipeline.insert(0, {"$match": {"id": job_id}})
+
+    ops = []
+    # The $lookup sort holds every work entry; let it spill to disk
+    async for row in db.jobs.aggregate(pipeline, allowDiskUse=True):
+        last_entry = row.get("last_entry") or None
+        if last_entry:
+            last_entry.pop("_id", None)
+        days = [d for d in row["days"] if d["day"] and d["entries"]]
+        fields = {
+            "total_completed": row["total_completed"],
+            "entries_count": row["entries_count"],
+            "daily_totals": {d["day"]: d["hectares"] for d in days},
+            "daily_entries": {d["day"]: d["entries"] for d in days},
+            "last_entry": last_entry,
+        }
+        if row.get("status") == "active" and (row.get("total_area") or 0) - row["total_completed"] <= 0:
+            fields["status"] = "complete"
+        ops.append(UpdateOne({"id": row["_id"]}, {"$set": fields, "$unset": {"work_dates": ""}}))
+
+    if ops:
+        await db.jobs.bulk_write(ops, ordered=False)
+    logger.info(f"Rebuilt progress for {len(ops)} jobs")
+    return len(ops)
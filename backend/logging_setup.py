@@ -0,0 +1,146 @@
+"""
+Logging for the API: one JSON object per line on stdout, written by a
+background thread so a slow or blocked stdout never stalls the event loop.
+
+  logger.info(...) -> QueueHandler (formats the message, drops it on a queue)
+                   -> QueueListener thread -> StreamHandler(stdout)
+
+Set in the environment:
+  LOG_LEVEL=INFO                      root level
+  LOG_LEVELS=pymongo=WARNING,server=DEBUG
+                                      per-logger levels
+  LOG_FORMAT=json|text                text is the old "LEVEL:name:message"
+  LOG_SAMPLE_BURST=20, LOG_SAMPLE_EVERY=100
+                                      DEBUG records from one call site: the
+                                      first BURST per 10 seconds, then one in
+                                      EVERY (with a count of those skipped)
+
+Pass fields with extra={...}; they become keys of the JSON object.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+SAMPLE_WINDOW_SECONDS = 10
+DEFAULT_LEVELS = "apscheduler=WARNING,httpx=WARNING,pymongo=WARNING,asyncio=WARNING"
+
+# Attributes every LogRecord has; anything else came in through extra=
+_STANDARD = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Thins out DEBUG records per call site (see the module docstring)."""
+
+    def __init__(self, burst, every):
+        super().__init__()
+        self.burst = burst
+        self.every = max(1, every)
+        self._sites = {}  # (pathname, lineno) -> [window start, seen, skipped]
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        now = time.monotonic()
+        site = self._sites.get((record.pathname, record.lineno))
+        if site is None or now - site[0] >= SAMPLE_WINDOW_SECONDS:
+            site = self._sites[(record.pathname, record.lineno)] = [now, 0, 0]
+        site[1] += 1
+        if site[1] <= self.burst or site[1] % self.every == 0:
+            if site[2]:
+                record.sampled_out = site[2]
+                site[2] = 0
+            return True
+        site[2] += 1
+        return False
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve the message and traceback on the calling thread (the
+        # arguments may change after this returns), keeping extra fields
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(spec):
+    levels = {}
+    for part in (spec or "").split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Route all logging through the queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    if os.environ.get("LOG_FORMAT", "json").lower() == "text":
+        formatter = logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+    else:
+        formatter = JsonFormatter()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(SamplingFilter(
+        burst=int(os.environ.get("LOG_SAMPLE_BURST", "20")),
+        every=int(os.environ.get("LOG_SAMPLE_EVERY", "100")),
+    ))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    for name, level in {**_parse_levels(DEFAULT_LEVELS), **_parse_levels(os.environ.get("LOG_LEVELS"))}.items():
+        logging.getLogger(name).setLevel(level)
+    # uvicorn writes its own (access) logs straight to the stream; send them
+    # through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush what's queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
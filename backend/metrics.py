@@ -0,0 +1,192 @@
+"""
+Request and runtime metrics in the Prometheus text format, served at
+/metrics for the local scraper.
+
+  http_requests_total{method,route,status}            counter
+  http_request_duration_seconds{method,route}         histogram
+  http_request_size_bytes{method,route}               histogram
+  http_response_size_bytes{method,route}              histogram
+  http_requests_in_flight                             gauge
+  http_request_mongo_commands{method,route}           histogram (round-trips per request)
+  event_loop_lag_seconds                              histogram + gauge (last sample)
+
+route is the route template ("/api/checklists/{checklist_id}"), so label
+values stay bounded; p95 for a route is
+histogram_quantile(0.95, rate(http_request_duration_seconds_bucket{route="..."}[5m])).
+
+Everything is updated on the event loop thread, so there are no locks.
+"""
+import time
+import asyncio
+import logging
+
+from query_stats import current_request_queries
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 50_000_000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+LAG_INTERVAL_SECONDS = 0.5
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for key, value in sorted(self.values.items()):
+            yield self.name, _labels(self.labels, key), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        self.values[label_values] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.values = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for key, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                yield (f"{self.name}_bucket",
+                       _labels(self.labels + ("le",), key + (_number(bound),)), cumulative)
+            yield f"{self.name}_sum", _labels(self.labels, key), series[-2]
+            yield f"{self.name}_count", _labels(self.labels, key), series[-1]
+
+
+class Metrics:
+    def __init__(self):
+        route = ("method", "route")
+        self.requests = Counter("http_requests_total", "HTTP requests", route + ("status",))
+        self.duration = Histogram("http_request_duration_seconds", "Time to the last byte of the response",
+                                  route, LATENCY_BUCKETS)
+        self.request_size = Histogram("http_request_size_bytes", "Request body size", route, SIZE_BUCKETS)
+        self.response_size = Histogram("http_response_size_bytes", "Response body size", route, SIZE_BUCKETS)
+        self.in_flight = Gauge("http_requests_in_flight", "Requests being handled")
+        self.mongo_commands = Histogram("http_request_mongo_commands", "MongoDB commands per request",
+                                        route, COUNT_BUCKETS)
+        self.loop_lag = Histogram("event_loop_lag_seconds", "How late the event loop ran a timer", (), LAG_BUCKETS)
+        self.loop_lag_last = Gauge("event_loop_lag_last_seconds", "Latest event loop lag sample")
+        self.in_flight.set(0)
+        self._all = [self.requests, self.duration, self.request_size, self.response_size, self.in_flight,
+                     self.mongo_commands, self.loop_lag, self.loop_lag_last]
+        self._lag_task = None
+
+    def render(self):
+        lines = []
+        for metric in self._all:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines += [f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples()]
+        return "\n".join(lines) + "\n"
+
+    # ---------- event loop lag ----------
+
+    async def start(self):
+        self._lag_task = asyncio.create_task(self._sample_loop_lag())
+
+    async def stop(self):
+        if self._lag_task:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    async def _sample_loop_lag(self):
+        while True:
+            expected = time.perf_counter() + LAG_INTERVAL_SECONDS
+            await asyncio.sleep(LAG_INTERVAL_SECONDS)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.loop_lag.observe(lag)
+            self.loop_lag_last.set(lag)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording each HTTP request. Add it before
+    QueryStatsMiddleware so it runs inside it and can read the request's
+    Mongo command count."""
+
+    def __init__(self, app, registry=None):
+        self.app = app
+        self.metrics = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        m = self.metrics
+        started = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = {"code": 500}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        m.in_flight.inc()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            m.in_flight.inc(amount=-1)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", None) or "(unmatched)")
+            m.requests.inc(*labels, str(status["code"]))
+            m.duration.observe(time.perf_counter() - started, *labels)
+            m.request_size.observe(sizes["request"], *labels)
+            m.response_size.observe(sizes["response"], *labels)
+            queries = current_request_queries()
+            if queries is not None:
+                m.mongo_commands.observe(queries, *labels)
+
+
+# Global instance
+metrics = Metrics()
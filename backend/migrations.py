@@ -0,0 +1,285 @@
+"""
+Versioned schema migrations and the index manifest, run in the background
+after startup so the app (and /api/health) is up straight away.
+
+  INDEXES     -> every index the app needs, per collection. Built with one
+                 createIndexes per collection, all collections at once, and
+                 skipped entirely when the manifest hasn't changed since the
+                 last successful build (its hash is kept in
+                 schema_migrations under _id "indexes").
+  MIGRATIONS  -> (version, name, step) in order. Each step is idempotent and
+                 writes in bulk; once it succeeds {_id: version, name,
+                 applied_at, duration_ms, result} is stored in
+                 schema_migrations and it never runs again. Add new steps at
+                 the end with the next version number.
+
+Only one worker runs them: the others see the "lock" document and skip.
+A failed step stops the run (later steps may depend on it) and is retried
+on the next start.
+"""
+import time
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone, timedelta
+
+from pymongo import IndexModel, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from checklist_filters import CHECKLIST_INDEXES
+from text_search import SOURCES as SEARCH_SOURCES
+from workplan_live import PRESENCE_TIMEOUT_SECONDS
+from workplan_store import migrate_workplan_rows, compress_archive
+from job_progress import rebuild_job_progress
+from employee_activity import rebuild_employee_activity
+from workplan_costing import rebuild_costing_rollups
+
+logger = logging.getLogger(__name__)
+
+LOCK_SECONDS = 1800  # a worker that dies mid-run holds the lock this long
+BATCH_SIZE = 1000
+
+INDEXES = {
+    "checklists": [
+        IndexModel([("check_type", 1)]),
+        IndexModel([("machine_make", 1)]),
+        IndexModel([("machine_make", 1), ("completed_at", -1)]),  # For by-machine queries
+        IndexModel([("employee_number", 1)]),
+        # History filters (see checklist_filters.py for which query uses which)
+        *[IndexModel(keys) for keys in CHECKLIST_INDEXES.values()],
+        IndexModel([("id", 1)]),
+        IndexModel([("checklist_items.status", 1)]),
+    ],
+    "assets": [
+        IndexModel([("make", 1)]),
+        IndexModel([("make", 1), ("name", 1)]),
+        IndexModel([("id", 1)]),
+    ],
+    "staff": [
+        IndexModel([("employee_number", 1)]),
+        IndexModel([("active", 1)]),
+    ],
+    # Work progress
+    "jobs": [IndexModel([("id", 1)])],
+    "work_entries": [
+        IndexModel([("id", 1)]),
+        IndexModel([("job_id", 1), ("date_completed", -1)]),
+    ],
+    "workplan_costing_rollups": [
+        IndexModel([("source", 1), ("week_start", 1)]),
+        IndexModel([("source", 1), ("row_id", 1)]),
+        IndexModel([("week_start", 1)]),
+    ],
+    "workplan_rows": [
+        IndexModel([("week_start", 1), ("row_id", 1)], unique=True),
+        IndexModel([("week_start", 1), ("order", 1)]),
+    ],
+    "workplan_published_rows": [IndexModel([("publish_id", 1), ("order", 1)])],
+    "workplan_archive": [IndexModel([("week_start", -1)], unique=True)],
+    # Workplan editor presence: MongoDB drops users who stop heartbeating
+    "workplan_presence": [
+        IndexModel([("user_id", 1)], unique=True),
+        IndexModel([("last_seen", 1)], expireAfterSeconds=PRESENCE_TIMEOUT_SECONDS),
+    ],
+    "employee_activity_days": [
+        IndexModel([("employee_number", 1), ("day", 1)], unique=True),
+        IndexModel([("day", 1)]),
+    ],
+    # Safety reports: lists are newest first, optionally by status
+    "near_misses": [
+        IndexModel([("created_at", -1)]),
+        IndexModel([("acknowledged", 1), ("created_at", -1)]),
+        IndexModel([("id", 1)]),
+    ],
+    **{
+        name: [
+            IndexModel([("created_at", -1)]),
+            IndexModel([("status", 1), ("created_at", -1)]),
+            IndexModel([("id", 1)]),
+        ]
+        for name in ("suggestions", "accidents", "whistleblowing", "training_records")
+    },
+    # SharePoint sync history (latest first)
+    "sync_logs": [IndexModel([("timestamp", -1)])],
+    "repair_status": [
+        IndexModel([("repair_id", 1)]),
+        IndexModel([("acknowledged", 1)]),
+        IndexModel([("completed", 1)]),
+    ],
+}
+INDEXES["training_records"].append(IndexModel([("trainees.employee_id", 1), ("trainees.signed", 1)]))
+# Full-text search over notes and safety reports (one text index per collection)
+for _name, _source in SEARCH_SOURCES.items():
+    INDEXES.setdefault(_name, []).append(IndexModel(
+        [(field, "text") for field in _source["weights"]],
+        weights=_source["weights"], name="search_text", default_language="english",
+    ))
+
+
+def manifest_hash():
+    spec = sorted((name, sorted(repr(sorted(m.document.items())) for m in models))
+                  for name, models in INDEXES.items())
+    return hashlib.sha1(repr(spec).encode()).hexdigest()
+
+
+async def _ensure_collection_indexes(db, name, models):
+    try:
+        await db[name].create_indexes(models)
+        return True
+    except Exception as e:
+        logger.warning(f"Building the {name} indexes together failed ({str(e)}); trying one at a time")
+    ok = True
+    for model in models:
+        try:
+            await db[name].create_indexes([model])
+        except Exception as e:
+            # e.g. a different text index already exists (only one is allowed)
+            logger.error(f"Couldn't create index {model.document['name']} on {name}: {str(e)}")
+            ok = False
+    return ok
+
+
+async def ensure_indexes(db, force=False):
+    """Build the manifest's indexes unless this exact manifest was already
+    built. Returns the number of collections touched."""
+    digest = manifest_hash()
+    if not force and await db.schema_migrations.find_one({"_id": "indexes", "hash": digest}):
+        return 0
+    results = await asyncio.gather(*[
+        _ensure_collection_indexes(db, name, models) for name, models in INDEXES.items()
+    ])
+    if all(results):
+        await db.schema_migrations.update_one(
+            {"_id": "indexes"},
+            {"$set": {"hash": digest, "applied_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True,
+        )
+    return len(results)
+
+
+# ---------- steps ----------
+
+async def _checklist_check_type(db):
+    """Checklists from before check types: mark them daily checks and turn
+    the old checked boolean into an item status."""
+    migrated = 0
+    while True:
+        batch = await db.checklists.find(
+            {"check_type": {"$exists": False}}, {"_id": 1, "checklist_items": 1}
+        ).limit(BATCH_SIZE).to_list(length=BATCH_SIZE)
+        if not batch:
+            return migrated
+        ops = []
+        for checklist in batch:
+            items = checklist.get("checklist_items") or []
+            for item in items:
+                if "checked" in item and "status" not in item:
+                    item["status"] = "satisfactory" if item["checked"] else "unchecked"
+                    item.pop("checked", None)
+            ops.append(UpdateOne(
+                {"_id": checklist["_id"]},
+                {"$set": {"check_type": "daily_check", "workshop_notes": None, "checklist_items": items}},
+            ))
+        await db.checklists.bulk_write(ops, ordered=False)
+        migrated += len(ops)
+
+
+async def _job_progress(db):
+    # Jobs from before progress was materialized
+    if await db.jobs.find_one({"daily_entries": {"$exists": False}}, {"_id": 1}):
+        return await rebuild_job_progress(db)
+    return 0
+
+
+async def _employee_activity(db):
+    # Activity buckets for checklists saved before they existed
+    if not await db.employee_activity_days.find_one({}, {"_id": 1}) and await db.checklists.find_one({}, {"_id": 1}):
+        return await rebuild_employee_activity(db)
+    return 0
+
+
+async def _costing_rollups(db):
+    # Costing rollups for weeks saved before they existed
+    if not await db.workplan_costing_rollups.find_one({}, {"_id": 1}):
+        return await rebuild_costing_rollups(db)
+    return 0
+
+
+MIGRATIONS = [
+    (1, "checklist_check_type", _checklist_check_type),
+    (2, "job_progress", _job_progress),
+    (3, "workplan_rows_per_document", migrate_workplan_rows),
+    (4, "compress_workplan_archive", compress_archive),
+    (5, "employee_activity_days", _employee_activity),
+    (6, "costing_rollups", _costing_rollups),
+]
+
+
+# ---------- runner ----------
+
+_status = {"state": "pending", "started_at": None, "finished_at": None, "applied": [], "error": None}
+_task = None
+
+
+def migration_status():
+    return dict(_status, applied=list(_status["applied"]))
+
+
+async def _acquire_lock(db, owner):
+    now = datetime.now(timezone.utc)
+    try:
+        await db.schema_migrations.find_one_and_update(
+            {"_id": "lock", "expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=LOCK_SECONDS)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False  # held by another worker
+
+
+async def run_migrations(db):
+    """Build the indexes, then apply every migration not yet recorded."""
+    owner = f"{id(asyncio.get_running_loop())}-{time.time()}"
+    _status.update(state="running", started_at=datetime.now(timezone.utc).isoformat(), applied=[], error=None)
+    if not await _acquire_lock(db, owner):
+        logger.info("Migrations are running on another worker")
+        _status.update(state="skipped", finished_at=datetime.now(timezone.utc).isoformat())
+        return
+    try:
+        started = time.perf_counter()
+        touched = await ensure_indexes(db)
+        logger.info(f"Indexes ensured on {touched} collections in {time.perf_counter() - started:.2f}s")
+
+        done = {d["_id"] for d in await db.schema_migrations.find(
+            {"name": {"$exists": True}}, {"_id": 1}
+        ).to_list(length=None)}
+        for version, name, step in MIGRATIONS:
+            if version in done:
+                continue
+            started = time.perf_counter()
+            result = await step(db)
+            duration_ms = round((time.perf_counter() - started) * 1000)
+            await db.schema_migrations.insert_one({
+                "_id": version, "name": name, "result": result, "duration_ms": duration_ms,
+                "applied_at": datetime.now(timezone.utc).isoformat(),
+            })
+            _status["applied"].append(name)
+            logger.info(f"Applied migration {version} {name} ({result}) in {duration_ms} ms")
+        _status["state"] = "done"
+    except Exception as e:
+        logger.error(f"Migrations failed: {str(e)}")
+        _status.update(state="failed", error=str(e))
+    finally:
+        _status["finished_at"] = datetime.now(timezone.utc).isoformat()
+        try:
+            await db.schema_migrations.delete_one({"_id": "lock", "owner": owner})
+        except Exception:
+            pass  # expires after LOCK_SECONDS anyway
+
+
+def start_migrations(db):
+    """Run the migrations in a background task."""
+    global _task
+    _task = asyncio.create_task(run_migrations(db))
+    return _task
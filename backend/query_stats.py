@@ -0,0 +1,373 @@
+"""
+Per-endpoint MongoDB query statistics, from a pymongo command listener.
+
+  QueryStatsMiddleware -> marks each /api request with its route
+                          ("GET /api/checklists") in a context variable
+  QueryListener        -> counts every command against the request in that
+                          variable (Motor copies the context into its worker
+                          threads): queries, time in Mongo, documents returned
+  explain worker       -> operations slower than SLOW_QUERY_MS are explained
+                          (queryPlanner only, nothing is re-run) at most once
+                          per EXPLAIN_INTERVAL_SECONDS per query shape, and
+                          collection scans are flagged against the endpoint
+
+Commands outside a request (scheduler, startup) count as "(background)".
+GET /api/admin/perf/queries returns report().
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from datetime import datetime, timezone
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+EXPLAIN_INTERVAL_SECONDS = 600
+RECENT_SLOW = 50
+
+BACKGROUND = "(background)"
+# Commands with a query plan, and where their filter is
+EXPLAINABLE = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "update": "updates",
+    "delete": "deletes",
+}
+COUNTED = set(EXPLAINABLE) | {"insert", "getMore"}
+# Session/transport fields explain doesn't accept
+_NOT_EXPLAINED = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern", "$db",
+                  "$clusterTime", "$readPreference", "cursor", "batchSize", "singleBatch"}
+
+_current = contextvars.ContextVar("query_stats_request", default=None)
+
+
+def _shape(value):
+    """The filter with its values blanked, so the same query with different
+    values is one entry."""
+    if isinstance(value, dict):
+        return {k: _shape(v) for k, v in value.items()}
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return [_shape(v) for v in value]
+    return "?"
+
+
+def _query_shape(command_name, command):
+    spec = command.get(EXPLAINABLE[command_name])
+    if command_name == "aggregate":
+        # Stage names, plus the first $match
+        stages = [next(iter(s), "?") for s in spec or []]
+        first = (spec or [{}])[0]
+        return {"stages": stages, "match": _shape(first.get("$match", {}))}
+    if command_name in ("update", "delete"):
+        spec = (spec or [{}])[0].get("q", {})
+    shape = {"filter": _shape(spec or {})}
+    if command.get("sort"):
+        shape["sort"] = dict(command["sort"])
+    return shape
+
+
+def _docs_returned(command_name, reply):
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "distinct":
+        return len(reply.get("values") or [])
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") else 0
+    return 0
+
+
+def _plan_stages(plan, found):
+    """(stage, index name) for every stage under an explain winningPlan."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            found.append((plan["stage"], plan.get("indexName")))
+        for v in plan.values():
+            _plan_stages(v, found)
+    elif isinstance(plan, list):
+        for v in plan:
+            _plan_stages(v, found)
+    return found
+
+
+def _winning_plans(explain, found):
+    if isinstance(explain, dict):
+        for k, v in explain.items():
+            if k == "winningPlan":
+                found.append(v)
+            else:
+                _winning_plans(v, found)
+    elif isinstance(explain, list):
+        for v in explain:
+            _winning_plans(v, found)
+    return found
+
+
+def summarize_plan(explain):
+    """"COLLSCAN", "IXSCAN <index>[, ...]" or the top stage, from an explain
+    result (find, aggregate and write explains all have a winningPlan)."""
+    stages = []
+    for plan in _winning_plans(explain, []):
+        _plan_stages(plan, stages)
+    if any(stage == "COLLSCAN" for stage, _ in stages):
+        return "COLLSCAN"
+    indexes = sorted({name for stage, name in stages if name})
+    if indexes:
+        return "IXSCAN " + ", ".join(indexes)
+    return stages[0][0] if stages else "unknown"
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.query_ms = 0.0
+        self.docs = 0
+        self.max_queries = 0
+        self.slow = 0
+        self.collections = {}  # name -> {"queries", "ms"}
+        self.plans = {}        # (collection, command, shape) -> {"plan", "count", "last_ms"}
+
+
+class QueryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._loop = None
+        self._task = None
+        self._client = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.since = datetime.now(timezone.utc)
+            self.endpoints = {}
+            self.recent_slow = deque(maxlen=RECENT_SLOW)
+            self._explained_at = {}
+
+    # ---------- requests ----------
+
+    def begin_request(self, scope):
+        """Start counting for the current request; returns the token and
+        counters for end_request()."""
+        counters = {"scope": scope, "queries": 0, "ms": 0.0, "docs": 0, "collections": {}, "slow": 0}
+        return _current.set(counters), counters
+
+    def end_request(self, token, counters):
+        _current.reset(token)
+        endpoint = endpoint_name(counters["scope"])
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, _EndpointStats())
+            stats.requests += 1
+            stats.queries += counters["queries"]
+            stats.query_ms += counters["ms"]
+            stats.docs += counters["docs"]
+            stats.slow += counters["slow"]
+            stats.max_queries = max(stats.max_queries, counters["queries"])
+            for name, c in counters["collections"].items():
+                total = stats.collections.setdefault(name, {"queries": 0, "ms": 0.0})
+                total["queries"] += c["queries"]
+                total["ms"] += c["ms"]
+
+    # ---------- called by the listener (pymongo's threads) ----------
+
+    def record(self, endpoint_counters, collection, command_name, ms, docs):
+        with self._lock:
+            if endpoint_counters is None:
+                # Outside a request: straight into the background totals
+                stats = self.endpoints.setdefault(BACKGROUND, _EndpointStats())
+                stats.queries += 1
+                stats.query_ms += ms
+                stats.docs += docs
+                total = stats.collections.setdefault(collection, {"queries": 0, "ms": 0.0})
+            else:
+                endpoint_counters["queries"] += 1
+                endpoint_counters["ms"] += ms
+                endpoint_counters["docs"] += docs
+                total = endpoint_counters["collections"].setdefault(collection, {"queries": 0, "ms": 0.0})
+            total["queries"] += 1
+            total["ms"] += ms
+
+    def slow_query(self, endpoint_counters, endpoint, database, collection, command_name, command, ms, docs):
+        shape = _query_shape(command_name, command)
+        key = (endpoint, collection, command_name, repr(shape))
+        now = time.monotonic()
+        with self._lock:
+            if endpoint_counters is not None:
+                endpoint_counters["slow"] += 1
+            else:
+                self.endpoints.setdefault(BACKGROUND, _EndpointStats()).slow += 1
+            entry = {"endpoint": endpoint, "collection": collection, "command": command_name, "shape": shape,
+                     "ms": round(ms, 1), "docs": docs, "at": datetime.now(timezone.utc).isoformat(), "plan": None}
+            self.recent_slow.append(entry)
+            last = self._explained_at.get(key)
+            if last is not None and now - last < EXPLAIN_INTERVAL_SECONDS:
+                return
+            if command_name in ("update", "delete") and len(command.get(EXPLAINABLE[command_name]) or []) != 1:
+                return  # explain takes a single write statement
+            self._explained_at[key] = now
+        if self._loop is not None and self._queue is not None:
+            explain_cmd = {k: v for k, v in command.items() if k not in _NOT_EXPLAINED}
+            if command_name == "aggregate":
+                explain_cmd["cursor"] = {}
+            self._loop.call_soon_threadsafe(
+                self._queue.put_nowait, (key, entry, database, explain_cmd, ms)
+            )
+
+    # ---------- explain worker ----------
+
+    async def start(self, client):
+        self._client = client
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=100)
+        self._task = asyncio.create_task(self._explain_worker())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._loop = None
+
+    async def _explain_worker(self):
+        while True:
+            key, entry, database, explain_cmd, ms = await self._queue.get()
+            try:
+                result = await self._client[database].command(
+                    {"explain": explain_cmd, "verbosity": "queryPlanner"}
+                )
+                plan = summarize_plan(result)
+            except Exception as e:
+                logger.warning(f"Couldn't explain a slow {key[2]} on {key[1]}: {str(e)}")
+                continue
+            endpoint, collection, command_name, shape_repr = key
+            entry["plan"] = plan
+            with self._lock:
+                stats = self.endpoints.setdefault(endpoint, _EndpointStats())
+                seen = stats.plans.setdefault((collection, command_name, shape_repr),
+                                              {"shape": entry["shape"], "count": 0})
+                seen["plan"] = plan
+                seen["count"] += 1
+                seen["last_ms"] = round(ms, 1)
+            if plan == "COLLSCAN":
+                logger.warning(f"Collection scan on {collection} ({command_name}, {round(ms)} ms) from {endpoint}")
+
+    # ---------- report ----------
+
+    def report(self, top=50):
+        """Endpoints by total time in Mongo, with the collection scans found
+        among their slow queries."""
+        with self._lock:
+            endpoints = []
+            collscans = []
+            for name, s in self.endpoints.items():
+                plans = [
+                    {"collection": coll, "command": cmd, **seen}
+                    for (coll, cmd, _), seen in s.plans.items()
+                ]
+                scans = [p for p in plans if p["plan"] == "COLLSCAN"]
+                collscans += [{"endpoint": name, **p} for p in scans]
+                requests = s.requests or 1
+                endpoints.append({
+                    "endpoint": name,
+                    "requests": s.requests,
+                    "queries": s.queries,
+                    "queries_per_request": round(s.queries / requests, 2),
+                    "max_queries": s.max_queries,
+                    "query_ms": round(s.query_ms, 1),
+                    "query_ms_per_request": round(s.query_ms / requests, 2),
+                    "docs_returned": s.docs,
+                    "slow_queries": s.slow,
+                    "collections": {c: {"queries": v["queries"], "ms": round(v["ms"], 1)}
+                                    for c, v in sorted(s.collections.items(), key=lambda i: -i[1]["ms"])},
+                    "collscans": len(scans),
+                    "explained": plans,
+                })
+            endpoints.sort(key=lambda e: -e["query_ms"])
+            return {
+                "since": self.since.isoformat(),
+                "slow_query_ms": SLOW_QUERY_MS,
+                "endpoints": endpoints[:top],
+                "collscans": sorted(collscans, key=lambda c: -c["last_ms"]),
+                "recent_slow": list(reversed(self.recent_slow)),
+            }
+
+
+class QueryListener(monitoring.CommandListener):
+    """Pass to the client's event_listeners."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self._pending = {}
+
+    def started(self, event):
+        name = event.command_name
+        if name not in COUNTED:
+            return
+        collection = event.command.get("collection") if name == "getMore" else event.command.get(name)
+        self._pending[(event.connection_id, event.request_id)] = (
+            _current.get(), name, str(collection), event.database_name,
+            event.command if name in EXPLAINABLE else None,
+        )
+
+    def succeeded(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        counters, name, collection, database, command = pending
+        ms = event.duration_micros / 1000
+        docs = _docs_returned(name, event.reply)
+        self.stats.record(counters, collection, name, ms, docs)
+        if command is not None and ms >= SLOW_QUERY_MS:
+            endpoint = BACKGROUND if counters is None else endpoint_name(counters["scope"])
+            self.stats.slow_query(counters, endpoint, database, collection, name, command, ms, docs)
+
+    def failed(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is not None:
+            counters, name, collection, _, _ = pending
+            self.stats.record(counters, collection, name, event.duration_micros / 1000, 0)
+
+
+def current_request_queries():
+    """Mongo commands so far in the current /api request, or None outside one."""
+    counters = _current.get()
+    return None if counters is None else counters["queries"]
+
+
+def endpoint_name(scope):
+    """"METHOD /route/{param}" once routing has run, else the raw path."""
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else scope['path']}"
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that attributes each /api request's queries to its
+    route."""
+
+    def __init__(self, app, stats=None):
+        self.app = app
+        self.stats = stats or query_stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api"):
+            await self.app(scope, receive, send)
+            return
+        token, counters = self.stats.begin_request(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.stats.end_request(token, counters)
+
+
+# Global instance
+query_stats = QueryStats()
+query_listener = QueryListener(query_stats)
@@ -1,6 +1,9 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+import time
+_import_started = time.perf_counter()  # for the startup timing log
+
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime, timezone, timedelta
@@ -9,20 +12,50 @@ import io
 from motor.motor_asyncio import AsyncIOMotorClient
 import uuid
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
 from sharepoint_integration import sharepoint_integration
 from sharepoint_auto_sync import sharepoint_auto_sync
 from cached_stats import get_cached_stats, invalidate_cache
-from fieldplan_sync import download_fieldplan, FIELDPLAN_PATH, download_fieldmap, FIELDMAP_PATH
-import qrcode
+from fieldplan_sync import (
+    download_fieldplan, FIELDPLAN_PATH, download_fieldmap, FIELDMAP_PATH,
+    ensure_variants, current_variants,
+)
+from fieldplan_model import get_fieldplan_model, crop_areas_for_year
+from stock_feed import stock_feed, STOCK_POLL_SECONDS
+from workplan_costing import store_week_rollup, store_row_rollups, get_costing, rebuild_costing_rollups
+from workplan_store import (
+    load_draft, save_draft, patch_cell, archive_week, drop_other_weeks, publish_draft,
+    load_published, RowConflict, PERIODS, list_archived_weeks, load_archived_week,
+)
+from workplan_live import workplan_hub
+from job_matcher import JobMatcher
+from asset_index import get_asset_index, invalidate_asset_index
+from text_search import search as text_search, SOURCES as SEARCH_SOURCES
+from query_stats import query_stats, query_listener, QueryStatsMiddleware
+from metrics import metrics, MetricsMiddleware
+from logging_setup import configure_logging
+from checklist_filters import build_checklist_query, plan_index
+from migrations import start_migrations, migration_status, MIGRATIONS
+from employee_activity import record_checklist, activity_summary, inactive_staff, rebuild_employee_activity
+from job_progress import (
+    progress_view, apply_entry, remove_entry, rebuild_job_progress, with_transaction, sync_job_status,
+)
+from executors import executor_pools, run_cpu, run_in_thread
+from sheet_schema import parse_staff_workbook, parse_assets_workbook, SheetSchemaError
+from cpu_tasks import (
+    render_qr_png, checklist_export_rows, CHECKLIST_EXPORT_HEADERS, CHECKLIST_EXPORT_WIDTHS,
+    export_near_misses_xlsx, export_suggestions_xlsx, export_accidents_xlsx, export_whistleblowing_xlsx,
+)
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import asyncio
 import logging
-import httpx
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging: JSON lines written from a background thread (see logging_setup.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -42,6 +75,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Prometheus metrics at /metrics (see metrics.py); inside QueryStatsMiddleware
+# so it can read each request's Mongo command count
+app.add_middleware(MetricsMiddleware)
+# Per-endpoint Mongo query counts (see query_stats.py)
+app.add_middleware(QueryStatsMiddleware)
 
 # MongoDB setup with connection pooling and timeouts
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
@@ -56,6 +94,7 @@ client = AsyncIOMotorClient(
     serverSelectionTimeoutMS=5000,  # Fail fast if can't connect
     connectTimeoutMS=10000,  # Connection timeout
     socketTimeoutMS=30000,  # Socket timeout for queries
+    event_listeners=[query_listener],  # Per-endpoint query stats
 )
 db = client[DB_NAME]
 
@@ -65,6 +104,7 @@ db = client[DB_NAME]
 # db.staff - staff data
 # db.repair_status - tracks acknowledged/completed status of repairs (NEW)
 # db.sync_logs - SharePoint sync history
+# db.employee_activity_days - checklists per employee per day (see employee_activity.py)
 
 # Scheduled SharePoint sync function
 async def scheduled_sharepoint_sync():
@@ -99,7 +139,9 @@ async def scheduled_fieldplan_sync():
     """Scheduled task to re-download the external cropping FieldPlan daily"""
     try:
         size = await download_fieldplan()
-        logger.info(f"Scheduled FieldPlan sync completed ({size} chars)")
+        # Parse once now so crop-area requests are a lookup
+        model = await get_fieldplan_model(db, FIELDPLAN_PATH)
+        logger.info(f"Scheduled FieldPlan sync completed ({size} chars, {len(model['fields'])} fields)")
     except Exception as e:
         logger.error(f"Scheduled FieldPlan sync error: {str(e)}")
     try:
@@ -108,10 +150,8 @@ async def scheduled_fieldplan_sync():
     except Exception as e:
         logger.error(f"Scheduled FieldMap sync error: {str(e)}")
 
-# Setup scheduler on startup
-@app.on_event("startup")
-async def startup_event():
-    """Start the scheduler when the app starts"""
+def start_scheduler():
+    """Schedule the background jobs and start the scheduler"""
     # Schedule daily sync at 9:00 AM UK time
     scheduler.add_job(
         scheduled_sharepoint_sync,
@@ -128,37 +168,85 @@ async def startup_event():
         name="Daily FieldPlan Map Download",
         replace_existing=True
     )
+    # Keep the stock control summary warm for the dashboard
+    scheduler.add_job(
+        stock_feed.refresh,
+        IntervalTrigger(seconds=STOCK_POLL_SECONDS),
+        id="stock_summary_poll",
+        name="Stock Control Summary Poll",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
     scheduler.start()
     logger.info("Scheduler started - Daily staff sync scheduled for 9:00 AM UK time")
-    # Download the FieldPlan/FieldMap immediately if we don't have a copy yet
-    if not os.path.exists(FIELDPLAN_PATH) or not os.path.exists(FIELDMAP_PATH):
-        asyncio.create_task(scheduled_fieldplan_sync())
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Stop the scheduler when the app shuts down"""
+    """Stop the scheduler, the stock feed client, the live workplan channel, the metrics sampler and the CPU worker pools when the app shuts down"""
     scheduler.shutdown()
     logger.info("Scheduler stopped")
+    await stock_feed.close()
+    await workplan_hub.stop()
+    await query_stats.stop()
+    await metrics.stop()
+    executor_pools.shutdown(wait=True)
+
+def _encoding_qualities(header: str):
+    """{encoding: q} from an Accept-Encoding header (q defaults to 1)."""
+    qualities = {}
+    for part in header.lower().split(","):
+        name, _, params = part.partition(";")
+        if not name.strip():
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[name.strip()] = q
+    return qualities
+
+async def _serve_page(request: Request, path: str):
+    """Serve a local page copy with a content-hash ETag (304 if the client
+    has it) and the pre-compressed brotli/gzip copy when accepted."""
+    meta = current_variants(path) or await run_in_thread(ensure_variants, path)
+    etag = f'"{meta["etag"]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    qualities = _encoding_qualities(request.headers.get("accept-encoding", ""))
+    accepted = {e: qualities.get(e, qualities.get("*", 0)) for e in ("br", "gzip")}
+    # Highest q first, brotli on a tie; q=0 means not acceptable
+    for encoding, suffix in sorted((("br", ".br"), ("gzip", ".gz")), key=lambda e: -accepted[e[0]]):
+        if accepted[encoding] > 0 and os.path.exists(path + suffix):
+            return FileResponse(path + suffix, media_type="text/html",
+                                headers={**headers, "Content-Encoding": encoding})
+    return FileResponse(path, media_type="text/html", headers=headers)
 
 @app.get("/api/fieldplan")
-async def get_fieldplan():
+async def get_fieldplan(request: Request):
     """Serve the self-hosted copy of the external cropping FieldPlan map"""
     if not os.path.exists(FIELDPLAN_PATH):
         try:
             await download_fieldplan()
         except Exception as e:
             raise HTTPException(status_code=502, detail=f"Failed to fetch field plan: {str(e)}")
-    return FileResponse(FIELDPLAN_PATH, media_type="text/html")
+    return await _serve_page(request, FIELDPLAN_PATH)
 
 @app.get("/api/fieldmap")
-async def get_fieldmap():
+async def get_fieldmap(request: Request):
     """Serve the self-hosted copy of the external FieldMap (map with filters)"""
     if not os.path.exists(FIELDMAP_PATH):
         try:
             await download_fieldmap()
         except Exception as e:
             raise HTTPException(status_code=502, detail=f"Failed to fetch field map: {str(e)}")
-    return FileResponse(FIELDMAP_PATH, media_type="text/html")
+    return await _serve_page(request, FIELDMAP_PATH)
 
 @app.post("/api/fieldplan/refresh")
 async def refresh_fieldplan():
@@ -166,7 +254,8 @@ async def refresh_fieldplan():
     try:
         size = await download_fieldplan()
         map_size = await download_fieldmap()
-        return {"success": True, "size": size, "map_size": map_size}
+        model = await get_fieldplan_model(db, FIELDPLAN_PATH)
+        return {"success": True, "size": size, "map_size": map_size, "version": model["version"]}
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Failed to refresh field plan: {str(e)}")
 
@@ -256,6 +345,12 @@ class Job(BaseModel):
     target_date: Optional[str] = None  # Target completion date (YYYY-MM-DD)
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     status: str = "active"  # "active" or "complete"
+    # Progress, maintained from work entries (see job_progress.py)
+    total_completed: float = 0
+    entries_count: int = 0
+    daily_totals: dict = {}  # YYYY-MM-DD -> hectares
+    daily_entries: dict = {}  # YYYY-MM-DD -> number of entries
+    last_entry: Optional[dict] = None
 
 class JobCreate(BaseModel):
     name: str
@@ -465,7 +560,7 @@ async def initialize_data():
     # Skip asset initialization - assets should be uploaded via Admin Panel
     # using AssetList.xlsx with proper format (Check Type | Name | Make)
     if asset_count == 0:
-        print("No assets found. Please upload AssetList.xlsx via Admin Panel.")
+        logger.info("No assets found. Please upload AssetList.xlsx via Admin Panel.")
     
     if staff_count == 0:
         # Staff data from Excel
@@ -489,15 +584,11 @@ async def initialize_data():
             "Tommy Kefford", "Victoria Dascal", "Violeta Stoyanova", "Zander Britton"
         ]
         
-        for staff_name in staff_names:
-            staff = Staff(name=staff_name)
-            staff_dict = staff.dict()
-            await db.staff.insert_one(staff_dict)
-            
+        staff_docs = [Staff(name=staff_name).dict() for staff_name in staff_names]
         # Add admin employee 
         admin_staff = Staff(employee_number="4444", name="Admin User", admin_control="yes", manager_control="yes")
-        admin_dict = admin_staff.dict()
-        await db.staff.insert_one(admin_dict)
+        staff_docs.append(admin_staff.dict())
+        await db.staff.insert_many(staff_docs)
 
 async def initialize_workplan_data():
     """Seed default jobs and colour categories for the Daily Workplan feature."""
@@ -524,8 +615,9 @@ async def initialize_workplan_data():
             "Clean Work Vans", "Paint Rest Room / Toitlets", "Sort Camp Pad Out",
             "Thorpe Farm Tidy", "Poly / Fleece Sort out", "Trees over larkshall fence"
         ]
-        for i, name in enumerate(default_jobs):
-            await db.workplan_jobs.insert_one({"id": str(uuid.uuid4()), "name": name, "order": i})
+        await db.workplan_jobs.insert_many([
+            {"id": str(uuid.uuid4()), "name": name, "order": i} for i, name in enumerate(default_jobs)
+        ])
 
     if await db.workplan_colors.count_documents({}) == 0:
         default_colors = [
@@ -537,78 +629,46 @@ async def initialize_workplan_data():
             ("Off / Holiday", "#ef4444"),
             ("Servicing", "#eab308"),
         ]
-        for i, (name, color) in enumerate(default_colors):
-            await db.workplan_colors.insert_one({"id": str(uuid.uuid4()), "name": name, "color": color, "order": i})
+        await db.workplan_colors.insert_many([
+            {"id": str(uuid.uuid4()), "name": name, "color": color, "order": i}
+            for i, (name, color) in enumerate(default_colors)
+        ])
 
-@app.on_event("startup")
-async def startup_event():
-    await initialize_data()
-    await initialize_workplan_data()
-    await migrate_existing_checklists()
-    await ensure_indexes()
+# Seconds per startup step, from the last start
+startup_timings = {}
 
-async def ensure_indexes():
-    """Ensure all required indexes exist for performance"""
+async def _timed(name, coro):
+    started = time.perf_counter()
     try:
-        print("Ensuring database indexes...")
-        
-        # Checklists indexes - optimized for common queries
-        await db.checklists.create_index([("completed_at", -1)])
-        await db.checklists.create_index([("check_type", 1)])
-        await db.checklists.create_index([("check_type", 1), ("completed_at", -1)])
-        await db.checklists.create_index([("machine_make", 1)])
-        await db.checklists.create_index([("machine_make", 1), ("completed_at", -1)])  # For by-machine queries
-        await db.checklists.create_index([("machine_make", 1), ("machine_model", 1), ("completed_at", -1)])  # Compound index
-        await db.checklists.create_index([("employee_number", 1)])
-        await db.checklists.create_index([("id", 1)])
-        await db.checklists.create_index([("checklist_items.status", 1)])
-        
-        # Assets indexes
-        await db.assets.create_index([("make", 1)])
-        await db.assets.create_index([("make", 1), ("name", 1)])
-        
-        # Staff indexes
-        await db.staff.create_index([("employee_number", 1)])
-        await db.staff.create_index([("active", 1)])
-        
-        # Repair status indexes
-        await db.repair_status.create_index([("repair_id", 1)])
-        await db.repair_status.create_index([("acknowledged", 1)])
-        await db.repair_status.create_index([("completed", 1)])
-        
-        print("Database indexes ensured successfully")
-    except Exception as e:
-        print(f"Warning: Could not create some indexes: {e}")
+        return await coro
+    finally:
+        startup_timings[name] = round(time.perf_counter() - started, 3)
 
-async def migrate_existing_checklists():
-    """Add check_type field to existing checklists that don't have it"""
-    try:
-        # Find checklists without check_type field
-        checklists_to_update = await db.checklists.find({"check_type": {"$exists": False}}).to_list(length=5000)
-        
-        if checklists_to_update:
-            print(f"Migrating {len(checklists_to_update)} existing checklists...")
-            
-            # Update each checklist to add check_type as "daily_check" (assuming old records were daily checks)
-            for checklist in checklists_to_update:
-                # Convert old "checked" boolean to new "status" format
-                if checklist.get('checklist_items'):
-                    for item in checklist['checklist_items']:
-                        if 'checked' in item and 'status' not in item:
-                            item['status'] = 'satisfactory' if item['checked'] else 'unchecked'
-                            item.pop('checked', None)  # Remove old field
-                
-                await db.checklists.update_one(
-                    {"_id": checklist["_id"]}, 
-                    {"$set": {
-                        "check_type": "daily_check",
-                        "workshop_notes": None,
-                        "checklist_items": checklist.get('checklist_items', [])
-                    }}
-                )
-            print(f"Successfully migrated {len(checklists_to_update)} checklists")
-    except Exception as e:
-        print(f"Migration error: {e}")
+@app.on_event("startup")
+async def startup_event():
+    """Start the scheduler and live channels and seed defaults (independent
+    steps run concurrently), then hand indexes and migrations to a
+    background task so the app serves traffic straight away"""
+    started = time.perf_counter()
+    startup_timings.clear()
+    startup_timings["imports"] = round(started - _import_started, 3)
+    start_scheduler()
+    startup_timings["scheduler"] = round(time.perf_counter() - started, 3)
+    asyncio.create_task(stock_feed.refresh())
+    await asyncio.gather(
+        _timed("initialize_data", initialize_data()),
+        _timed("initialize_workplan_data", initialize_workplan_data()),
+        _timed("workplan_hub", workplan_hub.start(db)),
+        _timed("query_stats", query_stats.start(client)),
+        _timed("metrics", metrics.start()),
+    )
+    # Indexes and data migrations run in the background (see migrations.py)
+    start_migrations(db)
+    # Download the FieldPlan/FieldMap immediately if we don't have a copy yet
+    if not os.path.exists(FIELDPLAN_PATH) or not os.path.exists(FIELDMAP_PATH):
+        asyncio.create_task(scheduled_fieldplan_sync())
+    startup_timings["startup"] = round(time.perf_counter() - started, 3)
+    logger.info("Startup timings: " + ", ".join(f"{name} {secs:.3f}s" for name, secs in startup_timings.items()))
 
 async def cleanup_duplicate_staff():
     """Remove duplicate staff entries, keeping the one with most permissions"""
@@ -642,9 +702,9 @@ async def cleanup_duplicate_staff():
                 if r["_id"] != best_record["_id"]:
                     await db.staff.delete_one({"_id": r["_id"]})
             
-            print(f"Cleaned up duplicates for employee {emp_num}")
+            logger.info(f"Cleaned up duplicates for employee {emp_num}")
     except Exception as e:
-        print(f"Duplicate cleanup error: {e}")
+        logger.error(f"Duplicate cleanup error: {e}")
 
 # API Routes
 @app.get("/api/health")
@@ -656,6 +716,7 @@ async def health_check():
         return {
             "status": "healthy",
             "database": "connected",
+            "migrations": migration_status()["state"],
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
     except Exception as e:
@@ -666,6 +727,35 @@ async def health_check():
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
+@app.get("/api/admin/migrations")
+async def get_migrations():
+    """Schema migrations: this worker's run and every step applied so far"""
+    try:
+        applied = await db.schema_migrations.find({"name": {"$exists": True}}).sort("_id", 1).to_list(length=None)
+        done = {m["_id"] for m in applied}
+        return {
+            "run": migration_status(),
+            "applied": [{"version": m.pop("_id"), **m} for m in applied],
+            "pending": [{"version": v, "name": n} for v, n, _ in MIGRATIONS if v not in done],
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get migrations: {str(e)}")
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request and runtime metrics in the Prometheus text format"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/admin/perf/startup")
+async def get_startup_timings():
+    """Seconds spent in each startup step on this worker's last start"""
+    return startup_timings
+
+@app.get("/api/admin/perf/executors")
+async def get_executor_stats():
+    """Queue depth and latency of the shared thread/process pools"""
+    return executor_pools.stats()
+
 class EmployeeLoginRequest(BaseModel):
     employee_number: str
 
@@ -679,8 +769,8 @@ async def employee_login(request: EmployeeLoginRequest):
             "active": True
         }, {"_id": 0})
         
-        print(f"[DEBUG] employee_login: Looking up {request.employee_number}")
-        print(f"[DEBUG] employee_login: Found employee: {employee}")
+        logger.debug("employee_login lookup",
+                     extra={"employee_number": request.employee_number, "found": employee is not None})
         
         if employee:
             result = {
@@ -693,7 +783,6 @@ async def employee_login(request: EmployeeLoginRequest):
                     "manager_control": employee.get("manager_control", None)
                 }
             }
-            print(f"[DEBUG] employee_login: Returning: {result}")
             return result
         else:
             raise HTTPException(status_code=401, detail="Invalid employee number or account inactive")
@@ -787,39 +876,63 @@ async def grant_admin_access(employee_number: str):
         raise HTTPException(status_code=500, detail=f"Failed to grant admin access: {str(e)}")
 
 @app.get("/api/admin/employee-activity")
-async def get_employee_activity():
-    """Get employee usage statistics"""
+async def get_employee_activity(days: Optional[int] = 90, from_date: Optional[str] = None, until_date: Optional[str] = None):
+    """Get employee usage statistics: checks per employee over the last
+    `days` days, or between from_date/until_date (YYYY-MM-DD, e.g. year to
+    date), with a by_type breakdown"""
     try:
-        # Get recent checklists with employee info (last 90 days for performance)
-        ninety_days_ago = (datetime.now(timezone.utc) - timedelta(days=90)).isoformat()
-        checklists = await db.checklists.find(
-            {"completed_at": {"$gte": ninety_days_ago}}, 
-            {"_id": 0, "employee_number": 1, "staff_name": 1, "completed_at": 1}
-        ).to_list(length=10000)
-        
-        # Count activity by employee
-        activity = {}
-        for checklist in checklists:
-            emp_num = checklist.get('employee_number', 'Unknown')
-            if emp_num not in activity:
-                activity[emp_num] = {
-                    "employee_number": emp_num,
-                    "staff_name": checklist.get('staff_name', 'Unknown'),
-                    "total_checks": 0,
-                    "last_activity": None
-                }
-            
-            activity[emp_num]["total_checks"] += 1
-            
-            # Update last activity
-            completed_at = checklist.get('completed_at')
-            if completed_at and (not activity[emp_num]["last_activity"] or completed_at > activity[emp_num]["last_activity"]):
-                activity[emp_num]["last_activity"] = completed_at
-        
-        return list(activity.values())
+        return await activity_summary(db, days, from_date, until_date)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get employee activity: {str(e)}")
 
+@app.get("/api/admin/employee-activity/inactive")
+async def get_inactive_employees(days: int = 30):
+    """Active staff with no checklists in the last `days` days"""
+    try:
+        return await inactive_staff(db, days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get inactive employees: {str(e)}")
+
+@app.post("/api/admin/employee-activity/rebuild")
+async def rebuild_employee_activity_buckets():
+    """Recompute the per-employee, per-day activity buckets from the checklists"""
+    try:
+        buckets = await rebuild_employee_activity(db)
+        return {"success": True, "buckets": buckets}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild employee activity: {str(e)}")
+
+@app.get("/api/admin/search")
+async def search_notes_and_reports(q: str, sources: Optional[str] = None, skip: int = 0, limit: int = 20):
+    """Full-text search across checklist fault/workshop notes, near misses,
+    suggestions, accidents and whistleblowing reports. sources is a comma
+    separated subset; page with skip/next_skip."""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search text is required")
+    if not 1 <= limit <= 100 or skip < 0:
+        raise HTTPException(status_code=400, detail="limit must be 1-100 and skip 0 or more")
+    wanted = [s.strip() for s in sources.split(",") if s.strip()] if sources else None
+    unknown = [s for s in wanted or [] if s not in SEARCH_SOURCES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sources: {', '.join(unknown)}")
+    try:
+        return await text_search(db, q, wanted, skip, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+@app.get("/api/admin/perf/queries")
+async def get_query_report(top: int = 50):
+    """Mongo queries per endpoint since the last reset: counts, time, documents
+    returned, and the plans of sampled slow queries with collection scans
+    flagged"""
+    return query_stats.report(top)
+
+@app.post("/api/admin/perf/queries/reset")
+async def reset_query_report():
+    """Start the query report afresh"""
+    query_stats.reset()
+    return {"success": True}
+
 @app.get("/api/staff", response_model=List[Staff])
 async def get_staff():
     staff_list = await db.staff.find({}, {"_id": 0}).to_list(length=1000)  # Max 1000 staff
@@ -847,6 +960,13 @@ async def get_checktype_by_make_and_name(make: str, name: str):
     else:
         raise HTTPException(status_code=404, detail="Asset not found")
 
+@app.get("/api/assets/search")
+async def search_assets(q: str = "", limit: int = 20):
+    """Autocomplete over the machine list: every word of q must start a
+    word of "make name". Returns [{id, make, name, check_type}]."""
+    index = await get_asset_index(db)
+    return index.search(q, max(1, min(limit, 100)))
+
 @app.get("/api/assets", response_model=List[Asset])
 async def get_all_assets():
     assets = await db.assets.find({}, {"_id": 0}).to_list(length=1000)  # Max 1000 assets
@@ -871,28 +991,8 @@ async def get_all_qr_labels():
 @app.get("/api/assets/qr/{make}/{name}")
 async def get_asset_qr_code(make: str, name: str):
     """Generate QR code for a machine"""
-    # Create QR code data
-    qr_data = f"MACHINE:{make}:{name}"
-    
-    # Generate QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_M,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    # Create image
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Save to bytes
-    img_bytes = io.BytesIO()
-    img.save(img_bytes, format='PNG')
-    img_bytes.seek(0)
-    
-    return StreamingResponse(img_bytes, media_type="image/png")
+    png = await run_cpu(render_qr_png, f"MACHINE:{make}:{name}")
+    return StreamingResponse(io.BytesIO(png), media_type="image/png")
 
 @app.get("/api/assets/{asset_id}")
 async def get_asset_by_id(asset_id: str):
@@ -952,6 +1052,7 @@ async def create_checklist(checklist: Checklist):
     checklist_dict = checklist.dict()
     checklist_dict['completed_at'] = checklist_dict['completed_at'].isoformat()
     await db.checklists.insert_one(checklist_dict)
+    await record_checklist(db, checklist_dict)
     
     # Invalidate dashboard cache so new machine additions show immediately
     await invalidate_cache()
@@ -967,11 +1068,12 @@ async def get_dashboard_stats():
 
 WORKPLAN_XLSX_FILENAME = os.environ.get("SHAREPOINT_WORKPLAN_FILENAME", "DailyWorkPlanApp.xlsx")
 
-def _parse_workplan_excel(content: bytes, week_start):
+def _parse_workplan_excel(content: bytes, week_start, job_matcher=None):
     """Parse the DailyWorkPlanApp.xlsx 'Main Sheet': one row per person
     (vehicle, name, manager, start time, field/jobs note) with two columns
     per dated day (AM job, PM job). Returns app-shaped workplan rows for the
-    week beginning week_start (a Monday)."""
+    week beginning week_start (a Monday). With a JobMatcher, typed jobs are
+    normalized to the workplan job list."""
     import openpyxl as _openpyxl
     from datetime import time as _time
 
@@ -1016,6 +1118,8 @@ def _parse_workplan_excel(content: bytes, week_start):
             c = date_cols.get(d)
             am = cellv(r, c) if c else ""
             pm = cellv(r, c + 1) if c else ""
+            if job_matcher:
+                am, pm = job_matcher.match(am), job_matcher.match(pm)
             if am or pm:
                 has_job = True
             days.append({
@@ -1039,36 +1143,17 @@ def _parse_workplan_excel(content: bytes, week_start):
     return rows
 
 
-def _match_vehicles_to_assets(rows, assets):
+def _match_vehicles_to_assets(rows, index):
     """Where a vehicle from the Excel clearly matches a machine on the
     checklist machine list, rename it to the checklist's naming so daily
     checks can be cross-referenced later. Ambiguous or numeric-only
     vehicles are left as typed."""
-    NO_MATCH = {"", "n/a", "na", "own", "qwn", "own transport", "-"}
-    labels = []
-    for a in assets:
-        nm = (a.get("name") or "").strip()
-        mk = (a.get("make") or "").strip()
-        full = f"{mk} {nm}".strip()
-        labels.append((full.lower(), nm.lower(), full))
     matched = 0
     for row in rows:
-        v = (row.get("vehicle") or "").strip()
-        vl = v.lower()
-        if vl in NO_MATCH or not v:
-            continue
-        # exact match against "Make Name" or just Name
-        exact = [full for fl, nl, full in labels if fl == vl or nl == vl]
-        if len(exact) >= 1:
-            row["vehicle"] = exact[0]
+        label = index.resolve_vehicle(row.get("vehicle"))
+        if label:
+            row["vehicle"] = label
             matched += 1
-            continue
-        # distinctive word (not just a number): unique substring match
-        if not v.replace(" ", "").isdigit() and len(v) >= 4:
-            subs = [full for fl, nl, full in labels if vl in fl]
-            if len(subs) == 1:
-                row["vehicle"] = subs[0]
-                matched += 1
     return matched
 
 
@@ -1099,6 +1184,8 @@ async def sync_workplan_from_excel(file: UploadFile = File(None)):
                        "You can drag the Excel file into the box instead.",
             )
 
+    # Jobs are kept as typed: fuzzy matching would rewrite free text like
+    # "yard sweep" onto the nearest job name
     try:
         rows = _parse_workplan_excel(content, week_start)
     except ValueError as e:
@@ -1109,36 +1196,28 @@ async def sync_workplan_from_excel(file: UploadFile = File(None)):
     if not rows:
         raise HTTPException(status_code=400, detail="No people with jobs found for this week in the Excel file")
 
-    assets = await db.assets.find({}, {"_id": 0, "name": 1, "make": 1}).to_list(length=5000)
-    vehicles_matched = _match_vehicles_to_assets(rows, assets)
+    vehicles_matched = _match_vehicles_to_assets(rows, await get_asset_index(db))
 
     ws_iso = week_start.isoformat()
     now = datetime.now(timezone.utc).isoformat()
 
     # Archive the previous week's draft if the week is changing (same as manual save)
-    existing = await db.workplan.find_one({"key": "current"}, {"_id": 0})
-    if existing and existing.get("week_start") and existing.get("week_start") != ws_iso:
-        old_rows = existing.get("draft_rows", [])
-        if old_rows:
-            await db.workplan_archive.update_one(
-                {"week_start": existing["week_start"]},
-                {"$set": {"week_start": existing["week_start"], "rows": old_rows, "archived_at": now}},
-                upsert=True,
-            )
+    await _switch_workplan_week(ws_iso)
 
     await db.workplan.update_one(
         {"key": "current"},
         {"$set": {
             "week_start": ws_iso,
-            "draft_rows": rows,
-            "published_rows": rows,
-            "published_week_start": ws_iso,
-            "published_at": now,
             "imported_from_excel_at": now,
             "import_source": source,
         }},
         upsert=True,
     )
+    await save_draft(db, ws_iso, rows)
+    await store_week_rollup(db, ws_iso, rows, "current")
+    published = await publish_draft(db, ws_iso)
+    now = published["published_at"]
+    await workplan_hub.publish({"type": "published", "version": published["version"]})
     return {
         "success": True,
         "week_start": ws_iso,
@@ -1218,162 +1297,28 @@ async def get_tractor_utilisation():
 async def get_farm_crop_areas(year: int = 2027):
     """Our crop areas for a given year, parsed from the FieldPlan app's
     'Our crop areas — <year>' section (the local copy synced daily)."""
-    import re as _re
     if not os.path.exists(FIELDPLAN_PATH):
         try:
             await download_fieldplan()
         except Exception as e:
             raise HTTPException(status_code=502, detail=f"FieldPlan not available: {str(e)}")
-    with open(FIELDPLAN_PATH, "r", encoding="utf-8", errors="replace") as f:
-        html = f.read()
-    # Locate the section heading (em dash or hyphen between title and year)
-    m = _re.search(rf"Our crop areas\s*[—-]\s*{year}\s*</h2>", html)
-    if not m:
+    # Parsed once per FieldPlan version (normally at download time)
+    model = await get_fieldplan_model(db, FIELDPLAN_PATH)
+    result = crop_areas_for_year(model, year)
+    if result is None:
         raise HTTPException(status_code=404, detail=f"No crop areas found for {year}")
-    seg = html[m.end():]
-    # Stop at the next section heading, and before the partner-farmed list
-    for marker in ('<div class="sh"', 'Partner-farmed'):
-        end = seg.find(marker)
-        if end != -1:
-            seg = seg[:end]
-    crops = []
-    for cm in _re.finditer(
-        r'background:\s*(#[0-9A-Fa-f]{3,6})"></div>'
-        r'<span[^>]*>([^<]+)</span>'
-        r'<span[^>]*>([\d,\.]+)\s*ha</span>',
-        seg,
-    ):
-        color, name, ha = cm.group(1), cm.group(2).strip(), cm.group(3).replace(",", "")
-        # Belt-and-braces: never count partner-farmed crops as ours
-        if "rllong" in name.lower():
-            continue
-        try:
-            ha_val = float(ha)
-        except ValueError:
-            continue
-        crops.append({"name": name, "ha": round(ha_val, 1), "color": color})
-    crops.sort(key=lambda c: -c["ha"])
-
-    # Last-year comparison: computed from the FieldPlan's embedded field data
-    # using the same "is it ours?" rules as the FieldPlan itself (verified to
-    # reproduce its published figures exactly).
-    prev_year = year - 1
-    prev_crops = {}
-    prev_total = 0.0
-    try:
-        import json as _json
-        fi = html.find("const F=[")
-        if fi != -1:
-            fields = _json.loads(html[fi + len("const F="):html.find("];", fi) + 1])
-            VEG = ["Potatoes", "Salad Potatoes", "Seed Potatoes", "Carrots", "Parsnips", "Onions"]
-            NEVER = ["Uncropped", "Carbon Trees", "Solar", "Chickens", "Pheasants"]
-            SOL = ["Potatoes", "Salad Potatoes", "Seed Potatoes"]
-
-            def _gc(fld, y):
-                return (fld.get("history", {}).get(y, "") if y <= "2026"
-                        else fld.get("plan", {}).get(y, ""))
-
-            def _is_ours(fld, y):
-                c = _gc(fld, y)
-                if not c or c in NEVER or c == "Pigs":
-                    return False
-                e = fld.get("estate", "")
-                if c in ("Grass", "Woodland", "CS MT"):
-                    return e in ("Wretham", "Edwardstone/Borehouse")
-                if c == "ELS/HLS":
-                    return e == "Wretham" and y < "2027"
-                if e == "Rackham Farms":
-                    return c in SOL
-                if e == "Euston":
-                    if c in ("Maize", "Euston Rye", "Sugarbeet", "Veg (RLLONG)"):
-                        return False
-                    return True if y >= "2027" else (c in VEG)
-                if e == "Pickenham":
-                    return c in VEG or c == "Rye A"
-                if e == "Blakeney" or e == "Gooderham":
-                    return c in VEG
-                if e == "Beard":
-                    return c == "Seed Potatoes"
-                if e in ("Warren", "David Hill"):
-                    return c in VEG or c == "Seed Potatoes"
-                if e in ("Chandler", "Wretham", "Edwardstone/Borehouse"):
-                    return True
-                if c == "Maize":
-                    return e in ("Wretham", "Chandler")
-                return True
-
-            py = str(prev_year)
-            for fld in fields:
-                if _is_ours(fld, py):
-                    c = _gc(fld, py)
-                    if "rllong" in c.lower():
-                        continue
-                    prev_crops[c] = prev_crops.get(c, 0) + (fld.get("ha") or 0)
-            prev_crops = {c: round(h, 1) for c, h in prev_crops.items()}
-            prev_total = round(sum(prev_crops.values()), 1)
-    except Exception:
-        prev_crops = {}
-        prev_total = 0.0
-
-    return {
-        "year": year,
-        "crops": crops,
-        "total_ha": round(sum(c["ha"] for c in crops), 1),
-        "prev_year": prev_year,
-        "prev_crops": prev_crops,
-        "prev_total_ha": prev_total,
-    }
+    return result
 
 # ---- Link to the Abreys Stock Control app (packouttracks) ----
-STOCK_API_BASE = os.environ.get(
-    "STOCK_API_BASE", "https://packouttracks-r-1774892359.emergent.host/api"
-)
-
 @app.get("/api/stock/summary")
 async def get_stock_summary():
-    """Live summary pulled from the Abreys Stock Control app:
-    store utilisation per shed (grouped by crop) and grader throughput."""
-    try:
-        async with httpx.AsyncClient(timeout=20, follow_redirects=True) as hc:
-            sheds_r, zones_r = await asyncio.gather(
-                hc.get(f"{STOCK_API_BASE}/sheds"),
-                hc.get(f"{STOCK_API_BASE}/zones"),
-            )
-            sheds_r.raise_for_status()
-            zones_r.raise_for_status()
-            sheds = sheds_r.json()
-            zones = zones_r.json()
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Stock app unreachable: {str(e)}")
-
-    stores = []
-    for shed in sheds:
-        shed_zones = [z for z in zones if z.get("shed_id") == shed.get("id")]
-        total = sum((z.get("total_quantity") or 0) for z in shed_zones)
-        occupied = len([z for z in shed_zones if (z.get("total_quantity") or 0) > 0])
-        utilization = round(occupied / len(shed_zones) * 100) if shed_zones else 0
-        stores.append({
-            "name": shed.get("name") or "",
-            "crop_type": shed.get("crop_type") or "",
-            "zones": len(shed_zones),
-            "occupied_zones": occupied,
-            "total_stock": round(total, 1),
-            "utilization": utilization,
-        })
-
-    # Grader stats — the same feed the stock app's Lines Overview page uses:
-    # per grader, the current session (T/H, tonnes in/out, waste, efficiency,
-    # staff, hours) and all-time statistics.
-    graders = []
-    try:
-        async with httpx.AsyncClient(timeout=25, follow_redirects=True) as hc:
-            g_r = await hc.get(f"{STOCK_API_BASE}/grader-stats")
-            if g_r.status_code == 200 and isinstance(g_r.json(), list):
-                graders = g_r.json()
-    except Exception:
-        graders = []
-
-    return {"stores": stores, "graders": graders}
+    """Summary from the Abreys Stock Control app: store utilisation per shed
+    (grouped by crop) and grader throughput. Served from the background
+    poll; "stale" is set when the stock app couldn't be reached lately."""
+    summary = await stock_feed.get_summary()
+    if summary is None:
+        raise HTTPException(status_code=502, detail=f"Stock app unreachable: {stock_feed.last_error}")
+    return summary
 
 @app.get("/api/dashboard/checks-by-day")
 async def get_checks_by_day(days: int = 6):
@@ -1435,22 +1380,43 @@ async def get_checks_by_day(days: int = 6):
     }
 
 @app.get("/api/checklists", response_model=List[ChecklistResponse])
-async def get_checklists(limit: int = 100, skip: int = 0, check_type: str = None):
-    """Get checklists with pagination - optimized for speed"""
-    # Build query filter
-    query = {}
-    if check_type:
-        if ',' in check_type:
-            check_types = [ct.strip() for ct in check_type.split(',')]
-            query["check_type"] = {"$in": check_types}
-        else:
-            query["check_type"] = check_type
+async def get_checklists(
+    limit: int = 100,
+    skip: int = 0,
+    check_type: str = None,
+    exclude_check_type: str = None,
+    from_date: str = None,
+    until_date: str = None,
+    employee_number: str = None,
+    make: str = None,
+    model: str = None,
+    has_unsatisfactory: Optional[bool] = None,
+    status: str = None,
+):
+    """Get checklists with pagination, newest first. All filters are applied
+    in the query, so every page of a filtered view is complete.
+    check_type/exclude_check_type take comma lists; dates are YYYY-MM-DD and
+    until_date is inclusive."""
+    try:
+        query = build_checklist_query(
+            from_date=from_date, until_date=until_date, employee_number=employee_number,
+            make=make, model=model, check_type=check_type, exclude_check_type=exclude_check_type,
+            has_unsatisfactory=has_unsatisfactory, status=status,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Enforce reasonable limits
     limit = min(limit, 500)  # Max 500 at a time
     
     try:
-        checklists = await db.checklists.find(query, {"_id": 0}).sort("completed_at", -1).skip(skip).limit(limit).to_list(length=limit)
+        def page():
+            return db.checklists.find(query, {"_id": 0}).sort("completed_at", -1).skip(skip).limit(limit)
+        try:
+            checklists = await page().hint(plan_index(query)).to_list(length=limit)
+        except OperationFailure:
+            # Planned index not built (yet); let the planner choose
+            checklists = await page().to_list(length=limit)
         
         # Parse datetime strings - simplified
         for checklist in checklists:
@@ -1462,7 +1428,7 @@ async def get_checklists(limit: int = 100, skip: int = 0, check_type: str = None
         
         return checklists
     except Exception as e:
-        print(f"Error in get_checklists: {e}")
+        logger.error(f"Error in get_checklists: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/checklists/today")
@@ -1603,6 +1569,7 @@ async def update_asset_list(assets: List[AssetUpdate]):
         
         if new_assets:
             await db.assets.insert_many(new_assets)
+        invalidate_asset_index()
         
         return {"message": f"Successfully updated {len(new_assets)} assets", "count": len(new_assets)}
     except Exception as e:
@@ -1627,127 +1594,48 @@ class AuthCallbackRequest(BaseModel):
 async def upload_staff_file(file: UploadFile = File(...)):
     """Upload and process staff with employee numbers from Excel file"""
     try:
-        import openpyxl
-        from io import BytesIO
-        
         # Read file content
         file_content = await file.read()
-        print(f"[STAFF UPLOAD] File received: {file.filename}, size: {len(file_content)} bytes")
-        
-        # Load the Excel file
-        workbook = openpyxl.load_workbook(BytesIO(file_content))
-        sheet = workbook[workbook.sheetnames[0]]  # Use first sheet, not active
-        print(f"[STAFF UPLOAD] Sheet name: {workbook.sheetnames[0]}, max_row: {sheet.max_row}, max_col: {sheet.max_column}")
-        
-        # Get headers and find name/employee number/workshop control/admin control/manager control columns
-        headers = [str(cell.value).strip().lower() if cell.value else '' for cell in sheet[1]]
-        print(f"[STAFF UPLOAD] Headers found: {headers}")
-        
-        name_col = None
-        number_col = None
-        workshop_col = None
-        admin_col = None
-        manager_col = None
-        
-        for i, header in enumerate(headers):
-            # Check for employee number column FIRST (more specific match)
-            if ('employee' in header and 'number' in header) or header == 'emp no' or header == 'emp number' or header == 'employee_number':
-                number_col = i
-            elif 'name' in header and 'employee' not in header:
-                name_col = i
-            elif 'workshop' in header and 'control' in header:
-                workshop_col = i
-            elif 'admin' in header and 'control' in header:
-                admin_col = i
-            elif 'manager' in header:  # Accept "Manager" or "Manager Control"
-                manager_col = i
-        
-        # If we didn't find employee number yet, look for other patterns (but NOT phone number)
-        if number_col is None:
-            for i, header in enumerate(headers):
-                if ('number' in header or 'emp' in header) and 'phone' not in header and 'tel' not in header and 'mob' not in header:
-                    number_col = i
-                    break
-        
-        print(f"[STAFF UPLOAD] Column mapping - name_col: {name_col}, number_col: {number_col}, workshop_col: {workshop_col}, admin_col: {admin_col}, manager_col: {manager_col}")
-        
-        # Fallback: assume first column is names, second is numbers
-        if name_col is None:
-            name_col = 0
-            print(f"[STAFF UPLOAD] Using fallback name_col: 0")
-        if number_col is None and len(headers) > 1:
-            number_col = 1
-            print(f"[STAFF UPLOAD] Using fallback number_col: 1")
-        
-        if number_col is None:
-            raise HTTPException(status_code=400, detail="Could not find Employee Number column. Please ensure your Excel has both Name and Employee Number columns.")
-        
-        # Extract staff data
-        staff_data = []
-        rows_processed = 0
-        rows_skipped = 0
-        for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip header
-            rows_processed += 1
-            if row and len(row) > max(name_col, number_col):
-                name = str(row[name_col]).strip() if row[name_col] else ''
-                emp_number = str(row[number_col]).strip() if row[number_col] else ''
-                workshop_control = None
-                admin_control = None
-                manager_control = None
-                
-                if workshop_col is not None and len(row) > workshop_col and row[workshop_col]:
-                    workshop_control = str(row[workshop_col]).strip().lower()
-                
-                if admin_col is not None and len(row) > admin_col and row[admin_col]:
-                    admin_control = str(row[admin_col]).strip().lower()
-                
-                if manager_col is not None and len(row) > manager_col and row[manager_col]:
-                    manager_control = str(row[manager_col]).strip().lower()
-                
-                if name and emp_number and name.lower() not in ['name', 'staff', 'employee']:
-                    staff_data.append({
-                        "name": name,
-                        "employee_number": emp_number,
-                        "active": True,
-                        "workshop_control": workshop_control,
-                        "admin_control": admin_control,
-                        "manager_control": manager_control
-                    })
-                else:
-                    rows_skipped += 1
-                    if rows_processed <= 5:
-                        print(f"[STAFF UPLOAD] Skipped row {rows_processed}: name='{name}', emp_number='{emp_number}'")
-            else:
-                rows_skipped += 1
-        
-        print(f"[STAFF UPLOAD] Rows processed: {rows_processed}, valid staff: {len(staff_data)}, skipped: {rows_skipped}")
-        
+        logger.info("Staff upload received", extra={"filename": file.filename, "size": len(file_content)})
+
+        # Same column mapping as the SharePoint sync (see sheet_schema.STAFF_SCHEMA)
+        try:
+            parsed = await run_cpu(parse_staff_workbook, file_content)
+        except SheetSchemaError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        staff_data = parsed["rows"]
+        logger.info("Staff upload parsed", extra={
+            "columns": parsed["columns"], "rows_processed": parsed["rows_processed"],
+            "valid_staff": len(staff_data), "rows_skipped": parsed["rows_skipped"],
+        })
+
         if not staff_data:
-            raise HTTPException(status_code=400, detail=f"No valid staff data found. Processed {rows_processed} rows but none had valid Name and Employee Number. Headers found: {headers}")
+            raise HTTPException(status_code=400, detail=f"No valid staff data found. Processed {parsed['rows_processed']} rows but none had valid Name and Employee Number. Headers found: {parsed['headers']}")
         
         # Update database - preserve admin account (4444)
         delete_result = await db.staff.delete_many({"employee_number": {"$ne": "4444"}})
-        print(f"[STAFF UPLOAD] Deleted {delete_result.deleted_count} existing staff records")
+        logger.info(f"Staff upload deleted {delete_result.deleted_count} existing staff records")
         
         new_staff = [Staff(**data).dict() for data in staff_data]
         insert_result = await db.staff.insert_many(new_staff)
-        print(f"[STAFF UPLOAD] Inserted {len(insert_result.inserted_ids)} new staff records")
+        logger.info(f"Staff upload inserted {len(insert_result.inserted_ids)} new staff records")
         
         return {
             "message": f"Successfully uploaded {len(staff_data)} staff members with employee numbers",
             "count": len(staff_data),
             "preview": staff_data[:5],
+            "errors": parsed["errors"][:50],
             "debug": {
-                "headers_found": headers,
-                "rows_processed": rows_processed,
-                "rows_skipped": rows_skipped
+                "headers_found": parsed["headers"],
+                "rows_processed": parsed["rows_processed"],
+                "rows_skipped": parsed["rows_skipped"]
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        import traceback
-        print(f"[STAFF UPLOAD ERROR] {str(e)}")
-        print(traceback.format_exc())
+        logger.exception(f"Staff upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process staff file: {str(e)}")
 
 
@@ -1938,47 +1826,17 @@ async def get_template_diagnostics():
 async def upload_assets_file(file: UploadFile = File(...)):
     """Upload and process assets from Excel file"""
     try:
-        import openpyxl
-        from io import BytesIO
-        
         # Read file content
         file_content = await file.read()
         
-        # Load the Excel file
-        workbook = openpyxl.load_workbook(BytesIO(file_content))
-        sheet = workbook[workbook.sheetnames[0]]  # Use first sheet, not active
-        
-        # Get headers and find check_type, name, make columns
-        headers = [str(cell.value).strip().lower() if cell.value else '' for cell in sheet[1]]
-        check_type_col = None
-        name_col = None
-        make_col = None
-        
-        for i, header in enumerate(headers):
-            if header == 'check type' or 'checktype' in header:
-                check_type_col = i
-            elif header == 'namecolumn' or 'name' in header:
-                name_col = i
-            elif header == 'makecolumn' or 'make' in header:
-                make_col = i
-        
-        if check_type_col is None or name_col is None or make_col is None:
-            raise HTTPException(status_code=400, detail="Could not find Check Type, Name of Implement, and Make columns in the file")
-        
-        # Extract asset data
-        assets = []
-        for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip header
-            if row and len(row) > max(check_type_col, name_col, make_col):
-                check_type = str(row[check_type_col]).strip() if row[check_type_col] else ''
-                name = str(row[name_col]).strip() if row[name_col] else ''
-                make = str(row[make_col]).strip() if row[make_col] else ''
-                
-                if check_type and name and make:
-                    assets.append({
-                        "check_type": check_type,
-                        "name": name, 
-                        "make": make
-                    })
+        # Assets from the first sheet, checklist templates from the others.
+        # Unlike the SharePoint sync, sheets that don't match a check type
+        # are kept under their own name.
+        try:
+            parsed = await run_cpu(parse_assets_workbook, file_content, True)
+        except SheetSchemaError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        assets = parsed["rows"]
         
         if not assets:
             raise HTTPException(status_code=400, detail="No asset data found in the uploaded file")
@@ -2008,90 +1866,9 @@ async def upload_assets_file(file: UploadFile = File(...)):
                 asset_dict['qr_printed_at'] = existing_qr_status[key]['qr_printed_at']
             new_assets.append(asset_dict)
         await db.assets.insert_many(new_assets)
+        invalidate_asset_index()
         
-        # Process checklist sheets
-        checklist_templates = []
-        processed_sheets = []
-        
-        # Get all unique check types from assets
-        unique_check_types = set(asset['check_type'] for asset in assets)
-        
-        # Process each sheet in the workbook
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            
-            # Skip the main asset sheet (first sheet)
-            if sheet_name == workbook.sheetnames[0]:
-                continue
-            
-            # Try to match sheet name with check types - improved matching
-            matching_check_type = None
-            sheet_name_clean = sheet_name.lower().replace('/', '').replace(' ', '').replace('_', '').replace('-', '').replace('checklist', '')
-            
-            # First try exact matches
-            for check_type in unique_check_types:
-                check_type_clean = check_type.lower().replace('/', '').replace(' ', '').replace('_', '').replace('-', '').replace('checklist', '')
-                if sheet_name_clean == check_type_clean or check_type.lower() == sheet_name.lower():
-                    matching_check_type = check_type
-                    break
-            
-            # If no exact match, try partial matches
-            if not matching_check_type:
-                for check_type in unique_check_types:
-                    check_type_clean = check_type.lower().replace('/', '').replace(' ', '').replace('_', '').replace('-', '').replace('checklist', '')
-                    if sheet_name_clean in check_type_clean or check_type_clean in sheet_name_clean:
-                        matching_check_type = check_type
-                        break
-            
-            # If still no match, use sheet name as check type
-            if not matching_check_type:
-                matching_check_type = sheet_name
-            
-            # Extract checklist items from this sheet
-            # First, find the header row and locate the "Compulsory" column
-            items = []
-            compulsory_col = None
-            item_col = 0  # Default to first column for item text
-            
-            # Get headers from first row to find Compulsory column
-            header_row = list(sheet.iter_rows(min_row=1, max_row=1, values_only=True))[0]
-            if header_row:
-                for col_idx, header in enumerate(header_row):
-                    if header:
-                        header_lower = str(header).strip().lower()
-                        if 'compulsory' in header_lower or 'compulsary' in header_lower:  # Handle common misspelling
-                            compulsory_col = col_idx
-                        elif 'item' in header_lower or 'task' in header_lower or 'check' in header_lower or 'description' in header_lower:
-                            item_col = col_idx
-            
-            for row_num, row in enumerate(sheet.iter_rows(values_only=True), 1):
-                if row_num == 1:  # Skip header row
-                    continue
-                    
-                if row and len(row) > item_col and row[item_col]:  # If item column has content
-                    item_text = str(row[item_col]).strip()
-                    # Skip obvious headers or empty items
-                    if (item_text and 
-                        item_text.lower() not in ['item', 'check', 'description', 'checklist', 'safety'] and
-                        len(item_text) > 3):  # Minimum length filter
-                        
-                        # Check if item is marked as compulsory
-                        is_compulsory = False
-                        if compulsory_col is not None and len(row) > compulsory_col and row[compulsory_col]:
-                            compulsory_value = str(row[compulsory_col]).strip().lower()
-                            is_compulsory = compulsory_value in ['yes', 'y', 'true', '1', 'x', 'compulsory']
-                        
-                        items.append({"item": item_text, "compulsory": is_compulsory})
-            
-            if items:
-                compulsory_count = sum(1 for item in items if item.get('compulsory', False))
-                template = {
-                    "id": str(uuid.uuid4()),
-                    "check_type": matching_check_type,
-                    "items": items
-                }
-                checklist_templates.append(template)
-                processed_sheets.append(f"{sheet_name} -> {matching_check_type} ({len(items)} items, {compulsory_count} compulsory)")
+        checklist_templates = [{"id": str(uuid.uuid4()), **t} for t in parsed["templates"]]
         
         # Update checklist templates in database
         if checklist_templates:
@@ -2105,10 +1882,13 @@ async def upload_assets_file(file: UploadFile = File(...)):
             "message": f"Successfully uploaded {len(assets)} assets and {len(checklist_templates)} checklist templates", 
             "count": len(assets),
             "templates_created": len(checklist_templates),
-            "processed_sheets": processed_sheets,
+            "processed_sheets": parsed["sheets"],
+            "errors": parsed["errors"][:50],
             "preview": assets[:5] if assets else []
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process assets file: {str(e)}")
 
@@ -2262,41 +2042,8 @@ async def export_checklists_csv():
     output = io.StringIO()
     writer = csv.writer(output)
     
-    # Write header
-    writer.writerow(["ID", "Staff Name", "Machine Make", "Machine Model", "Check Type", "Completed At", "Status", "Satisfactory", "Unsatisfactory", "Total", "Notes", "Workshop Details"])
-    
-    # Write data
-    for checklist in checklists:
-        check_type = checklist.get('check_type', '')
-        if check_type in ['daily_check', 'grader_startup']:
-            items = checklist.get('checklist_items', [])
-            items_satisfactory = sum(1 for item in items if item.get('status') == 'satisfactory')
-            items_unsatisfactory = sum(1 for item in items if item.get('status') == 'unsatisfactory')
-            items_total = len(items)
-            notes_list = [item.get('notes', '')[:100] for item in items if item.get('notes')]
-            notes = "; ".join(notes_list)[:500] if notes_list else ""
-            workshop_details = ""
-        else:
-            items_satisfactory = 0
-            items_unsatisfactory = 0
-            items_total = 0
-            notes = ""
-            workshop_details = (checklist.get('workshop_notes') or '')[:500]
-        
-        writer.writerow([
-            checklist.get('id', ''),
-            checklist.get('staff_name', ''),
-            checklist.get('machine_make', ''),
-            checklist.get('machine_model', ''),
-            check_type,
-            checklist.get('completed_at', ''),
-            checklist.get('status', ''),
-            items_satisfactory,
-            items_unsatisfactory,
-            items_total,
-            notes,
-            workshop_details
-        ])
+    writer.writerow(CHECKLIST_EXPORT_HEADERS)
+    writer.writerows(checklist_export_rows(checklists))
     
     output.seek(0)
     
@@ -2329,56 +2076,20 @@ async def export_checklists_excel():
     ws = wb.active
     ws.title = "All Checks"
     
-    # Define headers and fixed column widths (skip auto-adjust which is slow)
-    headers = ["ID", "Staff Name", "Machine Make", "Machine Model", "Check Type", "Completed At", "Status", "Satisfactory", "Unsatisfactory", "Total", "Notes", "Workshop Details"]
-    col_widths = [38, 20, 20, 25, 15, 22, 12, 12, 14, 8, 50, 50]
-    
-    # Set column widths upfront (much faster than auto-adjust)
-    for i, width in enumerate(col_widths, 1):
+    # Fixed column widths (skip auto-adjust which is slow)
+    for i, width in enumerate(CHECKLIST_EXPORT_WIDTHS, 1):
         ws.column_dimensions[get_column_letter(i)].width = width
     
     # Write and format header
-    ws.append(headers)
+    ws.append(CHECKLIST_EXPORT_HEADERS)
     header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
     header_font = Font(color="FFFFFF", bold=True)
     for cell in ws[1]:
         cell.fill = header_fill
         cell.font = header_font
     
-    # Process data in optimized way
-    for checklist in checklists:
-        check_type = checklist.get('check_type', '')
-        
-        if check_type in ['daily_check', 'grader_startup']:
-            items = checklist.get('checklist_items', [])
-            items_satisfactory = sum(1 for item in items if item.get('status') == 'satisfactory')
-            items_unsatisfactory = sum(1 for item in items if item.get('status') == 'unsatisfactory')
-            items_total = len(items)
-            # Limit notes length to prevent huge cells
-            notes_list = [item.get('notes', '')[:100] for item in items if item.get('notes')]
-            notes = "; ".join(notes_list)[:500] if notes_list else ""
-            workshop_details = ""
-        else:
-            items_satisfactory = 0
-            items_unsatisfactory = 0
-            items_total = 0
-            notes = ""
-            workshop_details = (checklist.get('workshop_notes') or '')[:500]
-        
-        ws.append([
-            checklist.get('id', ''),
-            checklist.get('staff_name', ''),
-            checklist.get('machine_make', ''),
-            checklist.get('machine_model', ''),
-            check_type,
-            str(checklist.get('completed_at', '')),
-            checklist.get('status', ''),
-            items_satisfactory,
-            items_unsatisfactory,
-            items_total,
-            notes,
-            workshop_details
-        ])
+    for row in checklist_export_rows(checklists):
+        ws.append(row)
     
     # Save to BytesIO
     output = io.BytesIO()
@@ -3191,51 +2902,26 @@ async def get_all_jobs():
     
     result = []
     for job in jobs:
-        # Get all work entries for this job
-        entries = await db.work_entries.find(
-            {"job_id": job["id"]}, 
-            {"_id": 0}
-        ).sort("date_completed", 1).to_list(length=10000)
-        
-        # Calculate total completed
-        total_completed = sum(e.get("hectares_completed", 0) for e in entries)
-        area_left = max(0, job.get("total_area", 0) - total_completed)
-        
-        # Calculate Ha/day (average of daily entries)
-        ha_per_day = 0
-        if entries:
-            # Group entries by date and calculate daily totals
-            daily_totals = {}
-            for entry in entries:
-                date = entry.get("date_completed", "")[:10]  # Get just the date part
-                if date:
-                    daily_totals[date] = daily_totals.get(date, 0) + entry.get("hectares_completed", 0)
-            
-            if daily_totals:
-                ha_per_day = sum(daily_totals.values()) / len(daily_totals)
-        
-        # Auto-update status to complete if area_left is 0
-        if area_left <= 0 and job.get("status") == "active":
-            await db.jobs.update_one(
-                {"id": job["id"]},
-                {"$set": {"status": "complete"}}
-            )
-            job["status"] = "complete"
-        
-        result.append({
-            **job,
-            "total_completed": round(total_completed, 2),
-            "area_left": round(area_left, 2),
-            "ha_per_day": round(ha_per_day, 2),
-            "entries_count": len(entries),
-            "last_entry": entries[-1] if entries else None
-        })
+        # Progress is kept on the job by the work-entry endpoints
+        stats = progress_view(job)
+        job.pop("daily_totals", None)
+        job.pop("daily_entries", None)
+        result.append({**job, **stats})
     
     # Sort: active jobs first, then by name
     result.sort(key=lambda x: (0 if x["status"] == "active" else 1, x["name"]))
     
     return result
 
+@app.post("/api/admin/jobs/rebuild-progress")
+async def rebuild_jobs_progress():
+    """Recompute every job's progress fields from its work entries"""
+    try:
+        updated = await rebuild_job_progress(db)
+        return {"success": True, "jobs_updated": updated}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild job progress: {str(e)}")
+
 @app.post("/api/admin/jobs")
 async def create_job(job_data: JobCreate):
     """Create a new job"""
@@ -3292,16 +2978,17 @@ async def add_work_entry(job_id: str, entry_data: WorkEntryCreate):
         entered_by=entry_data.entered_by
     )
     
-    await db.work_entries.insert_one(entry.dict())
+    async def record(session):
+        await db.work_entries.insert_one(entry.dict(), session=session)
+        # $inc the job's running totals; marks it complete if no area is left
+        return await apply_entry(db, entry.dict(), session=session)
     
-    # Check if job should be marked complete
-    entries = await db.work_entries.find({"job_id": job_id}, {"_id": 0}).to_list(length=10000)
-    total_completed = sum(e.get("hectares_completed", 0) for e in entries)
+    job = await with_transaction(db, record)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    total_completed = job.get("total_completed") or 0
     area_left = max(0, job.get("total_area", 0) - total_completed)
     
-    if area_left <= 0:
-        await db.jobs.update_one({"id": job_id}, {"$set": {"status": "complete"}})
-    
     return {
         "success": True,
         "message": f"Added {entry_data.hectares_completed} Ha to '{job['name']}'",
@@ -3334,10 +3021,14 @@ async def update_job(job_id: str, job_data: JobCreate):
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    await db.jobs.update_one(
+    job = await db.jobs.find_one_and_update(
         {"id": job_id},
-        {"$set": {"name": job_data.name, "total_area": job_data.total_area, "target_date": job_data.target_date}}
+        {"$set": {"name": job_data.name, "total_area": job_data.total_area, "target_date": job_data.target_date}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
     )
+    # A new total can finish the job or reopen it
+    await sync_job_status(db, job)
     
     return {
         "success": True,
@@ -3361,20 +3052,17 @@ async def reopen_job(job_id: str):
 @app.delete("/api/admin/work-entries/{entry_id}")
 async def delete_work_entry(entry_id: str):
     """Delete a specific work entry"""
-    entry = await db.work_entries.find_one({"id": entry_id})
-    if not entry:
+    async def remove(session):
+        # Only the request that actually deletes the entry adjusts the totals
+        entry = await db.work_entries.find_one_and_delete({"id": entry_id}, session=session)
+        if entry:
+            # $inc the job's running totals; reopens it if area is left again
+            await remove_entry(db, entry, session=session)
+        return entry
+    
+    if not await with_transaction(db, remove):
         raise HTTPException(status_code=404, detail="Work entry not found")
     
-    await db.work_entries.delete_one({"id": entry_id})
-    
-    # Check if parent job should be reopened
-    job = await db.jobs.find_one({"id": entry["job_id"]})
-    if job and job.get("status") == "complete":
-        entries = await db.work_entries.find({"job_id": job["id"]}, {"_id": 0}).to_list(length=10000)
-        total_completed = sum(e.get("hectares_completed", 0) for e in entries)
-        if total_completed < job.get("total_area", 0):
-            await db.jobs.update_one({"id": job["id"]}, {"$set": {"status": "active"}})
-    
     return {
         "success": True,
         "message": "Work entry deleted"
@@ -3385,55 +3073,11 @@ async def delete_work_entry(entry_id: str):
 @app.get("/api/near-misses/export/excel")
 async def export_near_misses_excel():
     """Export all near misses to Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    
-    near_misses = await db.near_misses.find({}, {"_id": 0}).to_list(length=10000)
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Near Misses"
-    
-    # Headers
-    headers = ["ID", "Date", "Location", "Description", "Submitted By", "Anonymous", "Acknowledged", "Acknowledged By", "Acknowledged Date"]
-    header_fill = PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Data
-    for row_num, nm in enumerate(near_misses, 2):
-        ws.cell(row=row_num, column=1, value=nm.get("id", ""))
-        ws.cell(row=row_num, column=2, value=nm.get("created_at", "")[:10] if nm.get("created_at") else "")
-        ws.cell(row=row_num, column=3, value=nm.get("location", ""))
-        ws.cell(row=row_num, column=4, value=nm.get("description", ""))
-        ws.cell(row=row_num, column=5, value=nm.get("submitted_by", "") if not nm.get("is_anonymous") else "Anonymous")
-        ws.cell(row=row_num, column=6, value="Yes" if nm.get("is_anonymous") else "No")
-        ws.cell(row=row_num, column=7, value="Yes" if nm.get("acknowledged") else "No")
-        ws.cell(row=row_num, column=8, value=nm.get("acknowledged_by", ""))
-        ws.cell(row=row_num, column=9, value=nm.get("acknowledged_at", "")[:10] if nm.get("acknowledged_at") else "")
-    
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 40
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 20
-    ws.column_dimensions['D'].width = 50
-    ws.column_dimensions['E'].width = 20
-    ws.column_dimensions['F'].width = 12
-    ws.column_dimensions['G'].width = 14
-    ws.column_dimensions['H'].width = 20
-    ws.column_dimensions['I'].width = 18
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
+    # Photos aren't exported, so don't ship them to the worker process
+    near_misses = await db.near_misses.find({}, {"_id": 0, "photos": 0}).to_list(length=10000)
+    content = await run_cpu(export_near_misses_xlsx, near_misses)
     return StreamingResponse(
-        output,
+        io.BytesIO(content),
         media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         headers={"Content-Disposition": "attachment; filename=near_misses.xlsx"}
     )
@@ -3441,59 +3085,11 @@ async def export_near_misses_excel():
 @app.get("/api/suggestions/export/excel")
 async def export_suggestions_excel():
     """Export all suggestions to Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    
-    suggestions = await db.suggestions.find({}, {"_id": 0}).to_list(length=10000)
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Suggestions"
-    
-    # Headers
-    headers = ["ID", "Date", "Title", "Category", "Location", "Description", "Submitted By", "Anonymous", "Status", "Reviewed By", "Review Notes"]
-    header_fill = PatternFill(start_color="4ECDC4", end_color="4ECDC4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Data
-    for row_num, sg in enumerate(suggestions, 2):
-        ws.cell(row=row_num, column=1, value=sg.get("id", ""))
-        ws.cell(row=row_num, column=2, value=sg.get("created_at", "")[:10] if sg.get("created_at") else "")
-        ws.cell(row=row_num, column=3, value=sg.get("title", ""))
-        ws.cell(row=row_num, column=4, value=sg.get("category", ""))
-        ws.cell(row=row_num, column=5, value=sg.get("location", ""))
-        ws.cell(row=row_num, column=6, value=sg.get("description", ""))
-        ws.cell(row=row_num, column=7, value=sg.get("submitted_by", "") if not sg.get("is_anonymous") else "Anonymous")
-        ws.cell(row=row_num, column=8, value="Yes" if sg.get("is_anonymous") else "No")
-        ws.cell(row=row_num, column=9, value=sg.get("status", "new").capitalize())
-        ws.cell(row=row_num, column=10, value=sg.get("reviewed_by", ""))
-        ws.cell(row=row_num, column=11, value=sg.get("review_notes", ""))
-    
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 40
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 25
-    ws.column_dimensions['D'].width = 18
-    ws.column_dimensions['E'].width = 15
-    ws.column_dimensions['F'].width = 50
-    ws.column_dimensions['G'].width = 20
-    ws.column_dimensions['H'].width = 12
-    ws.column_dimensions['I'].width = 14
-    ws.column_dimensions['J'].width = 20
-    ws.column_dimensions['K'].width = 40
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
+    # Photos aren't exported, so don't ship them to the worker process
+    suggestions = await db.suggestions.find({}, {"_id": 0, "photos": 0}).to_list(length=10000)
+    content = await run_cpu(export_suggestions_xlsx, suggestions)
     return StreamingResponse(
-        output,
+        io.BytesIO(content),
         media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         headers={"Content-Disposition": "attachment; filename=suggestions.xlsx"}
     )
@@ -3501,80 +3097,11 @@ async def export_suggestions_excel():
 @app.get("/api/accidents/export/excel")
 async def export_accidents_excel():
     """Export all accidents to Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    
-    accidents = await db.accidents.find({}, {"_id": 0}).to_list(length=10000)
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Accidents"
-    
-    # Headers
-    headers = [
-        "Report No", "Date", "Time", "Location", 
-        "Injured Name", "Injured Occupation", "Injured Address",
-        "Reporter Name", "Reporter Occupation",
-        "Accident Description", "Injury Details",
-        "Employee Consent", "RIDDOR Reportable", "RIDDOR How Reported", "RIDDOR Date Reported",
-        "Status", "Investigation Notes", "Investigated By"
-    ]
-    header_fill = PatternFill(start_color="9B59B6", end_color="9B59B6", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Data
-    for row_num, acc in enumerate(accidents, 2):
-        ws.cell(row=row_num, column=1, value=acc.get("report_number", ""))
-        ws.cell(row=row_num, column=2, value=acc.get("accident_date", ""))
-        ws.cell(row=row_num, column=3, value=acc.get("accident_time", ""))
-        ws.cell(row=row_num, column=4, value=acc.get("accident_location", ""))
-        ws.cell(row=row_num, column=5, value=acc.get("injured_name", ""))
-        ws.cell(row=row_num, column=6, value=acc.get("injured_occupation", ""))
-        ws.cell(row=row_num, column=7, value=f"{acc.get('injured_address', '')} {acc.get('injured_postcode', '')}".strip())
-        ws.cell(row=row_num, column=8, value=acc.get("reporter_name", ""))
-        ws.cell(row=row_num, column=9, value=acc.get("reporter_occupation", ""))
-        ws.cell(row=row_num, column=10, value=acc.get("accident_description", ""))
-        ws.cell(row=row_num, column=11, value=acc.get("injury_details", ""))
-        ws.cell(row=row_num, column=12, value="Yes" if acc.get("employee_consent") else "No")
-        ws.cell(row=row_num, column=13, value="Yes" if acc.get("riddor_reportable") else "No")
-        ws.cell(row=row_num, column=14, value=acc.get("riddor_how_reported", ""))
-        ws.cell(row=row_num, column=15, value=acc.get("riddor_date_reported", ""))
-        ws.cell(row=row_num, column=16, value=acc.get("status", "new").capitalize())
-        ws.cell(row=row_num, column=17, value=acc.get("investigation_notes", ""))
-        ws.cell(row=row_num, column=18, value=acc.get("investigated_by", ""))
-    
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 12
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 10
-    ws.column_dimensions['D'].width = 25
-    ws.column_dimensions['E'].width = 20
-    ws.column_dimensions['F'].width = 18
-    ws.column_dimensions['G'].width = 35
-    ws.column_dimensions['H'].width = 20
-    ws.column_dimensions['I'].width = 18
-    ws.column_dimensions['J'].width = 50
-    ws.column_dimensions['K'].width = 35
-    ws.column_dimensions['L'].width = 16
-    ws.column_dimensions['M'].width = 16
-    ws.column_dimensions['N'].width = 20
-    ws.column_dimensions['O'].width = 18
-    ws.column_dimensions['P'].width = 14
-    ws.column_dimensions['Q'].width = 40
-    ws.column_dimensions['R'].width = 20
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
+    # Photos aren't exported, so don't ship them to the worker process
+    accidents = await db.accidents.find({}, {"_id": 0, "photos": 0}).to_list(length=10000)
+    content = await run_cpu(export_accidents_xlsx, accidents)
     return StreamingResponse(
-        output,
+        io.BytesIO(content),
         media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         headers={"Content-Disposition": "attachment; filename=accidents.xlsx"}
     )
@@ -3582,73 +3109,37 @@ async def export_accidents_excel():
 @app.get("/api/whistleblowing/export/excel")
 async def export_whistleblowing_excel():
     """Export all whistleblowing reports to Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    
-    reports = await db.whistleblowing.find({}, {"_id": 0}).to_list(length=10000)
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Whistleblowing"
-    
-    # Headers
-    headers = ["ID", "Date", "Title", "Category", "Location", "Description", "Submitted By", "Anonymous", "Status", "Investigation Notes", "Investigated By"]
-    header_fill = PatternFill(start_color="F39C12", end_color="F39C12", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Data
-    for row_num, rp in enumerate(reports, 2):
-        ws.cell(row=row_num, column=1, value=rp.get("id", ""))
-        ws.cell(row=row_num, column=2, value=rp.get("created_at", "")[:10] if rp.get("created_at") else "")
-        ws.cell(row=row_num, column=3, value=rp.get("title", ""))
-        ws.cell(row=row_num, column=4, value=rp.get("category", ""))
-        ws.cell(row=row_num, column=5, value=rp.get("location", ""))
-        ws.cell(row=row_num, column=6, value=rp.get("description", ""))
-        ws.cell(row=row_num, column=7, value=rp.get("submitted_by", "") if not rp.get("is_anonymous") else "Anonymous")
-        ws.cell(row=row_num, column=8, value="Yes" if rp.get("is_anonymous") else "No")
-        ws.cell(row=row_num, column=9, value=rp.get("status", "new").capitalize())
-        ws.cell(row=row_num, column=10, value=rp.get("investigation_notes", ""))
-        ws.cell(row=row_num, column=11, value=rp.get("investigated_by", ""))
-    
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 40
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 30
-    ws.column_dimensions['D'].width = 18
-    ws.column_dimensions['E'].width = 15
-    ws.column_dimensions['F'].width = 50
-    ws.column_dimensions['G'].width = 20
-    ws.column_dimensions['H'].width = 12
-    ws.column_dimensions['I'].width = 14
-    ws.column_dimensions['J'].width = 40
-    ws.column_dimensions['K'].width = 20
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
+    # Photos aren't exported, so don't ship them to the worker process
+    reports = await db.whistleblowing.find({}, {"_id": 0, "photos": 0}).to_list(length=10000)
+    content = await run_cpu(export_whistleblowing_xlsx, reports)
     return StreamingResponse(
-        output,
+        io.BytesIO(content),
         media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         headers={"Content-Disposition": "attachment; filename=whistleblowing.xlsx"}
     )
 
 # DAILY WORKPLAN ENDPOINTS
 # Collections:
-#   db.workplan        -> single doc {key:'current', week_start, draft_rows, published_rows, published_week_start, published_at}
+#   db.workplan        -> single doc {key:'current', week_start, published_id, published_week_start, published_at}
+#   db.workplan_rows   -> one doc per draft row, see workplan_store.py
+#   db.workplan_published_rows -> the published copy of the rows
 #   db.workplan_jobs   -> {id, name, order}
 #   db.workplan_colors -> {id, name, color, order}
+#   db.workplan_presence -> {user_id, name, last_seen}, expired by a TTL index
+#   db.workplan_archive  -> past weeks, rows zlib-compressed (see workplan_store.py)
 # ==========================================================================
 
 class WorkplanSaveRequest(BaseModel):
     week_start: str
     rows: List[dict] = []
+    deleted: Optional[List[str]] = None  # row ids removed; None = delete every row not in rows
+    client_id: Optional[str] = None  # the editor tab saving, so it isn't sent its own change
+
+class WorkplanCellPatch(BaseModel):
+    week_start: str
+    cell: dict  # {job, color_id, ...}
+    version: Optional[int] = None  # the row version the edit was made against
+    client_id: Optional[str] = None
 
 class JobItem(BaseModel):
     name: str
@@ -3657,6 +3148,14 @@ class ColorItem(BaseModel):
     name: str
     color: str
 
+async def _switch_workplan_week(week_start: str):
+    """Archive the current draft week if the draft is moving to another week."""
+    existing = await db.workplan.find_one({"key": "current"}, {"_id": 0, "week_start": 1})
+    if existing and existing.get("week_start") and existing.get("week_start") != week_start:
+        old_rows = await archive_week(db, existing["week_start"])
+        if old_rows:
+            await store_week_rollup(db, existing["week_start"], old_rows, "archive")
+
 @app.get("/api/workplan")
 async def get_workplan():
     """Return the draft workplan that managers edit."""
@@ -3665,39 +3164,51 @@ async def get_workplan():
         return {"week_start": None, "rows": [], "published_at": None, "is_published": False}
     return {
         "week_start": doc.get("week_start"),
-        "rows": doc.get("draft_rows", []),
+        "rows": await load_draft(db, doc.get("week_start")),
         "published_at": doc.get("published_at"),
-        "is_published": bool(doc.get("published_rows"))
+        "is_published": bool(doc.get("published_id") or doc.get("published_rows"))
     }
 
 @app.put("/api/workplan")
 async def save_workplan(req: WorkplanSaveRequest):
-    """Save the draft workplan. Auto-archives previous week if week_start changed."""
-    # Check if week changed — archive the old one
-    existing = await db.workplan.find_one({"key": "current"}, {"_id": 0})
-    if existing and existing.get("week_start") and existing.get("week_start") != req.week_start:
-        old_rows = existing.get("draft_rows", [])
-        if old_rows:
-            await db.workplan_archive.update_one(
-                {"week_start": existing["week_start"]},
-                {"$set": {
-                    "week_start": existing["week_start"],
-                    "rows": old_rows,
-                    "archived_at": datetime.now(timezone.utc).isoformat()
-                }},
-                upsert=True
-            )
+    """Save the draft workplan. Auto-archives previous week if week_start changed.
+    Only changed rows are written; rows edited by someone else since the
+    client loaded them come back in "conflicts" instead of being overwritten."""
+    await _switch_workplan_week(req.week_start)
     await db.workplan.update_one(
         {"key": "current"},
         {"$set": {
             "key": "current",
             "week_start": req.week_start,
-            "draft_rows": req.rows,
             "updated_at": datetime.now(timezone.utc).isoformat()
         }},
         upsert=True
     )
-    return {"success": True}
+    result = await save_draft(db, req.week_start, req.rows, req.deleted)
+    await store_row_rollups(db, req.week_start, result.pop("written"), result.pop("removed"))
+    await workplan_hub.publish({
+        "type": "rows", "week_start": req.week_start, "versions": result["versions"], "origin": req.client_id
+    })
+    return {"success": True, **result}
+
+@app.patch("/api/workplan/rows/{row_id}/cells/{day}/{period}")
+async def patch_workplan_cell(row_id: str, day: int, period: str, req: WorkplanCellPatch):
+    """Set a single AM/PM cell. 409 with the current row if the row's version
+    has moved on since the client loaded it."""
+    if period not in PERIODS or not 0 <= day <= 6:
+        raise HTTPException(status_code=400, detail="Cell must be day 0-6, am or pm")
+    try:
+        row = await patch_cell(db, req.week_start, row_id, day, period, req.cell, req.version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Workplan row not found")
+    except RowConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "row": e.row})
+    await store_row_rollups(db, req.week_start, [row])
+    await workplan_hub.publish({
+        "type": "row", "week_start": req.week_start, "row": row, "day": day, "period": period,
+        "origin": req.client_id
+    })
+    return {"success": True, "row": row, "version": row["version"]}
 
 @app.post("/api/workplan/publish")
 async def publish_workplan():
@@ -3705,69 +3216,102 @@ async def publish_workplan():
     doc = await db.workplan.find_one({"key": "current"})
     if not doc:
         raise HTTPException(status_code=404, detail="No workplan to publish")
-    now = datetime.now(timezone.utc).isoformat()
-    await db.workplan.update_one(
-        {"key": "current"},
-        {"$set": {
-            "published_rows": doc.get("draft_rows", []),
-            "published_week_start": doc.get("week_start"),
-            "published_at": now
-        }}
-    )
-    return {"success": True, "published_at": now}
-
-# Workplan presence tracking - in-memory for simplicity (resets on server restart)
-workplan_active_users = {}  # {user_id: {name: str, last_seen: datetime}}
-PRESENCE_TIMEOUT_SECONDS = 60  # Consider user gone after 60 seconds
+    # Copies the draft rows server-side; nothing is sent from the client
+    result = await publish_draft(db, doc.get("week_start"))
+    # Wakes the staff boards waiting on /api/workplan/published
+    await workplan_hub.publish({"type": "published", "version": result["version"]})
+    return {"success": True, "published_at": result["published_at"]}
 
+# Workplan presence and live edits - see workplan_live.py
 class PresenceRequest(BaseModel):
     user_id: str
     user_name: str
 
+@app.websocket("/api/workplan/live")
+async def workplan_live(websocket: WebSocket, user_id: str, user_name: str = "", client_id: str = ""):
+    """Live channel for the editor: pushes presence and other managers' row
+    edits. Clients send {"type": "ping"} every so often to stay present."""
+    await workplan_hub.connect(websocket, user_id, user_name or f"Employee {user_id}", client_id)
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if message.get("type") == "ping":
+                others = await workplan_hub.heartbeat(user_id, user_name or f"Employee {user_id}")
+                await websocket.send_json({"type": "presence", "active_users": others})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Workplan live socket closed: {str(e)}")
+    finally:
+        await workplan_hub.disconnect(websocket)
+
 @app.post("/api/workplan/presence/heartbeat")
 async def workplan_presence_heartbeat(req: PresenceRequest):
-    """Update user's presence in the workplan editor."""
-    now = datetime.now(timezone.utc)
-    workplan_active_users[req.user_id] = {
-        "name": req.user_name,
-        "last_seen": now
-    }
-    
-    # Clean up stale users
-    stale_cutoff = now - timedelta(seconds=PRESENCE_TIMEOUT_SECONDS)
-    stale_users = [uid for uid, data in workplan_active_users.items() 
-                   if data["last_seen"] < stale_cutoff]
-    for uid in stale_users:
-        del workplan_active_users[uid]
-    
-    # Return list of other active users
-    other_users = [
-        {"user_id": uid, "name": data["name"]}
-        for uid, data in workplan_active_users.items()
-        if uid != req.user_id
-    ]
-    
-    return {"active_users": other_users}
+    """Update user's presence in the workplan editor (fallback for editors
+    that can't hold the live socket open)."""
+    return {"active_users": await workplan_hub.heartbeat(req.user_id, req.user_name)}
 
 @app.post("/api/workplan/presence/leave")
 async def workplan_presence_leave(req: PresenceRequest):
     """Remove user from active users when they leave the page."""
-    if req.user_id in workplan_active_users:
-        del workplan_active_users[req.user_id]
+    await workplan_hub.leave(req.user_id)
     return {"success": True}
 
+PUBLISHED_WAIT_SECONDS = 25  # long-poll hold, under typical proxy timeouts
+
 @app.get("/api/workplan/published")
-async def get_published_workplan():
-    """Return the published workplan for the staff dashboard view."""
+async def get_published_workplan(since_version: Optional[int] = None):
+    """Return the published workplan for the staff dashboard view.
+    With since_version, waits (up to PUBLISHED_WAIT_SECONDS) for a newer
+    publish and answers 304 if there isn't one."""
+    if since_version is not None:
+        waiter = workplan_hub.publish_waiter()
+        doc = await db.workplan.find_one({"key": "current"}, {"_id": 0, "published_version": 1})
+        if (doc or {}).get("published_version", 0) == since_version:
+            try:
+                await asyncio.wait_for(waiter.wait(), PUBLISHED_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            # Checked again after a timeout too, in case the wake-up was missed
+            doc = await db.workplan.find_one({"key": "current"}, {"_id": 0, "published_version": 1})
+            if (doc or {}).get("published_version", 0) == since_version:
+                return Response(status_code=304)
+
     doc = await db.workplan.find_one({"key": "current"}, {"_id": 0})
-    if not doc or not doc.get("published_rows"):
-        return {"week_start": None, "rows": [], "published_at": None}
+    rows = await load_published(db, doc) if doc else []
+    version = (doc or {}).get("published_version", 0)
+    if not rows:
+        return {"week_start": None, "rows": [], "published_at": None, "version": version}
     return {
         "week_start": doc.get("published_week_start"),
-        "rows": doc.get("published_rows", []),
-        "published_at": doc.get("published_at")
+        "rows": rows,
+        "published_at": doc.get("published_at"),
+        "version": version
     }
 
+@app.get("/api/workplan/history")
+async def get_workplan_history(
+    from_week: Optional[str] = None,
+    until_week: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = 20,
+    include_rows: bool = False,
+):
+    """Archived weeks, newest first. from_week/until_week (YYYY-MM-DD week
+    starts) limit the range; pass next_before back as before for the next
+    page. Rows are only included with include_rows."""
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    return await list_archived_weeks(db, from_week, until_week, before, limit, include_rows)
+
+@app.get("/api/workplan/history/{week_start}")
+async def get_workplan_history_week(week_start: str):
+    """One archived week with its rows."""
+    week = await load_archived_week(db, week_start)
+    if not week:
+        raise HTTPException(status_code=404, detail="No archived workplan for that week")
+    return week
+
 @app.get("/api/workplan/jobs")
 async def get_workplan_jobs():
     jobs = await db.workplan_jobs.find({}, {"_id": 0}).sort("order", 1).to_list(length=None)
@@ -3820,7 +3364,6 @@ async def import_workplan_staff():
     Parses daily assignments, marks leavers, fuzzy-matches job names."""
     import openpyxl, re
     from io import BytesIO
-    from difflib import get_close_matches
     
     excel_url = "https://customer-assets.emergentagent.com/job_3e1cee5c-63e2-4d27-9a1e-16878b2e56b8/artifacts/ls1wpmcs_Daily%2520Workplan%25202024%20%28version%201%29.xlsb.xlsx"
     
@@ -3832,33 +3375,13 @@ async def import_workplan_staff():
         wb = openpyxl.load_workbook(BytesIO(resp.content), data_only=True)
     
     # Build job name lookup for fuzzy matching
-    all_jobs_docs = await db.workplan_jobs.find({}, {"_id": 0}).to_list(length=None)
-    job_names = [j["name"] for j in all_jobs_docs]
-    job_names_lower = {j.lower().strip(): j for j in job_names}
+    all_jobs_docs = await db.workplan_jobs.find({}, {"_id": 0, "name": 1}).sort("order", 1).to_list(length=None)
+    fuzzy_match_job = JobMatcher([j["name"] for j in all_jobs_docs]).match
     
     # Get colour categories for auto-assignment
     all_colors = await db.workplan_colors.find({}, {"_id": 0}).to_list(length=None)
     color_by_name = {c["name"].lower(): c for c in all_colors}
     
-    def fuzzy_match_job(raw):
-        if not raw:
-            return ''
-        raw_clean = raw.strip()
-        if not raw_clean:
-            return ''
-        # Exact match (case-insensitive)
-        if raw_clean.lower() in job_names_lower:
-            return job_names_lower[raw_clean.lower()]
-        # Close match
-        matches = get_close_matches(raw_clean.lower(), list(job_names_lower.keys()), n=1, cutoff=0.6)
-        if matches:
-            return job_names_lower[matches[0]]
-        # Partial match
-        for jn_lower, jn in job_names_lower.items():
-            if raw_clean.lower() in jn_lower or jn_lower in raw_clean.lower():
-                return jn
-        return raw_clean  # Return as-is if no match
-    
     def auto_color_for_notes(notes_text):
         """Try to assign a colour based on field/notes text."""
         if not notes_text:
@@ -4044,8 +3567,10 @@ async def import_workplan_staff():
                 seen.add(j)
                 unique_jobs.append(j)
         await db.workplan_jobs.delete_many({})
-        for i, name in enumerate(unique_jobs):
-            await db.workplan_jobs.insert_one({"id": str(uuid.uuid4()), "name": name, "order": i})
+        if unique_jobs:
+            await db.workplan_jobs.insert_many(
+                [{"id": str(uuid.uuid4()), "name": name, "order": i} for i, name in enumerate(unique_jobs)]
+            )
     
     # Save workplan
     from datetime import datetime, timezone
@@ -4058,11 +3583,13 @@ async def import_workplan_staff():
         {"$set": {
             "key": "current",
             "week_start": week_start,
-            "draft_rows": rows,
             "updated_at": datetime.now(timezone.utc).isoformat()
         }},
         upsert=True
     )
+    await drop_other_weeks(db, week_start)
+    await save_draft(db, week_start, rows)
+    await store_week_rollup(db, week_start, rows, "current")
     
     active = sum(1 for r in rows if not r.get('left', False))
     left = sum(1 for r in rows if r.get('left', False))
@@ -4079,92 +3606,17 @@ async def import_workplan_staff():
 async def get_workplan_costing(from_date: str = None, until_date: str = None):
     """Calculate % breakdown by (area/crop + job). Aggregates current + archived weeks.
     Optional from_date/until_date (YYYY-MM-DD) filter which days to include."""
-    
-    all_colors = await db.workplan_colors.find({}, {"_id": 0}).to_list(length=None)
-    color_lookup = {c["id"]: c for c in all_colors}
-    color_by_hex = {c["color"]: c for c in all_colors}
-    
-    # Collect all week documents (current + archives)
-    week_docs = []
-    current = await db.workplan.find_one({"key": "current"}, {"_id": 0})
-    if current and current.get("draft_rows"):
-        week_docs.append({"week_start": current.get("week_start"), "rows": current.get("draft_rows", [])})
-    archives = await db.workplan_archive.find({}, {"_id": 0}).to_list(length=None)
-    for a in archives:
-        week_docs.append({"week_start": a.get("week_start"), "rows": a.get("rows", [])})
-    
-    combined = {}
-    left_combined = {}
-    total_cells = 0
-    left_total = 0
-    
-    fd = None
-    ud = None
-    if from_date:
-        try: fd = datetime.strptime(from_date, "%Y-%m-%d").date()
-        except ValueError: pass
-    if until_date:
-        try: ud = datetime.strptime(until_date, "%Y-%m-%d").date()
-        except ValueError: pass
-    
-    for week_doc in week_docs:
-        ws = week_doc.get("week_start")
-        if not ws:
-            continue
-        try:
-            week_monday = datetime.strptime(ws, "%Y-%m-%d").date()
-        except (ValueError, TypeError):
-            continue
-        
-        for row in week_doc.get("rows", []):
-            is_left = row.get('left', False)
-            days = row.get('days', {})
-            if isinstance(days, list):
-                day_items = list(enumerate(days))
-            else:
-                day_items = [(int(k), v) for k, v in days.items()]
-            
-            for day_idx, day_data in day_items:
-                day_date = week_monday + timedelta(days=int(day_idx))
-                if fd and day_date < fd:
-                    continue
-                if ud and day_date > ud:
-                    continue
-                
-                for period in ['am', 'pm']:
-                    cell = day_data.get(period, {})
-                    job = cell.get('job', '').strip()
-                    if not job:
-                        continue
-                    color = cell.get('color', '')
-                    color_id = cell.get('color_id', '')
-                    area = 'Unassigned'
-                    if color_id and color_id in color_lookup:
-                        area = color_lookup[color_id]['name']
-                    elif color and color in color_by_hex:
-                        area = color_by_hex[color]['name']
-                    key = f"{area}, {job}"
-                    if is_left:
-                        left_total += 1
-                        left_combined[key] = left_combined.get(key, 0) + 1
-                    else:
-                        total_cells += 1
-                        combined[key] = combined.get(key, 0) + 1
-    
-    def to_breakdown(counts, total):
-        return sorted([
-            {"name": k, "area": k.split(", ", 1)[0], "job": k.split(", ", 1)[1] if ", " in k else k,
-             "count": v, "percent": round(v / total * 100, 1) if total > 0 else 0}
-            for k, v in counts.items()
-        ], key=lambda x: -x["count"])
-    
-    return {
-        "combined_breakdown": to_breakdown(combined, total_cells),
-        "total_cells": total_cells,
-        "left_combined_breakdown": to_breakdown(left_combined, left_total),
-        "left_total_cells": left_total,
-        "weeks_included": len(week_docs)
-    }
+    # Sums the per-week rollups stored on save/archive (see workplan_costing.py)
+    return await get_costing(db, from_date, until_date)
+
+@app.post("/api/admin/workplan/costing/rebuild")
+async def rebuild_workplan_costing():
+    """Recompute the costing rollups from the current workplan and the archive"""
+    try:
+        weeks = await rebuild_costing_rollups(db)
+        return {"success": True, "weeks": weeks}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild costing rollups: {str(e)}")
 
 # --- One-time data migration: import JSON exports from the old Emergent app ---
 import json as _json
@@ -4221,6 +3673,11 @@ async def import_data(
         await invalidate_cache()
     except Exception:
         pass
+    if collection == "assets":
+        invalidate_asset_index()
+    if collection == "checklists":
+        # The activity buckets still count the old checklists
+        await rebuild_employee_activity(db)
 
     return {"collection": collection, "replaced": deleted, "imported": inserted}
 
@@ -4299,7 +3756,6 @@ document.getElementById('go').onclick = async function () {
 # the React dev server this block is skipped automatically.
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 
 FRONTEND_BUILD = Path(__file__).resolve().parent.parent / "frontend" / "build"
 if FRONTEND_BUILD.is_dir():
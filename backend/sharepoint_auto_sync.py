@@ -4,13 +4,12 @@ Uses client credentials flow (app-only authentication) for scheduled background
 """
 
 import os
-import requests
 import logging
 from typing import List, Dict, Tuple
-from io import BytesIO
-import openpyxl
 from datetime import datetime
 from dotenv import load_dotenv
+from sheet_schema import parse_staff_workbook, parse_assets_workbook, SheetSchemaError
+from asset_index import invalidate_asset_index
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -31,6 +30,8 @@ class SharePointAutoSync:
         
     def _get_access_token(self) -> str:
         """Get access token using client credentials flow (app-only)"""
+        import requests  # imported on first use to keep startup fast
+        
         if not self.client_id:
             raise ValueError("Missing AZURE_CLIENT_ID environment variable")
         if not self.client_secret:
@@ -60,6 +61,8 @@ class SharePointAutoSync:
     
     def _make_graph_request(self, url: str, stream: bool = False):
         """Make authenticated request to Microsoft Graph API"""
+        import requests
+        
         if not self.access_token:
             self._get_access_token()
         
@@ -163,83 +166,14 @@ class SharePointAutoSync:
     
     def _parse_staff_excel(self, file_content: bytes) -> List[Dict]:
         """Parse staff Excel file and extract employee data"""
-        workbook = openpyxl.load_workbook(BytesIO(file_content))
-        sheet = workbook[workbook.sheetnames[0]]
-        
-        # Get headers
-        headers = [str(cell.value).strip().lower() if cell.value else '' for cell in sheet[1]]
-        logger.info(f"Excel headers: {headers}")
-        
-        # Find column indices - prioritize 'employee number' column
-        name_col = None
-        number_col = None
-        workshop_col = None
-        admin_col = None
-        manager_col = None
-        
-        for i, header in enumerate(headers):
-            # Check for employee number column FIRST (more specific match)
-            if ('employee' in header and 'number' in header) or header == 'emp no' or header == 'employee_number':
-                number_col = i
-            elif 'name' in header and 'employee' not in header:
-                name_col = i
-            elif 'workshop' in header and 'control' in header:
-                workshop_col = i
-            elif 'admin' in header and 'control' in header:
-                admin_col = i
-            elif 'manager' in header:
-                manager_col = i
-        
-        # If we didn't find employee number yet, look for other patterns (but NOT phone number)
-        if number_col is None:
-            for i, header in enumerate(headers):
-                if ('number' in header or 'emp' in header) and 'phone' not in header and 'tel' not in header:
-                    number_col = i
-                    break
-        
-        # Fallback
-        if name_col is None:
-            name_col = 0
-        if number_col is None and len(headers) > 1:
-            number_col = 1
-        
-        logger.info(f"Column mapping - name: {name_col}, number: {number_col}, workshop: {workshop_col}, admin: {admin_col}, manager: {manager_col}")
-        
-        if number_col is None:
-            raise Exception("Could not find Employee Number column")
-        
-        # Extract staff data
-        staff_data = []
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            if row and len(row) > max(name_col, number_col):
-                name = str(row[name_col]).strip() if row[name_col] else ''
-                emp_number = str(row[number_col]).strip() if row[number_col] else ''
-                
-                workshop_control = None
-                admin_control = None
-                manager_control = None
-                
-                if workshop_col is not None and len(row) > workshop_col and row[workshop_col]:
-                    workshop_control = str(row[workshop_col]).strip().lower()
-                
-                if admin_col is not None and len(row) > admin_col and row[admin_col]:
-                    admin_control = str(row[admin_col]).strip().lower()
-                
-                if manager_col is not None and len(row) > manager_col and row[manager_col]:
-                    manager_control = str(row[manager_col]).strip().lower()
-                
-                if name and emp_number and name.lower() not in ['name', 'staff', 'employee']:
-                    staff_data.append({
-                        'name': name,
-                        'employee_number': emp_number,
-                        'active': True,
-                        'workshop_control': workshop_control,
-                        'admin_control': admin_control,
-                        'manager_control': manager_control
-                    })
-        
-        logger.info(f"Parsed {len(staff_data)} staff members from Excel")
-        return staff_data
+        try:
+            parsed = parse_staff_workbook(file_content)
+        except SheetSchemaError as e:
+            raise Exception(str(e))
+        if parsed['errors']:
+            logger.warning(f"Staff Excel: {len(parsed['errors'])} rows rejected, first: {parsed['errors'][:5]}")
+        logger.info(f"Parsed {len(parsed['rows'])} staff members from Excel")
+        return parsed['rows']
     
     async def sync_staff_list(self, db) -> Dict:
         """Main sync function - downloads staff list from SharePoint and updates database"""
@@ -300,135 +234,15 @@ class SharePointAutoSync:
     
     def _parse_assets_excel(self, file_content: bytes) -> Tuple[List[Dict], List[Dict]]:
         """Parse assets Excel file and extract asset data and checklist templates"""
-        workbook = openpyxl.load_workbook(BytesIO(file_content))
-        
-        # First sheet contains assets
-        sheet = workbook[workbook.sheetnames[0]]
-        headers = [str(cell.value).strip().lower() if cell.value else '' for cell in sheet[1]]
-        logger.info(f"Assets Excel headers: {headers}")
-        
-        # Find column indices
-        check_type_col = None
-        name_col = None
-        make_col = None
-        
-        for i, header in enumerate(headers):
-            if header == 'check type' or 'checktype' in header:
-                check_type_col = i
-            elif header == 'namecolumn' or ('name' in header and 'check' not in header):
-                name_col = i
-            elif header == 'makecolumn' or 'make' in header:
-                make_col = i
-        
-        if check_type_col is None or name_col is None or make_col is None:
-            raise Exception(f"Could not find required columns. Found: {headers}")
-        
-        logger.info(f"Assets column mapping - check_type: {check_type_col}, name: {name_col}, make: {make_col}")
-        
-        # Extract assets
-        assets = []
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            if row and len(row) > max(check_type_col, name_col, make_col):
-                check_type = str(row[check_type_col]).strip() if row[check_type_col] else ''
-                name = str(row[name_col]).strip() if row[name_col] else ''
-                make = str(row[make_col]).strip() if row[make_col] else ''
-                
-                if check_type and name and make:
-                    assets.append({
-                        'check_type': check_type,
-                        'name': name,
-                        'make': make
-                    })
-        
-        logger.info(f"Parsed {len(assets)} assets from Excel")
-        
-        # Process checklist template sheets
-        checklist_templates = []
-        unique_check_types = set(asset['check_type'] for asset in assets)
-        
-        for sheet_name in workbook.sheetnames[1:]:  # Skip first sheet (assets)
-            sheet = workbook[sheet_name]
-            
-            # Try to match sheet name with check types
-            matching_check_type = None
-            sheet_name_clean = sheet_name.lower().replace('/', '').replace(' ', '').replace('_', '').replace('-', '').replace('checklist', '')
-            
-            # First try exact matches
-            for check_type in unique_check_types:
-                check_type_clean = check_type.lower().replace('/', '').replace(' ', '').replace('_', '').replace('-', '').replace('checklist', '')
-                if sheet_name_clean == check_type_clean or check_type.lower() == sheet_name.lower():
-                    matching_check_type = check_type
-                    break
-            
-            # If no exact match, try partial matches (recalculate check_type_clean each iteration)
-            if not matching_check_type:
-                for check_type in unique_check_types:
-                    check_type_clean = check_type.lower().replace('/', '').replace(' ', '').replace('_', '').replace('-', '').replace('checklist', '')
-                    if check_type_clean in sheet_name_clean or sheet_name_clean in check_type_clean:
-                        matching_check_type = check_type
-                        break
-            
-            if not matching_check_type:
-                logger.warning(f"Sheet '{sheet_name}' doesn't match any check type, skipping")
-                continue
-            
-            logger.info(f"Matched sheet '{sheet_name}' -> check_type '{matching_check_type}'")
-            
-            # Extract checklist items from sheet
-            items = []
-            sheet_headers = [str(cell.value).strip().lower() if cell.value else '' for cell in sheet[1]]
-            
-            item_col = None
-            critical_col = None
-            photo_col = None
-            compulsory_col = None
-            
-            for i, h in enumerate(sheet_headers):
-                if 'item' in h or 'check' in h or 'task' in h or 'description' in h:
-                    item_col = i
-                elif 'critical' in h or 'common' in h:
-                    critical_col = i
-                elif 'photo' in h:
-                    photo_col = i
-                elif 'compulsory' in h or 'compulsary' in h:
-                    compulsory_col = i
-            
-            if item_col is None:
-                item_col = 0  # Fallback to first column
-            
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if row and len(row) > item_col and row[item_col]:
-                    item_text = str(row[item_col]).strip()
-                    if item_text and item_text.lower() not in ['item', 'check', 'task', 'description', ''] and len(item_text) > 3:
-                        is_critical = False
-                        photo_required = False
-                        is_compulsory = False
-                        
-                        if critical_col is not None and len(row) > critical_col and row[critical_col]:
-                            is_critical = str(row[critical_col]).strip().lower() in ['yes', 'true', '1', 'y']
-                        
-                        if photo_col is not None and len(row) > photo_col and row[photo_col]:
-                            photo_required = str(row[photo_col]).strip().lower() in ['yes', 'true', '1', 'y']
-                        
-                        if compulsory_col is not None and len(row) > compulsory_col and row[compulsory_col]:
-                            is_compulsory = str(row[compulsory_col]).strip().lower() in ['yes', 'true', '1', 'y', 'x', 'compulsory']
-                        
-                        items.append({
-                            'item': item_text,
-                            'critical': is_critical,
-                            'photo_required': photo_required,
-                            'compulsory': is_compulsory
-                        })
-            
-            if items:
-                checklist_templates.append({
-                    'check_type': matching_check_type,
-                    'sheet_name': sheet_name,
-                    'items': items
-                })
-                logger.info(f"Parsed {len(items)} checklist items for '{matching_check_type}' from sheet '{sheet_name}'")
-        
-        return assets, checklist_templates
+        try:
+            parsed = parse_assets_workbook(file_content)
+        except SheetSchemaError as e:
+            raise Exception(str(e))
+        if parsed['errors']:
+            logger.warning(f"Assets Excel: {len(parsed['errors'])} rows rejected, first: {parsed['errors'][:5]}")
+        for line in parsed['sheets']:
+            logger.info(f"Template sheet: {line}")
+        return parsed['rows'], parsed['templates']
     
     async def sync_assets_list(self, db) -> Dict:
         """Sync assets and checklist templates from SharePoint"""
@@ -482,6 +296,7 @@ class SharePointAutoSync:
                 new_assets.append(asset_dict)
             
             await db.assets.insert_many(new_assets)
+            invalidate_asset_index()
             logger.info(f"Inserted {len(new_assets)} assets")
             
             # Update checklist templates - clear all and re-insert for clean state
@@ -6,11 +6,9 @@ for staff names and machine assets using Microsoft Graph API.
 """
 
 import os
-import requests
 import re
 from typing import List, Dict, Optional, Tuple
 from urllib.parse import unquote, urlparse
-import msal
 import logging
 from dotenv import load_dotenv
 
@@ -53,6 +51,7 @@ class SharePointExcelIntegration:
         if not all([self.client_id, self.client_secret, self.tenant_id]):
             raise ValueError("Missing Azure credentials. Please set AZURE_CLIENT_ID, AZURE_CLIENT_SECRET, and AZURE_TENANT_ID environment variables.")
         
+        import msal
         self.app = msal.ConfidentialClientApplication(
             client_id=self.client_id,
             client_credential=self.client_secret,
@@ -128,6 +127,8 @@ class SharePointExcelIntegration:
     
     def _make_graph_request(self, url: str, method: str = "GET", data: Dict = None) -> Dict:
         """Make authenticated request to Microsoft Graph API"""
+        import requests  # imported on first use to keep startup fast
+        
         if not self.access_token:
             raise Exception("No access token available. Please authenticate first.")
         
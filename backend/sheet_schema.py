@@ -0,0 +1,263 @@
+"""
+Declarative column mapping and validation for the staff and asset
+spreadsheets. Used by both the admin upload endpoints and the SharePoint
+auto-sync so header detection lives in one place.
+
+A SheetSchema lists Columns with header-matching rules. read_sheet() maps
+the header row once, then cleans whole columns with pandas and returns the
+valid rows plus per-row errors.
+
+pandas is imported on first use, not at import time: it is the slowest
+import in the backend and most workers never parse a sheet.
+"""
+from __future__ import annotations
+
+import io
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRUTHY = {'yes', 'true', '1', 'y'}
+COMPULSORY_TRUTHY = TRUTHY | {'x', 'compulsory'}
+
+
+class SheetSchemaError(ValueError):
+    """The sheet is missing a required column."""
+
+
+class Column:
+    """One output field.
+
+    match(header) picks the column from the lower-cased header row;
+    fallback(header) is tried only if nothing matched, then position.
+    kind is "text" (stripped string), "lower" (lower-cased, None if empty)
+    or "flag" (bool, true if the value is in truthy)."""
+
+    def __init__(self, field, match, fallback=None, position=None, required=False,
+                 kind="text", truthy=TRUTHY, skip_values=(), min_length=0, missing_message=None):
+        self.field = field
+        self.match = match
+        self.fallback = fallback
+        self.position = position
+        self.required = required
+        self.kind = kind
+        self.truthy = truthy
+        self.skip_values = set(skip_values)
+        self.min_length = min_length
+        self.missing_message = missing_message or f"Could not find the {field} column"
+
+
+class SheetSchema:
+    def __init__(self, name, columns: List[Column]):
+        self.name = name
+        self.columns = columns
+
+    def map_columns(self, headers: List[str]) -> Dict[str, int]:
+        """Header index per field. Each header goes to the first column whose
+        rule matches it (so more specific columns are listed first); if several
+        headers match one column the last one wins."""
+        mapping = {}
+        for i, header in enumerate(headers):
+            for col in self.columns:
+                if col.match(header):
+                    mapping[col.field] = i
+                    break
+        for col in self.columns:
+            if col.field in mapping:
+                continue
+            if col.fallback:
+                for i, header in enumerate(headers):
+                    if col.fallback(header):
+                        mapping[col.field] = i
+                        break
+            if col.field not in mapping and col.position is not None and len(headers) > col.position:
+                mapping[col.field] = col.position
+        for col in self.columns:
+            if col.required and col.field not in mapping:
+                raise SheetSchemaError(col.missing_message)
+        return mapping
+
+
+def read_workbook(content: bytes) -> Dict[str, pd.DataFrame]:
+    """All sheets of an .xlsx as raw (header=None) frames, in workbook order."""
+    import pandas as pd
+    return pd.read_excel(io.BytesIO(content), sheet_name=None, header=None, dtype=object, engine="openpyxl")
+
+
+def _clean_text(series: pd.Series) -> pd.Series:
+    # Blank, None and NaN cells all become ''
+    return series.where(series.notna(), "").astype(str).str.strip()
+
+
+def read_sheet(frame: pd.DataFrame, schema: SheetSchema) -> Dict:
+    """Map columns from row 1 and coerce the remaining rows in bulk.
+
+    Returns {"rows", "errors", "headers", "columns", "rows_processed",
+    "rows_skipped"}. Rows with every mapped field empty, or with a value
+    listed in a column's skip_values, are skipped quietly; rows missing a
+    required value are reported in errors as {"row", "field", "message"}
+    with the Excel row number."""
+    import pandas as pd
+    if frame.empty:
+        raise SheetSchemaError(f"The {schema.name} sheet is empty")
+    headers = _clean_text(frame.iloc[0]).str.lower().tolist()
+    mapping = schema.map_columns(headers)
+    data = frame.iloc[1:]
+
+    text = {}
+    out = {}
+    for col in schema.columns:
+        if col.field in mapping:
+            raw = _clean_text(data[frame.columns[mapping[col.field]]])
+        else:
+            raw = pd.Series("", index=data.index)
+        text[col.field] = raw
+        if col.kind == "lower":
+            out[col.field] = raw.str.lower().where(raw != "", None)
+        elif col.kind == "flag":
+            out[col.field] = raw.str.lower().isin(col.truthy)
+        else:
+            out[col.field] = raw
+
+    blank = pd.Series(True, index=data.index)
+    for field in mapping:
+        blank &= text[field] == ""
+    skipped = blank.copy()
+    invalid = pd.Series(False, index=data.index)
+    for col in schema.columns:
+        if col.skip_values:
+            skipped |= text[col.field].str.lower().isin(col.skip_values)
+        if col.min_length:
+            skipped |= (text[col.field] != "") & (text[col.field].str.len() <= col.min_length)
+        if col.required:
+            invalid |= text[col.field] == ""
+    invalid &= ~skipped
+
+    errors = []
+    for idx in data.index[invalid]:
+        for col in schema.columns:
+            if col.required and text[col.field][idx] == "":
+                errors.append({"row": int(idx) + 1, "field": col.field, "message": f"Missing {col.field}"})
+
+    keep = ~(skipped | invalid)
+    result = pd.DataFrame({field: series[keep] for field, series in out.items()})
+    rows = result.to_dict("records")
+    return {
+        "rows": rows,
+        "errors": errors,
+        "headers": headers,
+        "columns": mapping,
+        "rows_processed": len(data),
+        "rows_skipped": len(data) - len(rows),
+    }
+
+
+# ---- Schemas ----
+
+STAFF_SCHEMA = SheetSchema("staff", [
+    # Employee number first: it's the more specific match ("Employee Number" contains "number")
+    Column("employee_number",
+           match=lambda h: ('employee' in h and 'number' in h) or h in ('emp no', 'emp number', 'employee_number'),
+           # Other number-ish headers, but never a phone number
+           fallback=lambda h: ('number' in h or 'emp' in h) and not any(p in h for p in ('phone', 'tel', 'mob')),
+           position=1, required=True,
+           missing_message="Could not find Employee Number column. Please ensure your Excel has both Name and Employee Number columns."),
+    Column("name", match=lambda h: 'name' in h and 'employee' not in h, position=0, required=True,
+           skip_values=('name', 'staff', 'employee')),
+    Column("workshop_control", match=lambda h: 'workshop' in h and 'control' in h, kind="lower"),
+    Column("admin_control", match=lambda h: 'admin' in h and 'control' in h, kind="lower"),
+    Column("manager_control", match=lambda h: 'manager' in h, kind="lower"),  # "Manager" or "Manager Control"
+])
+
+ASSET_SCHEMA = SheetSchema("assets", [
+    Column("check_type", match=lambda h: h == 'check type' or 'checktype' in h, required=True,
+           missing_message="Could not find Check Type, Name of Implement, and Make columns in the file"),
+    Column("name", match=lambda h: h == 'namecolumn' or ('name' in h and 'check' not in h), required=True,
+           missing_message="Could not find Check Type, Name of Implement, and Make columns in the file"),
+    Column("make", match=lambda h: h == 'makecolumn' or 'make' in h, required=True,
+           missing_message="Could not find Check Type, Name of Implement, and Make columns in the file"),
+])
+
+TEMPLATE_SCHEMA = SheetSchema("checklist template", [
+    # Compulsory before item: a "Compulsory Check" header must not become the item column
+    Column("compulsory", match=lambda h: 'compulsory' in h or 'compulsary' in h,  # common misspelling
+           kind="flag", truthy=COMPULSORY_TRUTHY),
+    Column("item", match=lambda h: any(w in h for w in ('item', 'check', 'task', 'description')),
+           position=0, required=True,
+           skip_values=('item', 'check', 'task', 'description', 'checklist', 'safety'), min_length=3),
+    Column("critical", match=lambda h: 'critical' in h or 'common' in h, kind="flag"),
+    Column("photo_required", match=lambda h: 'photo' in h, kind="flag"),
+])
+
+
+def _clean_type_name(value: str) -> str:
+    return value.lower().replace('/', '').replace(' ', '').replace('_', '').replace('-', '').replace('checklist', '')
+
+
+def match_check_type(sheet_name: str, check_types) -> Optional[str]:
+    """The asset check type a template sheet belongs to: exact match on the
+    cleaned names first, then a partial match either way round."""
+    sheet_clean = _clean_type_name(sheet_name)
+    cleaned = [(ct, _clean_type_name(ct)) for ct in check_types]
+    for ct, ct_clean in cleaned:
+        if sheet_clean == ct_clean or ct.lower() == sheet_name.lower():
+            return ct
+    for ct, ct_clean in cleaned:
+        if ct_clean in sheet_clean or sheet_clean in ct_clean:
+            return ct
+    return None
+
+
+def parse_staff_workbook(content: bytes) -> Dict:
+    """Staff rows from the first sheet of a staff list workbook."""
+    frames = read_workbook(content)
+    first = next(iter(frames.values()))
+    result = read_sheet(first, STAFF_SCHEMA)
+    for row in result["rows"]:
+        row["active"] = True
+    logger.info(f"Staff sheet: {len(result['rows'])} valid rows, {len(result['errors'])} errors, columns {result['columns']}")
+    return result
+
+
+def parse_assets_workbook(content: bytes, keep_unmatched_sheets: bool = False) -> Dict:
+    """Assets from the first sheet plus one checklist template per other
+    sheet. Sheets that don't match an asset check type are skipped, or kept
+    under their own name with keep_unmatched_sheets=True.
+
+    Returns the read_sheet() result for the asset sheet with extra
+    "templates" and "sheets" (a summary line per template sheet) keys."""
+    frames = read_workbook(content)
+    sheet_names = list(frames)
+    result = read_sheet(frames[sheet_names[0]], ASSET_SCHEMA)
+    unique_check_types = set(a['check_type'] for a in result["rows"])
+
+    templates = []
+    sheets = []
+    for sheet_name in sheet_names[1:]:
+        check_type = match_check_type(sheet_name, unique_check_types)
+        if not check_type:
+            if not keep_unmatched_sheets:
+                logger.warning(f"Sheet '{sheet_name}' doesn't match any check type, skipping")
+                continue
+            check_type = sheet_name
+        try:
+            items = read_sheet(frames[sheet_name], TEMPLATE_SCHEMA)["rows"]
+        except SheetSchemaError:
+            continue
+        if not items:
+            continue
+        # Keep the item text first, as the templates have always been stored
+        items = [{"item": i["item"], "critical": i["critical"], "photo_required": i["photo_required"],
+                  "compulsory": i["compulsory"]} for i in items]
+        templates.append({"check_type": check_type, "sheet_name": sheet_name, "items": items})
+        compulsory_count = sum(1 for i in items if i["compulsory"])
+        sheets.append(f"{sheet_name} -> {check_type} ({len(items)} items, {compulsory_count} compulsory)")
+
+    result["templates"] = templates
+    result["sheets"] = sheets
+    logger.info(f"Assets workbook: {len(result['rows'])} assets, {len(templates)} templates")
+    return result
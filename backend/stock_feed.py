@@ -0,0 +1,135 @@
+"""
+Background-refreshed summary from the Abreys Stock Control app
+(packouttracks): store utilisation per shed and grader throughput.
+
+A scheduled poll fetches sheds, zones and grader stats through one shared
+pooled client and keeps the built summary in memory, so the dashboard never
+waits on the stock app. After repeated failures a circuit breaker stops
+calling it for a while and the last good snapshot is served, marked stale.
+"""
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+STOCK_API_BASE = os.environ.get(
+    "STOCK_API_BASE", "https://packouttracks-r-1774892359.emergent.host/api"
+)
+STOCK_POLL_SECONDS = int(os.environ.get("STOCK_POLL_SECONDS", "60"))
+FAILURE_THRESHOLD = 3      # consecutive failed polls before the breaker opens
+BREAKER_COOLDOWN = 300     # seconds to leave the stock app alone once open
+
+
+def build_stock_summary(sheds, zones):
+    """Per-shed utilisation, grouping zones by shed_id in one pass."""
+    by_shed = {}
+    for z in zones:
+        by_shed.setdefault(z.get("shed_id"), []).append(z)
+    stores = []
+    for shed in sheds:
+        shed_zones = by_shed.get(shed.get("id"), [])
+        total = sum((z.get("total_quantity") or 0) for z in shed_zones)
+        occupied = sum(1 for z in shed_zones if (z.get("total_quantity") or 0) > 0)
+        utilization = round(occupied / len(shed_zones) * 100) if shed_zones else 0
+        stores.append({
+            "name": shed.get("name") or "",
+            "crop_type": shed.get("crop_type") or "",
+            "zones": len(shed_zones),
+            "occupied_zones": occupied,
+            "total_stock": round(total, 1),
+            "utilization": utilization,
+        })
+    return stores
+
+
+class StockFeed:
+    def __init__(self, base_url=STOCK_API_BASE):
+        self.base_url = base_url
+        self._client = None
+        self._lock = asyncio.Lock()
+        self.snapshot = None        # last good {"stores", "graders"}
+        self.updated_at = None      # when the snapshot was fetched
+        self.last_error = None
+        self.failures = 0
+        self.open_until = 0.0       # breaker open while time.monotonic() < this
+
+    def _http(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(20, connect=5),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                follow_redirects=True,
+            )
+        return self._client
+
+    async def _get_json(self, path):
+        r = await self._http().get(f"{self.base_url}{path}")
+        r.raise_for_status()
+        return r.json()
+
+    async def refresh(self):
+        """Fetch everything and swap in a new snapshot. Skipped while the
+        breaker is open; concurrent callers share one fetch."""
+        if time.monotonic() < self.open_until:
+            return False
+        if self._lock.locked():
+            async with self._lock:
+                return self.last_error is None
+        async with self._lock:
+            try:
+                sheds, zones = await asyncio.gather(self._get_json("/sheds"), self._get_json("/zones"))
+            except Exception as e:
+                self._record_failure(e)
+                return False
+            # Grader stats are optional: keep the previous ones if this call fails
+            graders = (self.snapshot or {}).get("graders", [])
+            try:
+                g = await self._get_json("/grader-stats")
+                if isinstance(g, list):
+                    graders = g
+            except Exception as e:
+                logger.warning(f"Stock app grader stats unavailable: {str(e)}")
+            self.snapshot = {"stores": build_stock_summary(sheds, zones), "graders": graders}
+            self.updated_at = datetime.now(timezone.utc)
+            self.last_error = None
+            self.failures = 0
+            return True
+
+    def _record_failure(self, e):
+        self.failures += 1
+        self.last_error = str(e)
+        if self.failures >= FAILURE_THRESHOLD:
+            self.open_until = time.monotonic() + BREAKER_COOLDOWN
+            logger.error(f"Stock app unreachable {self.failures} times, pausing polls for {BREAKER_COOLDOWN}s: {str(e)}")
+        else:
+            logger.warning(f"Stock app poll failed ({self.failures}): {str(e)}")
+
+    async def get_summary(self):
+        """The in-memory summary plus its age. Fetches inline only if there
+        has never been a good poll. Returns None if nothing is available."""
+        if self.snapshot is None:
+            await self.refresh()
+        if self.snapshot is None:
+            return None
+        age = (datetime.now(timezone.utc) - self.updated_at).total_seconds()
+        return {
+            **self.snapshot,
+            "updated_at": self.updated_at.isoformat(),
+            "age_seconds": round(age),
+            "stale": self.last_error is not None or age > STOCK_POLL_SECONDS * 3,
+            "error": self.last_error,
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global instance
+stock_feed = StockFeed()
@@ -0,0 +1,126 @@
+"""
+Full-text search over fault notes and the safety reports, using a MongoDB
+text index on each collection (one per collection, named "search_text",
+built from SOURCES by the index manifest in migrations.py).
+
+search() runs the query against every source in parallel, each returning
+its best hits by text score, merges them into one ranking and cuts a snippet
+around the first matching word. Field weights favour titles and the main
+description over secondary notes.
+"""
+import re
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+SOURCES = {
+    "checklists": {
+        "weights": {"checklist_items.notes": 5, "workshop_notes": 5, "machine_make": 1, "machine_model": 1},
+        "projection": {"id": 1, "machine_make": 1, "machine_model": 1, "staff_name": 1, "check_type": 1,
+                       "completed_at": 1, "workshop_notes": 1, "checklist_items.item": 1, "checklist_items.notes": 1},
+        "date": "completed_at",
+    },
+    "near_misses": {
+        "weights": {"description": 10, "location": 3, "action_required": 3},
+        "projection": {"id": 1, "description": 1, "location": 1, "action_required": 1, "created_at": 1},
+        "date": "created_at",
+    },
+    "suggestions": {
+        "weights": {"title": 10, "description": 5, "location": 2, "review_notes": 2},
+        "projection": {"id": 1, "title": 1, "description": 1, "location": 1, "review_notes": 1, "created_at": 1},
+        "date": "created_at",
+    },
+    "accidents": {
+        "weights": {"accident_description": 10, "injury_details": 5, "accident_location": 3,
+                    "investigation_notes": 2},
+        "projection": {"id": 1, "report_number": 1, "accident_description": 1, "injury_details": 1,
+                       "accident_location": 1, "investigation_notes": 1, "created_at": 1},
+        "date": "created_at",
+    },
+    "whistleblowing": {
+        "weights": {"title": 10, "description": 5, "investigation_notes": 2},
+        "projection": {"id": 1, "title": 1, "description": 1, "investigation_notes": 1, "created_at": 1},
+        "date": "created_at",
+    },
+}
+
+SNIPPET_CHARS = 160
+
+
+def _texts(source, doc):
+    """(field, text) pairs in weight order, for snippets."""
+    if source == "checklists":
+        pairs = [("workshop_notes", doc.get("workshop_notes"))]
+        for item in doc.get("checklist_items") or []:
+            if item.get("notes"):
+                pairs.append((item.get("item") or "notes", item["notes"]))
+        return [(f, t) for f, t in pairs if t]
+    weights = SOURCES[source]["weights"]
+    return [(f, doc[f]) for f in sorted(weights, key=lambda f: -weights[f]) if doc.get(f)]
+
+
+def _title(source, doc):
+    if source == "checklists":
+        return f"{doc.get('machine_make', '')} {doc.get('machine_model', '')}".strip()
+    if source == "near_misses":
+        return doc.get("location") or "Near miss"
+    if source == "accidents":
+        return f"Accident {doc.get('report_number') or ''}".strip()
+    return doc.get("title") or source
+
+
+def make_snippet(pairs, terms):
+    """A window of text around the first term found (words match on their
+    first four letters, roughly as the stemmed index does)."""
+    for field, text in pairs:
+        text = str(text)
+        for term in terms:
+            m = re.search(r"\b" + re.escape(term[:4]), text, re.IGNORECASE)
+            if m:
+                start = max(0, m.start() - SNIPPET_CHARS // 3)
+                end = min(len(text), start + SNIPPET_CHARS)
+                snippet = text[start:end].strip()
+                return field, ("…" if start else "") + snippet + ("…" if end < len(text) else "")
+    if pairs:
+        field, text = pairs[0]
+        text = str(text)
+        return field, text[:SNIPPET_CHARS] + ("…" if len(text) > SNIPPET_CHARS else "")
+    return None, ""
+
+
+async def _search_source(db, source, q, terms, limit):
+    spec = SOURCES[source]
+    docs = await db[source].find(
+        {"$text": {"$search": q}},
+        {"_id": 0, **spec["projection"], "score": {"$meta": "textScore"}},
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(length=limit)
+    hits = []
+    for doc in docs:
+        field, snippet = make_snippet(_texts(source, doc), terms)
+        hits.append({
+            "source": source,
+            "id": doc.get("id"),
+            "title": _title(source, doc),
+            "field": field,
+            "snippet": snippet,
+            "date": doc.get(spec["date"]),
+            "score": round(doc.get("score", 0), 3),
+        })
+    return hits
+
+
+async def search(db, q, sources=None, skip=0, limit=20):
+    """Ranked hits across the sources: {"hits": [...], "next_skip"}.
+    Each source returns its top skip + limit hits, so deep pages cost more;
+    narrow the sources or the query instead of paging far."""
+    sources = [s for s in (sources or SOURCES) if s in SOURCES]
+    terms = [t for t in re.findall(r"\w+", q.lower()) if len(t) > 1]
+    per_source = await asyncio.gather(*[
+        _search_source(db, s, q, terms, skip + limit + 1) for s in sources
+    ])
+    # Best score first, newest first among equal scores
+    ranked = sorted((h for hits in per_source for h in hits), key=lambda h: h["date"] or "", reverse=True)
+    ranked.sort(key=lambda h: -h["score"])
+    page = ranked[skip:skip + limit]
+    return {"hits": page, "next_skip": skip + limit if len(ranked) > skip + limit else None}
@@ -0,0 +1,233 @@
+"""
+Workplan costing from per-week rollups.
+
+Whenever a week's rows are saved (the current draft) or archived, the week
+is reduced to per-day cell counts by (colour, job, left) and stored in
+db.workplan_costing_rollups. Costing then only sums those small documents
+for the weeks that overlap the requested dates, instead of walking every
+row x day x AM/PM cell of every archived week on each call.
+
+The current draft is rolled up per row, so a cell edit or a save only
+recomputes the rows it changed.
+
+Colours are stored by id/hex and resolved to area names when costing is
+computed, so renaming an area doesn't invalidate the rollups.
+
+Rebuild all rollups from the current workplan and the archive with:
+
+    cd backend && python workplan_costing.py rebuild
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReplaceOne, DeleteMany
+
+from workplan_store import iter_archived_weeks
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (ValueError, TypeError):
+        return None
+
+
+def week_rollup(week_start, rows, source):
+    """Per-day cell counts for one week's rows:
+    {"week_start", "source", "days": {"YYYY-MM-DD": [{"color_id", "color",
+    "job", "left", "count"}]}}. None if week_start isn't a date."""
+    week_monday = _parse_date(week_start)
+    if not week_monday:
+        return None
+    counts = {}
+    for row in rows or []:
+        is_left = bool(row.get('left', False))
+        days = row.get('days', {})
+        if isinstance(days, list):
+            day_items = list(enumerate(days))
+        else:
+            day_items = [(int(k), v) for k, v in days.items()]
+        for day_idx, day_data in day_items:
+            day_key = (week_monday + timedelta(days=int(day_idx))).isoformat()
+            for period in ['am', 'pm']:
+                cell = (day_data or {}).get(period) or {}
+                job = (cell.get('job') or '').strip()
+                if not job:
+                    continue
+                key = (day_key, cell.get('color_id', '') or '', cell.get('color', '') or '', job, is_left)
+                counts[key] = counts.get(key, 0) + 1
+    days = {}
+    for (day_key, color_id, color, job, is_left), n in counts.items():
+        days.setdefault(day_key, []).append(
+            {"color_id": color_id, "color": color, "job": job, "left": is_left, "count": n}
+        )
+    return {"week_start": week_start, "source": source, "days": days}
+
+
+def costing_from_rollups(rollups, colors, from_date=None, until_date=None, weeks_included=None):
+    """% breakdown by (area/crop + job) over the given week rollups.
+    from_date/until_date (YYYY-MM-DD) limit the days. weeks_included is
+    reported as given, else one week per rollup."""
+    color_lookup = {c["id"]: c for c in colors}
+    color_by_hex = {c["color"]: c for c in colors}
+    fd = _parse_date(from_date) if from_date else None
+    ud = _parse_date(until_date) if until_date else None
+    fd_key = fd.isoformat() if fd else None
+    ud_key = ud.isoformat() if ud else None
+
+    combined = {}
+    left_combined = {}
+    total_cells = 0
+    left_total = 0
+    for rollup in rollups:
+        for day_key, cells in (rollup.get("days") or {}).items():
+            if fd_key and day_key < fd_key:
+                continue
+            if ud_key and day_key > ud_key:
+                continue
+            for cell in cells:
+                area = 'Unassigned'
+                if cell["color_id"] and cell["color_id"] in color_lookup:
+                    area = color_lookup[cell["color_id"]]['name']
+                elif cell["color"] and cell["color"] in color_by_hex:
+                    area = color_by_hex[cell["color"]]['name']
+                key = f"{area}, {cell['job']}"
+                if cell["left"]:
+                    left_total += cell["count"]
+                    left_combined[key] = left_combined.get(key, 0) + cell["count"]
+                else:
+                    total_cells += cell["count"]
+                    combined[key] = combined.get(key, 0) + cell["count"]
+
+    def to_breakdown(counts, total):
+        return sorted([
+            {"name": k, "area": k.split(", ", 1)[0], "job": k.split(", ", 1)[1] if ", " in k else k,
+             "count": v, "percent": round(v / total * 100, 1) if total > 0 else 0}
+            for k, v in counts.items()
+        ], key=lambda x: -x["count"])
+
+    return {
+        "combined_breakdown": to_breakdown(combined, total_cells),
+        "total_cells": total_cells,
+        "left_combined_breakdown": to_breakdown(left_combined, left_total),
+        "left_total_cells": left_total,
+        "weeks_included": len(rollups) if weeks_included is None else weeks_included
+    }
+
+
+def compute_workplan_costing(week_docs, colors, from_date=None, until_date=None):
+    """Costing straight from week documents ({week_start, rows}), without
+    stored rollups."""
+    rollups = [r for r in (week_rollup(d.get("week_start"), d.get("rows", []), "adhoc") for d in week_docs) if r]
+    return costing_from_rollups(rollups, colors, from_date, until_date, len(week_docs))
+
+
+def _row_rollups(week_start, rows, now):
+    """Current-draft rollups, one per row that has any jobs."""
+    docs = []
+    for row in rows or []:
+        rollup = week_rollup(week_start, [row], "current")
+        if rollup and rollup["days"]:
+            docs.append({**rollup, "row_id": row.get("id"), "updated_at": now})
+    return docs
+
+
+async def store_week_rollup(db, week_start, rows, source):
+    """Save the rollups for a week's whole current draft ("current",
+    replacing any draft rollups) or an archived week ("archive")."""
+    now = datetime.now(timezone.utc).isoformat()
+    if source == "current":
+        await db.workplan_costing_rollups.delete_many({"source": "current"})
+        docs = _row_rollups(week_start, rows, now)
+        if docs:
+            await db.workplan_costing_rollups.insert_many(docs)
+        return docs
+    rollup = week_rollup(week_start, rows, source)
+    key = {"source": source, "week_start": week_start}
+    if rollup is None or not rows:
+        await db.workplan_costing_rollups.delete_many(key)
+        return None
+    rollup["updated_at"] = now
+    await db.workplan_costing_rollups.replace_one(key, rollup, upsert=True)
+    return rollup
+
+
+async def store_row_rollups(db, week_start, rows, removed=()):
+    """Refresh the draft rollups of just these rows (as stored) and drop
+    those of removed rows, after a cell edit or a save."""
+    docs = _row_rollups(week_start, rows, datetime.now(timezone.utc).isoformat())
+    ops = [ReplaceOne({"source": "current", "row_id": d["row_id"]}, d, upsert=True) for d in docs]
+    rolled = {d["row_id"] for d in docs}
+    gone = [r.get("id") for r in rows if r.get("id") not in rolled] + list(removed)
+    # Also the draft's previous week (now archived) and whole-draft rollups
+    # stored before they were kept per row
+    ops.append(DeleteMany({"source": "current", "$or": [
+        {"row_id": {"$in": gone}}, {"week_start": {"$ne": week_start}}, {"row_id": {"$exists": False}},
+    ]}))
+    await db.workplan_costing_rollups.bulk_write(ops, ordered=False)
+
+
+async def get_costing(db, from_date=None, until_date=None):
+    """Costing over the stored rollups whose week overlaps the date range."""
+    query = {}
+    fd = _parse_date(from_date) if from_date else None
+    ud = _parse_date(until_date) if until_date else None
+    if fd:
+        query.setdefault("week_start", {})["$gte"] = (fd - timedelta(days=6)).isoformat()
+    if ud:
+        query.setdefault("week_start", {})["$lte"] = ud.isoformat()
+    rollups = await db.workplan_costing_rollups.find(query, {"_id": 0, "days": 1}).to_list(length=None)
+    colors = await db.workplan_colors.find({}, {"_id": 0}).to_list(length=None)
+    # Every stored week (the archive plus the draft), whatever the range
+    weeks = await db.workplan_archive.count_documents({})
+    if await db.workplan_costing_rollups.find_one({"source": "current"}, {"_id": 1}):
+        weeks += 1
+    return costing_from_rollups(rollups, colors, from_date, until_date, weeks)
+
+
+async def rebuild_costing_rollups(db):
+    """Recompute every rollup from the current draft and the archive.
+    Returns the number of weeks rolled up."""
+    now = datetime.now(timezone.utc).isoformat()
+    ops = []
+    weeks = set()
+
+    def add(rollup, key):
+        if rollup:
+            rollup["updated_at"] = now
+            ops.append(ReplaceOne(key, rollup, upsert=True))
+            weeks.add((rollup["source"], rollup["week_start"]))
+
+    current = await db.workplan.find_one({"key": "current"}, {"_id": 0, "week_start": 1})
+    if current and current.get("week_start"):
+        rows = await db.workplan_rows.find(
+            {"week_start": current["week_start"]}, {"_id": 0, "row": 1}
+        ).to_list(length=None)
+        for doc in _row_rollups(current["week_start"], [r["row"] for r in rows], now):
+            add(doc, {"source": "current", "row_id": doc["row_id"]})
+    async for week_start, rows in iter_archived_weeks(db):
+        add(week_rollup(week_start, rows, "archive"), {"source": "archive", "week_start": week_start})
+
+    if ops:
+        await db.workplan_costing_rollups.bulk_write(ops, ordered=False)
+    # Anything not written just now is for a week that no longer exists
+    await db.workplan_costing_rollups.delete_many({"updated_at": {"$ne": now}})
+    logger.info(f"Rebuilt costing rollups for {len(weeks)} weeks")
+    return len(weeks)
+
+
+if __name__ == "__main__":
+    import sys
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python workplan_costing.py rebuild")
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    database = client[os.environ.get("DB_NAME", "test_database")]
+    print(f"Rolled up {asyncio.run(rebuild_costing_rollups(database))} weeks")
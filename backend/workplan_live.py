@@ -0,0 +1,216 @@
+"""
+Live channel for the workplan editor: presence and row edits are pushed to
+every open editor over a WebSocket instead of each one polling.
+
+Events go through a pluggable broker so they reach editors connected to
+any worker:
+
+  LocalBroker        -> in-process only (single worker, or no replica set)
+  ChangeStreamBroker -> events are inserted into db.workplan_events and every
+                        worker tails the collection with a change stream
+
+WORKPLAN_PUBSUB=local|mongo picks one; by default the change stream is used
+when MongoDB is a replica set (change streams need one).
+
+Presence lives in db.workplan_presence, one document per user with a TTL
+index on last_seen: a heartbeat is a single upsert, MongoDB expires users
+who stop sending them, and every worker sees the same list. Only joins and
+leaves are broadcast; each editor's ping gets the current list back.
+
+Publishes are announced on the same broker ({"type": "published"}) and wake
+the staff board's long-polls on every worker.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+
+from fastapi import WebSocket
+
+from job_progress import supports_transactions
+
+logger = logging.getLogger(__name__)
+
+WORKPLAN_PUBSUB = os.environ.get("WORKPLAN_PUBSUB", "auto")
+PRESENCE_TIMEOUT_SECONDS = 60  # Consider user gone after 60 seconds (TTL on workplan_presence)
+EVENT_TTL_SECONDS = 3600       # how long broadcast events are kept in Mongo
+
+
+class LocalBroker:
+    """Delivers events straight back to this worker's hub."""
+    name = "local"
+
+    def __init__(self):
+        self._on_event = None
+
+    async def start(self, on_event):
+        self._on_event = on_event
+
+    async def publish(self, event):
+        if self._on_event:
+            await self._on_event(event)
+
+    async def stop(self):
+        self._on_event = None
+
+
+class ChangeStreamBroker:
+    """Fans events out across workers through a Mongo collection and a
+    change stream on it."""
+    name = "mongo"
+
+    def __init__(self, db, collection="workplan_events"):
+        self.coll = db[collection]
+        self._task = None
+
+    async def start(self, on_event):
+        await self.coll.create_index("created_at", expireAfterSeconds=EVENT_TTL_SECONDS)
+        self._task = asyncio.create_task(self._watch(on_event))
+
+    async def _watch(self, on_event):
+        resume_after = None
+        while True:
+            try:
+                async with self.coll.watch(
+                    [{"$match": {"operationType": "insert"}}], resume_after=resume_after
+                ) as stream:
+                    async for change in stream:
+                        resume_after = change["_id"]
+                        event = change["fullDocument"]
+                        event.pop("_id", None)
+                        event.pop("created_at", None)
+                        await on_event(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Workplan change stream interrupted, reconnecting: {str(e)}")
+                await asyncio.sleep(2)
+
+    async def publish(self, event):
+        await self.coll.insert_one({**event, "created_at": datetime.now(timezone.utc)})
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+class WorkplanHub:
+    def __init__(self):
+        self.broker = LocalBroker()
+        self.db = None
+        self.sockets = {}   # {websocket: {"user_id", "client_id"}} on this worker
+        self._published = asyncio.Event()  # set (and replaced) on each publish
+
+    async def start(self, db):
+        self.db = db
+        use_mongo = WORKPLAN_PUBSUB == "mongo" or (
+            WORKPLAN_PUBSUB == "auto" and await supports_transactions(db)
+        )
+        self.broker = ChangeStreamBroker(db) if use_mongo else LocalBroker()
+        await self.broker.start(self._deliver)
+        logger.info(f"Workplan live channel using the {self.broker.name} broker")
+
+    async def stop(self):
+        await self.broker.stop()
+        for ws in list(self.sockets):
+            try:
+                await ws.close()
+            except Exception:
+                pass
+        self.sockets.clear()
+
+    async def publish(self, event):
+        """Send an event to every editor on every worker. Never raises: a
+        broadcast failing must not fail the save that triggered it."""
+        try:
+            await self.broker.publish(event)
+        except Exception as e:
+            logger.error(f"Workplan broadcast failed: {str(e)}")
+
+    # ---------- published workplan ----------
+
+    def publish_waiter(self):
+        """An event that is set on the next publish. Take it before reading
+        the current version so a publish in between isn't missed."""
+        return self._published
+
+    def _wake_publish_waiters(self):
+        event, self._published = self._published, asyncio.Event()
+        event.set()
+
+    # ---------- presence ----------
+
+    async def active_users(self, exclude=None):
+        # The TTL monitor only runs once a minute, so filter on last_seen too
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=PRESENCE_TIMEOUT_SECONDS)
+        docs = await self.db.workplan_presence.find(
+            {"last_seen": {"$gte": cutoff}}, {"_id": 0, "user_id": 1, "name": 1}
+        ).sort("name", 1).to_list(length=None)
+        return [{"user_id": d["user_id"], "name": d["name"]} for d in docs if d["user_id"] != exclude]
+
+    async def heartbeat(self, user_id, name):
+        """Mark a user present and return the other users in the editor."""
+        result = await self.db.workplan_presence.update_one(
+            {"user_id": user_id},
+            {"$set": {"name": name, "last_seen": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        if result.upserted_id is not None:
+            await self.publish({"type": "presence"})
+        return await self.active_users(exclude=user_id)
+
+    async def leave(self, user_id):
+        result = await self.db.workplan_presence.delete_one({"user_id": user_id})
+        if result.deleted_count:
+            await self.publish({"type": "presence"})
+
+    # ---------- sockets ----------
+
+    async def connect(self, websocket: WebSocket, user_id, name, client_id):
+        await websocket.accept()
+        others = await self.heartbeat(user_id, name)
+        self.sockets[websocket] = {"user_id": user_id, "client_id": client_id}
+        await self._send(websocket, {"type": "presence", "active_users": others})
+
+    async def disconnect(self, websocket: WebSocket):
+        info = self.sockets.pop(websocket, None)
+        # Still here in another tab on this worker
+        if info and not any(i["user_id"] == info["user_id"] for i in self.sockets.values()):
+            await self.leave(info["user_id"])
+
+    async def _send(self, websocket, message):
+        try:
+            await websocket.send_json(message)
+        except Exception:
+            self.sockets.pop(websocket, None)
+
+    async def _deliver(self, event):
+        """Push an event from the broker to this worker's editors."""
+        try:
+            if event.get("type") == "published":
+                self._wake_publish_waiters()
+            if event.get("type") == "presence":
+                if not self.sockets:
+                    return
+                users = await self.active_users()
+                sends = [
+                    self._send(ws, {"type": "presence",
+                                    "active_users": [u for u in users if u["user_id"] != info["user_id"]]})
+                    for ws, info in list(self.sockets.items())
+                ]
+            else:
+                # The editor that made the change already has it
+                sends = [
+                    self._send(ws, event)
+                    for ws, info in list(self.sockets.items())
+                    if not event.get("origin") or info["client_id"] != event["origin"]
+                ]
+            if sends:
+                await asyncio.gather(*sends)
+        except Exception as e:
+            logger.error(f"Workplan event delivery failed: {str(e)}")
+
+
+# Global instance
+workplan_hub = WorkplanHub()
@@ -0,0 +1,300 @@
+"""
+Row-per-document storage for the workplan draft, so managers can edit
+single cells without rewriting (and overwriting) the whole week.
+
+Collections:
+  db.workplan_rows           -> {week_start, row_id, order, version, row, updated_at}
+  db.workplan_published_rows -> {publish_id, order, row}
+  db.workplan_archive        -> {week_start, rows_z, row_count, archived_at}
+  db.workplan                -> {key:'current', week_start, published_id,
+                                 published_week_start, published_at,
+                                 published_version, ...}
+
+Every row carries a version that goes up by one on each content change.
+Cell edits (patch_cell) and full saves (save_draft) only apply if the
+client's version still matches, otherwise the current row comes back as a
+conflict. Publishing copies the draft rows server-side under a new
+publish_id, points the workplan document at it and bumps
+published_version, which the staff board long-polls on.
+
+Archived weeks keep their rows as zlib-compressed JSON (rows_z) with the
+row count alongside, so listing the history never touches the rows and the
+archive stays small as the years build up.
+"""
+import json
+import zlib
+import uuid
+import logging
+from datetime import datetime, timezone
+
+from bson import Binary
+from pymongo import UpdateOne, DeleteMany, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("am", "pm")
+
+
+class RowConflict(Exception):
+    """The row changed since the client loaded it."""
+
+    def __init__(self, row):
+        super().__init__("Row was changed by someone else")
+        self.row = row
+
+
+def _client_row(doc):
+    """The row as the editor sees it, with its version."""
+    return {**doc["row"], "version": doc.get("version", 1)}
+
+
+def _clean(row):
+    return {k: v for k, v in row.items() if k != "version"}
+
+
+async def load_draft(db, week_start):
+    """Draft rows for a week, in order."""
+    if not week_start:
+        return []
+    docs = await db.workplan_rows.find(
+        {"week_start": week_start}, {"_id": 0, "row": 1, "version": 1}
+    ).sort("order", 1).to_list(length=None)
+    return [_client_row(d) for d in docs]
+
+
+async def save_draft(db, week_start, rows, deleted=None):
+    """Save a full grid. Rows whose content is unchanged are not rewritten;
+    changed rows are only written if the version sent with them (if any)
+    is still current. Rows missing from the grid are deleted only if listed
+    in deleted, or, when deleted is None (whole-grid callers), all of them.
+
+    Returns {"versions": {row_id: version}, "conflicts": [current rows],
+    "written": [rows written, as stored], "removed": [deleted row ids]}."""
+    existing = {
+        d["row_id"]: d
+        for d in await db.workplan_rows.find({"week_start": week_start}, {"_id": 0}).to_list(length=None)
+    }
+    now = datetime.now(timezone.utc).isoformat()
+    ops = []
+    conflicts = []
+    expected = {}
+    for order, row in enumerate(rows):
+        row_id = row.get("id") or str(uuid.uuid4())
+        client_version = row.get("version")
+        row = {**_clean(row), "id": row_id}
+        current = existing.get(row_id)
+        if current is None:
+            expected[row_id] = 1
+            ops.append(UpdateOne(
+                {"week_start": week_start, "row_id": row_id},
+                {"$set": {"row": row, "order": order, "updated_at": now}, "$setOnInsert": {"version": 1}},
+                upsert=True,
+            ))
+        elif current["row"] == row:
+            if current.get("order") != order:
+                ops.append(UpdateOne({"week_start": week_start, "row_id": row_id}, {"$set": {"order": order}}))
+        elif client_version is not None and client_version != current.get("version"):
+            conflicts.append(_client_row(current))
+        else:
+            ops.append(UpdateOne(
+                {"week_start": week_start, "row_id": row_id, "version": current.get("version")},
+                {"$set": {"row": row, "order": order, "updated_at": now}, "$inc": {"version": 1}},
+            ))
+            expected[row_id] = (current.get("version") or 1) + 1
+
+    sent_ids = {r.get("id") for r in rows}
+    if deleted is None:
+        gone = [rid for rid in existing if rid not in sent_ids]
+    else:
+        gone = [rid for rid in deleted if rid not in sent_ids]
+    if gone:
+        ops.append(DeleteMany({"week_start": week_start, "row_id": {"$in": gone}}))
+
+    if ops:
+        await db.workplan_rows.bulk_write(ops, ordered=False)
+
+    versions = {}
+    written = []
+    async for d in db.workplan_rows.find({"week_start": week_start}, {"_id": 0, "row_id": 1, "version": 1, "row": 1}):
+        versions[d["row_id"]] = d.get("version", 1)
+        if d["row_id"] in expected:
+            written.append(d["row"])
+            # Lost a race with another writer between the read and the write
+            if d.get("version") != expected[d["row_id"]] and d["row_id"] in existing:
+                conflicts.append(_client_row(d))
+    return {"versions": versions, "conflicts": conflicts, "written": written, "removed": gone}
+
+
+async def patch_cell(db, week_start, row_id, day, period, cell, version=None):
+    """Set one AM/PM cell of a row. Returns the updated row; raises
+    RowConflict if version is given and no longer current, and KeyError
+    if the row doesn't exist."""
+    query = {"week_start": week_start, "row_id": row_id}
+    if version is not None:
+        query["version"] = version
+    doc = await db.workplan_rows.find_one_and_update(
+        query,
+        {
+            "$set": {f"row.days.{day}.{period}": cell, "updated_at": datetime.now(timezone.utc).isoformat()},
+            "$inc": {"version": 1},
+        },
+        projection={"_id": 0, "row": 1, "version": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc:
+        return _client_row(doc)
+    current = await db.workplan_rows.find_one({"week_start": week_start, "row_id": row_id}, {"_id": 0})
+    if current is None:
+        raise KeyError(row_id)
+    raise RowConflict(_client_row(current))
+
+
+def pack_rows(rows):
+    return Binary(zlib.compress(json.dumps(rows, separators=(",", ":")).encode("utf-8")))
+
+
+def unpack_rows(doc):
+    """Rows of an archived week (compressed, or a plain array from before
+    archives were compressed)."""
+    if doc.get("rows_z") is not None:
+        return json.loads(zlib.decompress(doc["rows_z"]).decode("utf-8"))
+    return doc.get("rows", [])
+
+
+async def archive_week(db, week_start):
+    """Copy a week's draft rows into workplan_archive and drop them from the
+    draft. Returns the archived rows."""
+    rows = [_clean(r) for r in await load_draft(db, week_start)]
+    if rows:
+        await db.workplan_archive.update_one(
+            {"week_start": week_start},
+            {
+                "$set": {"week_start": week_start, "rows_z": pack_rows(rows), "row_count": len(rows),
+                         "archived_at": datetime.now(timezone.utc).isoformat()},
+                "$unset": {"rows": ""},
+            },
+            upsert=True,
+        )
+    await db.workplan_rows.delete_many({"week_start": week_start})
+    return rows
+
+
+def _week_range(from_week=None, until_week=None):
+    query = {}
+    if from_week:
+        query.setdefault("week_start", {})["$gte"] = from_week
+    if until_week:
+        query.setdefault("week_start", {})["$lte"] = until_week
+    return query
+
+
+async def list_archived_weeks(db, from_week=None, until_week=None, before=None, limit=20, with_rows=False):
+    """Archived weeks, newest first, one page at a time. Pass the returned
+    next_before as before to get the next page."""
+    query = _week_range(from_week, until_week)
+    if before:
+        query.setdefault("week_start", {})["$lt"] = before
+    projection = {"_id": 0, "week_start": 1, "row_count": 1, "archived_at": 1}
+    if with_rows:
+        projection.update({"rows_z": 1, "rows": 1})
+    docs = await db.workplan_archive.find(query, projection).sort("week_start", -1).limit(limit + 1).to_list(length=None)
+    weeks = []
+    for doc in docs[:limit]:
+        week = {"week_start": doc["week_start"], "row_count": doc.get("row_count", len(doc.get("rows", []))),
+                "archived_at": doc.get("archived_at")}
+        if with_rows:
+            week["rows"] = unpack_rows(doc)
+        weeks.append(week)
+    return {"weeks": weeks, "next_before": weeks[-1]["week_start"] if len(docs) > limit else None}
+
+
+async def load_archived_week(db, week_start):
+    """One archived week with its rows, or None."""
+    doc = await db.workplan_archive.find_one({"week_start": week_start}, {"_id": 0})
+    if not doc:
+        return None
+    return {"week_start": doc["week_start"], "rows": unpack_rows(doc), "archived_at": doc.get("archived_at")}
+
+
+async def iter_archived_weeks(db, from_week=None, until_week=None):
+    """(week_start, rows) for every archived week in the range, oldest first."""
+    async for doc in db.workplan_archive.find(
+        _week_range(from_week, until_week), {"_id": 0, "week_start": 1, "rows_z": 1, "rows": 1}
+    ).sort("week_start", 1):
+        yield doc.get("week_start"), unpack_rows(doc)
+
+
+async def drop_other_weeks(db, week_start):
+    """Remove draft rows left over from any other week."""
+    await db.workplan_rows.delete_many({"week_start": {"$ne": week_start}})
+
+
+async def publish_draft(db, week_start):
+    """Copy the week's draft rows to a new published set in one server-side
+    pass, then switch the workplan document over to it."""
+    publish_id = str(uuid.uuid4())
+    await db.workplan_rows.aggregate([
+        {"$match": {"week_start": week_start}},
+        {"$project": {"_id": 0, "publish_id": {"$literal": publish_id}, "order": 1, "row": 1}},
+        {"$merge": {"into": "workplan_published_rows"}},
+    ]).to_list(length=None)
+    count = await db.workplan_published_rows.count_documents({"publish_id": publish_id})
+    now = datetime.now(timezone.utc).isoformat()
+    doc = await db.workplan.find_one_and_update(
+        {"key": "current"},
+        {
+            "$set": {"published_id": publish_id, "published_week_start": week_start, "published_at": now,
+                     "published_count": count},
+            "$inc": {"published_version": 1},
+            "$unset": {"published_rows": ""},
+        },
+        projection={"_id": 0, "published_id": 1, "published_version": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    previous = doc or {}
+    # Only the set this publish replaced: an overlapping publish may have
+    # switched the pointer to its own set since, and that one must stay
+    if previous.get("published_id"):
+        await db.workplan_published_rows.delete_many({"publish_id": previous["published_id"]})
+    version = (previous.get("published_version") or 0) + 1
+    return {"publish_id": publish_id, "published_at": now, "rows": count, "version": version}
+
+
+async def load_published(db, doc):
+    """Published rows for the workplan document, in order."""
+    if doc.get("published_id"):
+        docs = await db.workplan_published_rows.find(
+            {"publish_id": doc["published_id"]}, {"_id": 0, "row": 1}
+        ).sort("order", 1).to_list(length=None)
+        return [d["row"] for d in docs]
+    # Published before rows were stored one per document
+    return doc.get("published_rows", [])
+
+
+async def compress_archive(db):
+    """Compress archived weeks still stored as a plain rows array."""
+    ops = []
+    async for doc in db.workplan_archive.find({"rows": {"$exists": True}}, {"_id": 1, "rows": 1}):
+        rows = doc.get("rows") or []
+        ops.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"rows_z": pack_rows(rows), "row_count": len(rows)}, "$unset": {"rows": ""}},
+        ))
+    if ops:
+        await db.workplan_archive.bulk_write(ops, ordered=False)
+        logger.info(f"Compressed {len(ops)} archived workplan weeks")
+    return len(ops)
+
+
+async def migrate_workplan_rows(db):
+    """Move a draft saved as one draft_rows array into workplan_rows."""
+    doc = await db.workplan.find_one({"key": "current", "draft_rows": {"$exists": True}}, {"_id": 0})
+    if not doc:
+        return 0
+    rows = doc.get("draft_rows") or []
+    if doc.get("week_start") and rows and not await db.workplan_rows.find_one({"week_start": doc["week_start"]}):
+        await save_draft(db, doc["week_start"], rows)
+    await db.workplan.update_one({"key": "current"}, {"$unset": {"draft_rows": ""}})
+    logger.info(f"Moved {len(rows)} workplan rows to one document per row")
+    return len(rows)
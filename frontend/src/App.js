@@ -1860,12 +1860,16 @@ function AllChecksCompleted() {
 
   useEffect(() => {
     fetchChecklists();
-  }, [filterToday]); // Re-fetch when filter changes
+  }, [filterToday, selectedMake, selectedModel]); // Re-fetch when filters change
 
   useEffect(() => {
     filterChecklists();
   }, [selectedMake, selectedModel, checklists]);
 
+  useEffect(() => {
+    fetchModels();
+  }, [selectedMake]);
+
   const fetchChecklists = async (append = false) => {
     try {
       setLoading(true);
@@ -1927,15 +1931,23 @@ function AllChecksCompleted() {
         setLoadingMore(true);
       }
       
+      // Filtered on the server (GENERAL REPAIR records excluded too), so
+      // every page is complete and skip lines up with what's loaded
       const skip = append ? checklists.length : 0;
-      const response = await fetch(`${API_BASE_URL}/api/checklists?limit=${ITEMS_PER_PAGE}&skip=${skip}`, {
+      const params = new URLSearchParams({
+        limit: ITEMS_PER_PAGE,
+        skip,
+        exclude_check_type: 'GENERAL REPAIR'
+      });
+      if (selectedMake) params.set('make', selectedMake);
+      if (selectedModel) params.set('model', selectedModel);
+      const response = await fetch(`${API_BASE_URL}/api/checklists?${params}`, {
         signal: controller.signal
       });
       clearTimeout(timeoutId);
       const data = await response.json();
       
-      // Exclude GENERAL REPAIR records
-      const regularChecks = Array.isArray(data) ? data.filter(c => c.check_type !== 'GENERAL REPAIR') : [];
+      const regularChecks = Array.isArray(data) ? data : [];
       
       if (append) {
         setChecklists(prev => [...prev, ...regularChecks]);
@@ -1943,10 +1955,13 @@ function AllChecksCompleted() {
         setChecklists(regularChecks);
       }
       
-      // Extract unique makes and models
-      const allChecklists = append ? [...checklists, ...regularChecks] : regularChecks;
-      const uniqueMakes = [...new Set(allChecklists.map(c => c.machine_make))].sort();
-      setMakes(uniqueMakes);
+      // Extract unique makes (from the unfiltered list only, so the
+      // dropdown keeps every make while one is selected)
+      if (!selectedMake && !selectedModel) {
+        const allChecklists = append ? [...checklists, ...regularChecks] : regularChecks;
+        const loadedMakes = allChecklists.map(c => c.machine_make);
+        setMakes(prev => [...new Set([...(append ? prev : []), ...loadedMakes])].sort());
+      }
       
       // Check if there are more items to load
       setHasMore(regularChecks.length === ITEMS_PER_PAGE);
@@ -1967,33 +1982,40 @@ function AllChecksCompleted() {
   };
   
   const loadMore = () => {
-    if (!loadingMore && hasMore && !selectedMake && !selectedModel) {
+    if (!loadingMore && hasMore) {
       fetchChecklists(true);
     }
   };
 
+  const fetchModels = async () => {
+    if (!selectedMake) {
+      setModels([]);
+      return;
+    }
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/assets/names/${encodeURIComponent(selectedMake)}`);
+      const names = await response.json();
+      setModels(Array.isArray(names) ? [...new Set(names)].sort() : []);
+    } catch (error) {
+      console.error('Error fetching models:', error);
+      setModels([]);
+    }
+  };
+
   const filterChecklists = () => {
+    // Make and model are filtered on the server, except for today's checks,
+    // which are all loaded at once
     let filtered = checklists;
     
-    // Filter for today's checks if specified
     if (filterToday) {
       const today = new Date().toISOString().split('T')[0];
       filtered = filtered.filter(c => c.completed_at && c.completed_at.startsWith(today));
-    }
-    
-    if (selectedMake) {
-      filtered = filtered.filter(c => c.machine_make === selectedMake);
-      
-      // Update available models based on selected make
-      const availableModels = [...new Set(filtered.map(c => c.machine_model))].sort();
-      setModels(availableModels);
-    } else {
-      setModels([]);
-      setSelectedModel('');
-    }
-    
-    if (selectedModel) {
-      filtered = filtered.filter(c => c.machine_model === selectedModel);
+      if (selectedMake) {
+        filtered = filtered.filter(c => c.machine_make === selectedMake);
+      }
+      if (selectedModel) {
+        filtered = filtered.filter(c => c.machine_model === selectedModel);
+      }
     }
     
     setFilteredChecklists(filtered);
@@ -2325,8 +2347,8 @@ function AllChecksCompleted() {
                 </Card>
               ))}
               
-              {/* Load More Button - only show when not filtering */}
-              {hasMore && filteredChecklists.length > 0 && !selectedMake && !selectedModel && (
+              {/* Load More Button */}
+              {hasMore && filteredChecklists.length > 0 && (
                 <div className="mt-6 text-center">
                   <Button 
                     onClick={loadMore} 
@@ -2346,13 +2368,6 @@ function AllChecksCompleted() {
                   <p className="text-sm text-gray-500 mt-2">Showing {filteredChecklists.length} checks</p>
                 </div>
               )}
-              
-              {/* Info message when filtering */}
-              {(selectedMake || selectedModel) && (
-                <div className="mt-4 text-center text-sm text-gray-500">
-                  <p>Filtering applied. Clear filters to load more records.</p>
-                </div>
-              )}
             </div>
           )}
         </CardContent>
@@ -106,21 +106,34 @@ export default function WorkplanBoard() {
   const [activeDay, setActiveDay] = useState(null); // ISO date
 
   useEffect(() => {
-    const load = async () => {
-      try {
-        const [wpRes, colorsRes] = await Promise.all([
-          fetch(`${API_BASE_URL}/api/workplan/published`),
-          fetch(`${API_BASE_URL}/api/workplan/colors`),
-        ]);
-        setData(await wpRes.json());
-        setColors(await colorsRes.json());
-      } catch {
-        setData({ week_start: null, rows: [] });
+    // Long-poll: the server holds the request until a new version is
+    // published (or answers 304 after a while), so the board updates as
+    // soon as the workplan is published without re-downloading it.
+    const controller = new AbortController();
+    let version = null;
+    const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+    const poll = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          const query = version === null ? '' : `?since_version=${version}`;
+          const wpRes = await fetch(`${API_BASE_URL}/api/workplan/published${query}`, { signal: controller.signal });
+          if (wpRes.status === 304) continue;
+          if (!wpRes.ok) throw new Error('load failed');
+          const wp = await wpRes.json();
+          const colorsRes = await fetch(`${API_BASE_URL}/api/workplan/colors`, { signal: controller.signal });
+          setColors(await colorsRes.json());
+          setData(wp);
+          version = wp.version ?? 0;
+        } catch {
+          if (controller.signal.aborted) return;
+          if (version === null) setData({ week_start: null, rows: [] });
+          await wait(30000);
+        }
       }
     };
-    load();
-    const t = setInterval(load, 60000);
-    return () => clearInterval(t);
+    poll();
+    return () => controller.abort();
   }, []);
 
   if (!data || !data.week_start || !data.rows || data.rows.length === 0) return null;
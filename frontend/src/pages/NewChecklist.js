@@ -1,9 +1,10 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import { Button } from '../components/ui/button';
 import { Card, CardContent } from '../components/ui/card';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../components/ui/select';
 import { Checkbox } from '../components/ui/checkbox';
+import { Input } from '../components/ui/input';
 import { Textarea } from '../components/ui/textarea';
 import { Badge } from '../components/ui/badge';
 import { Separator } from '../components/ui/separator';
@@ -50,6 +51,9 @@ export default function NewChecklist() {
     serialNumber: ''
   });
   const [safetyConfirmed, setSafetyConfirmed] = useState(false);
+  const [machineSearch, setMachineSearch] = useState('');
+  const [machineResults, setMachineResults] = useState([]);
+  const pickedAsset = useRef(null); // machine chosen from search; already has its names/check type
   const navigate = useNavigate();
 
   // Redirect if not authenticated
@@ -180,17 +184,59 @@ export default function NewChecklist() {
   useEffect(() => {
     if (selectedMake) {
       fetchNames(selectedMake);
-      setSelectedName(''); // Reset name when make changes
-      setMachineCheckType(''); // Reset check type
+      const picked = pickedAsset.current;
+      if (picked && picked.make === selectedMake) {
+        setSelectedName(picked.name);
+        setMachineCheckType(picked.check_type);
+      } else {
+        setSelectedName(''); // Reset name when make changes
+        setMachineCheckType(''); // Reset check type
+      }
     }
   }, [selectedMake]);
 
   useEffect(() => {
     if (selectedMake && selectedName) {
+      const picked = pickedAsset.current;
+      if (picked && picked.make === selectedMake && picked.name === selectedName) {
+        pickedAsset.current = null; // check type came with the search result
+        return;
+      }
       fetchCheckType(selectedMake, selectedName);
     }
   }, [selectedMake, selectedName]);
 
+  // Machine search (autocomplete over make + name)
+  useEffect(() => {
+    const q = machineSearch.trim();
+    if (!q) {
+      setMachineResults([]);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/api/assets/search?q=${encodeURIComponent(q)}&limit=8`);
+        setMachineResults(await response.json());
+      } catch (error) {
+        console.error('Error searching machines:', error);
+      }
+    }, 200);
+    return () => clearTimeout(timer);
+  }, [machineSearch]);
+
+  const pickMachine = (asset) => {
+    pickedAsset.current = asset;
+    setMachineSearch('');
+    setMachineResults([]);
+    if (asset.make === selectedMake) {
+      if (asset.name === selectedName) pickedAsset.current = null; // nothing will change
+      setSelectedName(asset.name);
+      setMachineCheckType(asset.check_type);
+    } else {
+      setSelectedMake(asset.make);
+    }
+  };
+
   useEffect(() => {
     if (step === 3 && selectedCheckType === 'daily_check' && machineCheckType) {
       loadChecklistTemplate(machineCheckType);
@@ -949,6 +995,29 @@ export default function NewChecklist() {
                 </div>
               </div>
 
+              <div className="relative">
+                <Input
+                  value={machineSearch}
+                  onChange={(e) => setMachineSearch(e.target.value)}
+                  placeholder="Search machines, e.g. fendt 724"
+                  data-testid="machine-search"
+                />
+                {machineResults.length > 0 && (
+                  <div className="absolute z-10 mt-1 w-full bg-white border rounded-md shadow-lg max-h-64 overflow-y-auto">
+                    {machineResults.map((asset) => (
+                      <button
+                        key={asset.id || `${asset.make}:${asset.name}`}
+                        type="button"
+                        onClick={() => pickMachine(asset)}
+                        className="w-full text-left px-3 py-2 hover:bg-blue-50 text-sm"
+                      >
+                        <span className="font-medium">{asset.make}</span> - {asset.name}
+                      </button>
+                    ))}
+                  </div>
+                )}
+              </div>
+
               <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
                 <div>
                   <h3 className="text-lg font-semibold mb-4">Select Machine Make</h3>
@@ -64,6 +64,9 @@ export const managerTint = (name, light = 94) => {
   return `hsl(${h}, 70%, ${light}%)`;
 };
 
+// what the grid holds, ignoring the server's row versions
+const contentKey = (ws, rws) => JSON.stringify([ws, rws.map(({ version, ...r }) => r)]);
+
 const emptyDays = () =>
   Array.from({ length: 7 }, () => ({ am: { job: '', color_id: null }, pm: { job: '', color_id: null } }));
 
@@ -241,55 +244,6 @@ export default function WorkplanEditor() {
     })();
   }, []);
 
-  // ---------- presence tracking ----------
-  useEffect(() => {
-    if (!employee?.employee_number) return;
-    
-    const userId = employee.employee_number;
-    const userName = employee.name || `Employee ${userId}`;
-    
-    const sendHeartbeat = async () => {
-      try {
-        const res = await fetch(`${API_BASE_URL}/api/workplan/presence/heartbeat`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ user_id: userId, user_name: userName }),
-        });
-        const data = await res.json();
-        setActiveUsers(data.active_users || []);
-      } catch (e) {
-        console.error('Presence heartbeat failed:', e);
-      }
-    };
-    
-    // Send initial heartbeat
-    sendHeartbeat();
-    
-    // Send heartbeat every 15 seconds
-    const interval = setInterval(sendHeartbeat, 15000);
-    
-    // Notify server when leaving
-    const handleUnload = () => {
-      navigator.sendBeacon(
-        `${API_BASE_URL}/api/workplan/presence/leave`,
-        JSON.stringify({ user_id: userId, user_name: userName })
-      );
-    };
-    
-    window.addEventListener('beforeunload', handleUnload);
-    
-    return () => {
-      clearInterval(interval);
-      window.removeEventListener('beforeunload', handleUnload);
-      // Send leave signal on unmount
-      fetch(`${API_BASE_URL}/api/workplan/presence/leave`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id: userId, user_name: userName }),
-      }).catch(() => {});
-    };
-  }, [employee]);
-
   // Normalize times like '6:30 Am' to 'HH:mm' for <input type="time">
   const normalizeTime = (t) => {
     if (!t) return '';
@@ -325,45 +279,245 @@ export default function WorkplanEditor() {
   };
 
   // ---------- autosave ----------
+  // Single-cell edits are sent on their own (PATCH); anything else (row
+  // fields, bulk pastes, reordering) saves the grid, which only rewrites the
+  // rows that changed. Each row carries the server's version so edits made
+  // by someone else in the meantime come back as conflicts, not overwrites.
+  const rowsRef = useRef(rows);
+  rowsRef.current = rows;
+  const savedKey = useRef(null); // content (without versions) last sent to the server
+  const deletedRowIds = useRef([]);
+  const putInFlight = useRef(false);
+  const clientId = useRef(`${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`); // this tab
+
+  // replace rows with the server's copy after a conflict
+  const applyServerRows = (serverRows) => {
+    const byId = Object.fromEntries(serverRows.map((r) => [r.id, r]));
+    setRows((rs) => rs.map((r) => (byId[r.id] ? normalizeRow(byId[r.id]) : r)));
+    toast.warning(
+      serverRows.length === 1
+        ? 'Someone else changed this row - showing their version'
+        : `${serverRows.length} rows were changed by someone else - showing their versions`
+    );
+  };
+
+  const setVersions = (versions) =>
+    setRows((rs) => rs.map((r) => (versions[r.id] ? { ...r, version: versions[r.id] } : r)));
+
   const persist = useCallback(async (ws, rws) => {
     setSaveState('saving');
+    savedKey.current = contentKey(ws, rws);
+    const deleted = deletedRowIds.current;
+    deletedRowIds.current = [];
+    putInFlight.current = true;
     try {
-      await fetch(`${API_BASE_URL}/api/workplan`, {
+      const res = await fetch(`${API_BASE_URL}/api/workplan`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ week_start: ws, rows: rws }),
+        body: JSON.stringify({ week_start: ws, rows: rws, deleted, client_id: clientId.current }),
       });
+      if (!res.ok) throw new Error('save failed');
+      const data = await res.json();
+      setVersions(data.versions || {});
+      if (data.conflicts && data.conflicts.length) applyServerRows(data.conflicts);
       setSaveState('saved');
     } catch {
+      savedKey.current = null;
+      deletedRowIds.current = [...deleted, ...deletedRowIds.current];
       setSaveState('idle');
       toast.error('Auto-save failed');
+    } finally {
+      putInFlight.current = false;
     }
+  // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
   useEffect(() => {
     if (!loaded) return;
+    // Nothing to save if only versions changed or a cell edit was already sent
+    if (contentKey(weekStart, rows) === savedKey.current) return;
     setSaveState('saving');
     if (saveTimer.current) clearTimeout(saveTimer.current);
     saveTimer.current = setTimeout(() => persist(weekStart, rows), 700);
     return () => saveTimer.current && clearTimeout(saveTimer.current);
   }, [rows, weekStart, loaded, persist]);
 
+  const sendCell = async (rowId, dayIndex, period, cell, version) => {
+    try {
+      const res = await fetch(`${API_BASE_URL}/api/workplan/rows/${rowId}/cells/${dayIndex}/${period}`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ week_start: weekStart, cell, version, client_id: clientId.current }),
+      });
+      if (res.status === 409) {
+        const data = await res.json();
+        savedKey.current = null;
+        applyServerRows([data.detail.row]);
+        return;
+      }
+      if (!res.ok) throw new Error('cell save failed');
+      const data = await res.json();
+      setVersions({ [rowId]: data.version });
+      setSaveState('saved');
+    } catch {
+      // Fall back to saving the whole grid
+      savedKey.current = null;
+      persist(weekStart, rowsRef.current);
+    }
+  };
+
+  // ---------- live channel ----------
+  // Presence and other managers' edits arrive over a WebSocket. While it's
+  // down, presence falls back to the REST heartbeat and the socket retries.
+  const weekStartRef = useRef(weekStart);
+  weekStartRef.current = weekStart;
+
+  // swap in rows from the server without treating them as unsaved edits
+  const applyRemoteRows = (next) => {
+    const ws = weekStartRef.current;
+    if (contentKey(ws, rowsRef.current) === savedKey.current) savedKey.current = contentKey(ws, next);
+    rowsRef.current = next;
+    setRows(next);
+  };
+
+  const reloadRows = async () => {
+    // With unsaved edits pending, keep them; the save reports any conflicts
+    if (contentKey(weekStartRef.current, rowsRef.current) !== savedKey.current) return;
+    try {
+      const res = await fetch(`${API_BASE_URL}/api/workplan`);
+      const data = await res.json();
+      if (data.week_start !== weekStartRef.current) return;
+      applyRemoteRows((data.rows || []).map(normalizeRow));
+    } catch (e) {
+      console.error('Workplan reload failed:', e);
+    }
+  };
+
+  const liveHandler = useRef(null);
+  liveHandler.current = (msg) => {
+    if (msg.type === 'presence') {
+      setActiveUsers(msg.active_users || []);
+      return;
+    }
+    if (msg.week_start !== weekStartRef.current) return;
+    const current = rowsRef.current;
+    if (msg.type === 'row') {
+      const mine = current.find((r) => r.id === msg.row.id);
+      if (!mine) {
+        reloadRows();
+      } else if ((mine.version || 0) < msg.row.version) {
+        applyRemoteRows(current.map((r) => (r.id === msg.row.id ? normalizeRow(msg.row) : r)));
+      }
+    } else if (msg.type === 'rows') {
+      const versions = msg.versions || {};
+      const changed = current.length !== Object.keys(versions).length
+        || current.some((r) => versions[r.id] !== r.version);
+      if (changed) reloadRows();
+    }
+  };
+
+  useEffect(() => {
+    if (!employee?.employee_number) return;
+
+    const userId = employee.employee_number;
+    const userName = employee.name || `Employee ${userId}`;
+    const presenceBody = JSON.stringify({ user_id: userId, user_name: userName });
+    let socket = null;
+    let closed = false;
+    let retryTimer = null;
+    let pingTimer = null;
+
+    const sendHeartbeat = async () => {
+      try {
+        const res = await fetch(`${API_BASE_URL}/api/workplan/presence/heartbeat`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: presenceBody,
+        });
+        const data = await res.json();
+        setActiveUsers(data.active_users || []);
+      } catch (e) {
+        console.error('Presence heartbeat failed:', e);
+      }
+    };
+
+    const connect = () => {
+      const params = new URLSearchParams({ user_id: userId, user_name: userName, client_id: clientId.current });
+      const base = (API_BASE_URL || window.location.origin).replace(/^http/, 'ws');
+      socket = new WebSocket(`${base}/api/workplan/live?${params}`);
+      socket.onopen = () => {
+        clearInterval(pingTimer);
+        // Keeps us listed as present (and the connection alive through proxies)
+        pingTimer = setInterval(() => {
+          if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ type: 'ping' }));
+        }, 20000);
+      };
+      socket.onmessage = (e) => {
+        try {
+          liveHandler.current(JSON.parse(e.data));
+        } catch (err) {
+          console.error('Bad live message:', err);
+        }
+      };
+      socket.onclose = () => {
+        clearInterval(pingTimer);
+        if (closed) return;
+        sendHeartbeat();
+        retryTimer = setTimeout(connect, 3000);
+      };
+    };
+    connect();
+
+    // Notify server when leaving
+    const handleUnload = () => {
+      navigator.sendBeacon(`${API_BASE_URL}/api/workplan/presence/leave`, presenceBody);
+    };
+
+    window.addEventListener('beforeunload', handleUnload);
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      clearInterval(pingTimer);
+      window.removeEventListener('beforeunload', handleUnload);
+      // Closing an open socket signs us out; otherwise say so over REST
+      if (socket && socket.readyState !== WebSocket.OPEN) {
+        fetch(`${API_BASE_URL}/api/workplan/presence/leave`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: presenceBody,
+        }).catch(() => {});
+      }
+      if (socket) socket.close();
+    };
+  }, [employee]);
+
   const colorsById = Object.fromEntries(colors.map((c) => [c.id, c]));
 
   // ---------- row ops ----------
   const updateRow = (id, patch) =>
     setRows((rs) => rs.map((r) => (r.id === id ? { ...r, ...patch } : r)));
 
-  const updateCell = (rowId, dayIndex, period, patch) =>
-    setRows((rs) =>
-      rs.map((r) => {
-        if (r.id !== rowId) return r;
-        const days = r.days.map((d, i) =>
-          i === dayIndex ? { ...d, [period]: { ...d[period], ...patch } } : d
-        );
-        return { ...r, days };
-      })
-    );
+  const updateCell = (rowId, dayIndex, period, patch) => {
+    const current = rowsRef.current;
+    const row = current.find((r) => r.id === rowId);
+    if (!row) return;
+    const cell = { ...row.days[dayIndex][period], ...patch };
+    const next = current.map((r) => {
+      if (r.id !== rowId) return r;
+      const days = r.days.map((d, i) => (i === dayIndex ? { ...d, [period]: cell } : d));
+      return { ...r, days };
+    });
+    // Only this cell differs from what the server has: send just the cell
+    const cellOnly = row.version && !putInFlight.current && contentKey(weekStart, current) === savedKey.current;
+    if (cellOnly) savedKey.current = contentKey(weekStart, next);
+    rowsRef.current = next;
+    setRows(next);
+    if (cellOnly) {
+      setSaveState('saving');
+      sendCell(rowId, dayIndex, period, cell, row.version);
+    }
+  };
 
   const copyCellAcrossWeek = (rowId, dayIndex, period) =>
     setRows((rs) =>
@@ -396,7 +550,14 @@ export default function WorkplanEditor() {
       return copy;
     });
   };
-  const deleteRow = (id) => { clearSelection(); setRows((rs) => (rs.length > 1 ? rs.filter((r) => r.id !== id) : rs)); };
+  const deleteRow = (id) => {
+    clearSelection();
+    setRows((rs) => {
+      if (rs.length <= 1) return rs;
+      deletedRowIds.current = [...deletedRowIds.current, id];
+      return rs.filter((r) => r.id !== id);
+    });
+  };
   const moveRow = (id, dir) => {
     clearSelection();
     setRows((rs) => {